@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks du moteur sur une flotte synthétique (bench/synth_fleet.py).
+
+Pour chaque profil sont mesurés: flatten_requirements, compute_coverage,
+l'évaluation des règles de chaque domaine (ex-analyze_*), le rendu Markdown et
+main() de bout en bout (un hôte, fichiers écrits). Pour chaque mesure:
+débit, latences p50/p95/p99, pic de mémoire allouée (tracemalloc) et pic RSS.
+
+Les résultats sont enregistrés en JSON ; --compare signale les régressions
+par rapport à un run précédent.
+
+    python3 bench/bench_engine.py --hosts 2000 --out bench/results/base.json
+    python3 bench/bench_engine.py --compare bench/results/base.json --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "engine"))
+sys.path.insert(0, str(BASE / "collectors"))
+
+import apply_audit_profile as engine  # noqa: E402
+from quantiles import percentile  # noqa: E402
+from rule_engine import evaluate_checks  # noqa: E402
+from synth_fleet import generate_fleet, write_fleet  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_PROFILES = [
+    "grids/audit_server_v1.yaml",
+    "grids/audit_web_security_v1.yaml",
+    "grids/audit_wordpress_v1.yaml",
+    "grids/audit_performance_resilience_v1.yaml",
+]
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def _peak_rss_mb():
+    # ru_maxrss: Ko sous Linux, octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def measure(fn, inputs, min_time=0.5, min_calls=50, alloc_calls=200):
+    """
+    Appelle fn(x) sur `inputs` (en boucle) pendant au moins `min_time` secondes.
+    Retourne les statistiques de latence (µs), de débit et de mémoire.
+    """
+    n_inputs = len(inputs)
+    fn(inputs[0])  # échauffement (caches, imports paresseux)
+
+    timings = []
+    perf = time.perf_counter_ns
+    start = time.perf_counter()
+    i = 0
+    while i < min_calls or time.perf_counter() - start < min_time:
+        x = inputs[i % n_inputs]
+        t0 = perf()
+        fn(x)
+        timings.append(perf() - t0)
+        i += 1
+    wall = time.perf_counter() - start
+
+    # Mémoire: passe séparée (tracemalloc ralentit fortement les appels)
+    tracemalloc.start()
+    base_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for j in range(min(alloc_calls, len(timings))):
+        fn(inputs[j % n_inputs])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    us = [t / 1000 for t in timings]
+    calls = min(alloc_calls, len(timings))
+    return {
+        "calls": len(timings),
+        "ops_per_s": round(len(timings) / wall, 1),
+        "p50_us": percentile(us, 50, 2),
+        "p95_us": percentile(us, 95, 2),
+        "p99_us": percentile(us, 99, 2),
+        "mean_us": round(sum(us) / len(us), 2),
+        "alloc_peak_kb": round((peak - base_current) / 1024, 1),
+        "retained_bytes_per_op": round(max(0, current - base_current) / calls, 1),
+        "rss_peak_mb": _peak_rss_mb(),
+    }
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def _domains(profile):
+    groups = {}
+    for check in profile["checks"]:
+        groups.setdefault(check["id"].split(".", 1)[0], []).append(check)
+    return groups
+
+def _run_main(argv):
+    saved = sys.argv
+    sys.argv = ["apply_audit_profile.py"] + argv
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.main()
+    finally:
+        sys.argv = saved
+
+def bench_profile(profile_path, facts_list, facts_files, outdir, min_time):
+    profile = engine.load_profile(profile_path)
+    slug = profile["slug"]
+    grid = profile["grid"]
+    req, opt = profile["required"], profile["optional"]
+    results = {}
+
+    results[f"{slug}/flatten_requirements"] = measure(lambda _: engine.flatten_requirements(grid), [None], min_time)
+    results[f"{slug}/compute_coverage"] = measure(
+        lambda f: engine.compute_coverage(f, req, opt), facts_list, min_time)
+
+    rule_grid = profile["rule_grid"]
+    for domain, checks in _domains(profile).items():
+        results[f"{slug}/rules.{domain}"] = measure(
+            lambda f, c=checks: evaluate_checks(rule_grid, c, f), facts_list, min_time)
+
+    evaluated = [engine.evaluate_profile(f, profile) for f in facts_list[:500]]
+    results[f"{slug}/evaluate_profile"] = measure(lambda f: engine.evaluate_profile(f, profile), facts_list, min_time)
+    results[f"{slug}/render_report"] = measure(lambda r: engine.render_report(profile, r), evaluated, min_time)
+
+    argv_list = [["--facts", str(p), "--profile", str(profile_path), "--outdir", str(outdir)] for p in facts_files]
+    results[f"{slug}/main"] = measure(_run_main, argv_list, min_time, min_calls=20, alloc_calls=20)
+    return results
+
+# -----------------------------
+# Comparison
+# -----------------------------
+def compare(current, baseline, threshold):
+    """Régressions: p50 ou p99 plus lents, ou débit plus faible, de plus de `threshold` %."""
+    regressions = []
+    rows = []
+    for name, cur in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        d50 = 100.0 * (cur["p50_us"] - old["p50_us"]) / old["p50_us"] if old["p50_us"] else 0.0
+        d99 = 100.0 * (cur["p99_us"] - old["p99_us"]) / old["p99_us"] if old["p99_us"] else 0.0
+        dops = 100.0 * (cur["ops_per_s"] - old["ops_per_s"]) / old["ops_per_s"] if old["ops_per_s"] else 0.0
+        flagged = d50 > threshold or dops < -threshold or d99 > 2 * threshold
+        rows.append((name, old["p50_us"], cur["p50_us"], d50, dops, flagged))
+        if flagged:
+            regressions.append(name)
+    return rows, regressions
+
+def git_commit():
+    try:
+        r = subprocess.run(["git", "-C", str(BASE), "rev-parse", "--short", "HEAD"],
+                           capture_output=True, text=True, timeout=5)
+        return r.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks du moteur d'audit (flotte synthétique)")
+    ap.add_argument("--hosts", type=int, default=2000, help="Taille de la flotte synthétique")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--nm-share", type=float, default=0.15, help="Part des valeurs non_mesurable")
+    ap.add_argument("--ports-min", type=int, default=2)
+    ap.add_argument("--ports-max", type=int, default=12)
+    ap.add_argument("--profile", action="append", help="Profils mesurés (répétable, défaut: les 4 grilles)")
+    ap.add_argument("--min-time", type=float, default=0.5, help="Durée minimale par mesure (s)")
+    ap.add_argument("--main-hosts", type=int, default=50, help="Hôtes écrits sur disque pour main()")
+    ap.add_argument("--out", help="Fichier JSON de résultats (défaut: bench/results/<date>.json)")
+    ap.add_argument("--compare", help="Résultats de référence (JSON) pour détecter les régressions")
+    ap.add_argument("--threshold", type=float, default=10.0, help="Seuil de régression (%%)")
+    ap.add_argument("--fail-on-regression", action="store_true", help="Code retour 1 si régression")
+    args = ap.parse_args()
+
+    profiles = [BASE / p if not os.path.isabs(p) else Path(p) for p in (args.profile or DEFAULT_PROFILES)]
+    fleet = list(generate_fleet(args.hosts, args.seed, args.nm_share, args.ports_min, args.ports_max))
+    facts_list = [f for _, f in fleet]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="audit_bench_") as tmp:
+        tmp = Path(tmp)
+        write_fleet(tmp / "facts", fleet[:args.main_hosts])
+        facts_files = sorted((tmp / "facts").rglob("facts_all.json"))
+        for profile_path in profiles:
+            print(f"[OK] Profil: {profile_path.stem}", file=sys.stderr)
+            results.update(bench_profile(profile_path, facts_list, facts_files, tmp / "reports", args.min_time))
+
+    doc = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "engine_version": engine.ENGINE_VERSION,
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "fleet": {"hosts": args.hosts, "seed": args.seed, "nm_share": args.nm_share,
+                      "ports": [args.ports_min, args.ports_max]},
+        },
+        "results": results,
+    }
+
+    print(f"{'mesure':<52} {'ops/s':>11} {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9} {'alloc Ko':>9}")
+    for name, r in results.items():
+        print(f"{name:<52} {r['ops_per_s']:>11.1f} {r['p50_us']:>9.2f} {r['p95_us']:>9.2f} {r['p99_us']:>9.2f} {r['alloc_peak_kb']:>9.1f}")
+    print(f"[OK] Pic RSS: {_peak_rss_mb()} Mo")
+
+    out = Path(args.out) if args.out else BASE / "bench" / "results" / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"[OK] Résultats: {out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("fleet") != doc["meta"]["fleet"]:
+            print("[WARN] Flotte différente de la référence: comparaison indicative", file=sys.stderr)
+        rows, regressions = compare(doc, baseline, args.threshold)
+        print(f"\n{'mesure':<52} {'p50 réf':>9} {'p50':>9} {'Δp50':>8} {'Δops/s':>8}")
+        for name, old50, new50, d50, dops, flagged in rows:
+            mark = "  <-- REGRESSION" if flagged else ""
+            print(f"{name:<52} {old50:>9.2f} {new50:>9.2f} {d50:>+7.1f}% {dops:>+7.1f}%{mark}")
+        if regressions:
+            print(f"[WARN] {len(regressions)} régression(s) > {args.threshold:g}%", file=sys.stderr)
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("[OK] Aucune régression")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateur de flotte synthétique (facts_all.json réalistes), reproductible.
+
+Les documents suivent le format de collect_all_facts.sh (mêmes blocs, mêmes
+clés, même ordre). Paramètres: nombre d'hôtes, graine, part de valeurs
+`non_mesurable`, taille des listes de ports ouverts.
+
+    python3 bench/synth_fleet.py --hosts 5000 --seed 42 --out /tmp/fleet
+    python3 bench/synth_fleet.py --hosts 5000 --ndjson /tmp/fleet.ndjson
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "collectors"))
+
+from collect_facts import LAYOUT, NM  # noqa: E402
+
+OS_RELEASES = [("debian", "12"), ("debian", "11"), ("ubuntu", "22.04"), ("ubuntu", "24.04"),
+               ("ubuntu", "23.10"), ("almalinux", "9.3")]
+EXTRA_PORTS = ["21", "25", "53", "110", "143", "587", "993", "2222", "3000", "3306", "5432",
+               "6379", "8080", "8443", "9000", "9090", "11211", "27017"]
+PHP_VERSIONS = ["7.4.33", "8.0.30", "8.1.27", "8.2.15", "8.3.2"]
+MYSQL_VERSIONS = ["mysql  Ver 8.0.36", "mysql  Ver 15.1 Distrib 10.11.6-MariaDB", "mysql  Ver 15.1 Distrib 10.6.16-MariaDB"]
+WP_VERSIONS = ["5.9.8", "6.2.3", "6.3.2", "6.4.3", "6.5.2"]
+
+# -----------------------------
+# Generation
+# -----------------------------
+def _values(rng, ports_min, ports_max):
+    os_name, os_version = rng.choice(OS_RELEASES)
+    n_ports = rng.randint(ports_min, ports_max)
+    base_ports = ["22", "80", "443"][:min(3, n_ports)]
+    extra = rng.sample(EXTRA_PORTS, min(len(EXTRA_PORTS), max(0, n_ports - len(base_ports))))
+    ports = sorted(set(base_ports + extra), key=lambda p: (len(p), p))
+    wp = rng.random() < 0.6
+
+    v = {
+        "system.os_name": os_name,
+        "system.os_version": os_version,
+        "system.uptime_hours": int(rng.expovariate(1 / 1500)),
+        "system.cpu_load_15m": round(rng.lognormvariate(-0.5, 0.8), 2),
+        "system.ram_free_percent": rng.randint(3, 90),
+        "system.disk_used_percent": min(100, int(rng.betavariate(4, 3) * 100)),
+        "security_infra.firewall_present": rng.random() < 0.7,
+        "security_infra.fail2ban_present": rng.random() < 0.5,
+        "security_infra.ssh_root_login": rng.random() < 0.3,
+        "security_infra.open_ports": ports,
+        "resilience.backups_present": rng.random() < 0.75,
+        "resilience.backups_location": rng.choice(["same_disk", "external", "unknown"]),
+        "resilience.snapshots_present": rng.random() < 0.4,
+        "resilience.cron_system_active": rng.random() < 0.9,
+        "logs.syslog_errors_recent": int(rng.expovariate(1 / 40)),
+        "logs.web_5xx_recent": int(rng.expovariate(1 / 5)),
+        "web_security.ssl_certificate_present": rng.random() < 0.9,
+        "web_security.ssl_certificate_expiry_days": rng.randint(-10, 365),
+        "web_security.https_forced": rng.random() < 0.8,
+        "web_security.web_root_permissions": rng.choice(["755", "755", "750", "775", "777"]),
+        "web_security.wp_config_permissions": rng.choice(["640", "600", "644", "666"]),
+        "web_security.suspicious_files_detected": rng.random() < 0.05,
+        "stack.php_version": rng.choice(PHP_VERSIONS),
+        "stack.php_eol": rng.random() < 0.3,
+        "stack.mysql_version": rng.choice(MYSQL_VERSIONS),
+        "stack.mysql_eol": rng.random() < 0.1,
+        "stack.opcache_enabled": rng.random() < 0.8,
+        "stack.redis_enabled": rng.random() < 0.3,
+        "performance.response_time_ms": int(rng.lognormvariate(5.5, 0.7)),
+        "performance.slow_queries_detected": rng.random() < 0.2,
+        "performance.cpu_spikes_detected": rng.random() < 0.15,
+        "deployment.rollback_available": rng.choice(["none", "none", "snapshot", "blue_green"]),
+    }
+    if wp:
+        v.update({
+            "wordpress.core_version": rng.choice(WP_VERSIONS),
+            "wordpress.core_eol": rng.random() < 0.2,
+            "wordpress.auto_updates_enabled": rng.random() < 0.5,
+            "wordpress.total_plugins": rng.randint(3, 60),
+            "wordpress.outdated_plugins": rng.randint(0, 12),
+            "wordpress.abandoned_plugins": rng.randint(0, 4),
+            "wordpress.admin_count": rng.randint(1, 8),
+            "wordpress.dormant_admins": rng.randint(0, 3),
+            "wordpress.unknown_admins": rng.randint(0, 2),
+            "wordpress.db_size_mb": rng.randint(20, 4000),
+            "wordpress.orphan_tables_detected": rng.random() < 0.2,
+            "wordpress.wp_cron_active": rng.random() < 0.8,
+        })
+    return v
+
+def generate_host(rng, nm_share=0.15, ports_min=2, ports_max=12):
+    """Un document facts_all.json ; chaque valeur est `non_mesurable` avec la probabilité nm_share."""
+    values = _values(rng, ports_min, ports_max)
+    doc = {}
+    for block, keys in LAYOUT.items():
+        doc[block] = {}
+        for k in keys:
+            v = values.get(f"{block}.{k}", NM)
+            doc[block][k] = NM if rng.random() < nm_share else v
+    return doc
+
+def generate_fleet(hosts, seed=42, nm_share=0.15, ports_min=2, ports_max=12):
+    """Itère (nom d'hôte, facts) ; même graine -> même flotte."""
+    rng = random.Random(seed)
+    width = len(str(max(1, hosts - 1)))
+    for i in range(hosts):
+        yield f"h{i:0{width}d}", generate_host(rng, nm_share, ports_min, ports_max)
+
+def write_fleet(out: Path, fleet):
+    n = 0
+    for host, facts in fleet:
+        d = out / host
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "facts_all.json").write_text(json.dumps(facts, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        n += 1
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Flotte synthétique de facts_all.json (reproductible)")
+    ap.add_argument("--hosts", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--nm-share", type=float, default=0.15, help="Part des valeurs non_mesurable (0-1)")
+    ap.add_argument("--ports-min", type=int, default=2, help="Taille minimale des listes de ports")
+    ap.add_argument("--ports-max", type=int, default=12, help="Taille maximale des listes de ports")
+    ap.add_argument("--out", help="Dossier de sortie (un sous-dossier par hôte)")
+    ap.add_argument("--ndjson", help='Sortie NDJSON {"host", "facts"} (fichier ou "-")')
+    args = ap.parse_args()
+
+    if not (0 <= args.nm_share <= 1) or args.ports_min > args.ports_max or not (args.out or args.ndjson):
+        print("[ERREUR] --out ou --ndjson requis, 0 <= --nm-share <= 1, --ports-min <= --ports-max", file=sys.stderr)
+        sys.exit(1)
+
+    fleet = generate_fleet(args.hosts, args.seed, args.nm_share, args.ports_min, args.ports_max)
+    if args.ndjson:
+        out = sys.stdout if args.ndjson == "-" else open(args.ndjson, "w", encoding="utf-8")
+        try:
+            for host, facts in fleet:
+                out.write(json.dumps({"host": host, "facts": facts}, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except BrokenPipeError:
+            sys.stderr.close()  # consommateur aval fermé (ex. head)
+            return
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"[OK] {args.hosts} hôtes -> {args.ndjson}", file=sys.stderr)
+    else:
+        n = write_fleet(Path(args.out), fleet)
+        print(f"[OK] {n} hôtes -> {args.out}")
+
+if __name__ == "__main__":
+    main()
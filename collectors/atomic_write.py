@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Écriture atomique des fichiers d'état des collecteurs (caches de sondes,
+checkpoints de logs, anneau du sampler, métriques).
+
+Le fichier est écrit à côté de sa destination sous un nom propre au processus
+(.<nom>.<pid>.tmp), puis renommé (os.replace). Deux runs qui se chevauchent
+(cron + run manuel) n'écrivent jamais dans le même fichier temporaire : le
+dernier renommage l'emporte, aucun lecteur ne voit de fichier partiel.
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+def temp_path(path: Path):
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+@contextmanager
+def atomic_open(path, mode="w"):
+    """open() sur un fichier temporaire, renommé en `path` à la sortie du bloc sans erreur."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+def write_text(path, text):
+    with atomic_open(path) as f:
+        f.write(text)
@@ -31,6 +31,14 @@ json_int() {
   fi
 }
 
+json_num() {
+  if [[ "$1" =~ ^[0-9]+(\.[0-9]+)?$ ]]; then
+    echo "$1"
+  else
+    echo "\"$NM\""
+  fi
+}
+
 # ============================================================
 # SYSTEM
 # ============================================================
@@ -159,7 +167,7 @@ cat > "$OUT_FILE" <<EOF
     "os_name": $(json_str "$os_name"),
     "os_version": $(json_str "$os_version"),
     "uptime_hours": $(json_int "$uptime_hours"),
-    "cpu_load_15m": $(json_int "$cpu_load_15m"),
+    "cpu_load_15m": $(json_num "$cpu_load_15m"),
     "ram_free_percent": $(json_int "$ram_free_percent"),
     "disk_used_percent": $(json_int "$disk_used_percent")
   },
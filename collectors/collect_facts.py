@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Collecteur de facts en Python (même format que collect_all_facts.sh).
+
+Chaque sonde (probe) est une unité déclarant les facts qu'elle produit et les
+sondes dont elle dépend. Les sondes prêtes s'exécutent en parallèle ; chacune a
+son propre timeout (dépassé -> ses facts restent `non_mesurable`) et sa durée
+est enregistrée dans le bloc `collector` de la sortie. La durée totale est
+bornée par la sonde la plus lente, pas par la somme des sondes.
+
+Les sondes à évolution lente déclarent un `ttl` et une clé d'invalidation
+(probe_cache.py) : leur dernier relevé est servi sans rien exécuter, avec son
+heure de mesure (`collector.probes.<sonde>.measured_at`) ; --refresh force la mesure.
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from atomic_write import write_text
+from http_bench import bench_facts, benchmark
+from log_scanner import scan_logs
+from probe_cache import ProbeCache, binary_key, content_key, file_key
+from sampler import summarize
+from socket_inventory import list_listeners, socket_facts
+from tls_probe import certificate_files, discover_targets, probe_certificates, tls_facts
+from webroot_scanner import scan, webroot_facts
+from wp_probe import discover_sites, probe_sites, wp_facts
+
+NM = "non_mesurable"
+COLLECTOR_VERSION = "1.0.0"
+
+# Dossier d'état persistant des sondes incrémentales (checkpoints, caches)
+STATE_DIR = Path("facts/.state")
+
+# Format de sortie: mêmes blocs et même ordre que collect_all_facts.sh
+LAYOUT = {
+    "system": ["os_name", "os_version", "uptime_hours", "cpu_load_15m", "ram_free_percent", "disk_used_percent"],
+    "security_infra": ["firewall_present", "fail2ban_present", "ssh_root_login", "open_ports"],
+    "resilience": ["backups_present", "backups_location", "snapshots_present", "cron_system_active"],
+    "logs": ["syslog_errors_recent", "web_5xx_recent"],
+    "web_security": [
+        "ssl_certificate_present", "ssl_certificate_expiry_days", "https_forced",
+        "web_root_permissions", "wp_config_permissions", "suspicious_files_detected",
+    ],
+    "wordpress": [
+        "core_version", "core_eol", "auto_updates_enabled", "total_plugins", "outdated_plugins",
+        "abandoned_plugins", "admin_count", "dormant_admins", "unknown_admins", "db_size_mb",
+        "orphan_tables_detected", "wp_cron_active",
+    ],
+    "stack": ["php_version", "php_eol", "mysql_version", "mysql_eol", "opcache_enabled", "redis_enabled"],
+    "performance": ["response_time_ms", "slow_queries_detected", "cpu_spikes_detected"],
+    "deployment": ["rollback_available"],
+}
+
+# -----------------------------
+# Probe registry
+# -----------------------------
+PROBES = {}
+
+def probe(name, provides, requires=(), timeout=5.0, ttl=0, key=None):
+    """
+    Déclare une sonde. La fonction reçoit {sonde_requise: {fact: valeur}} et
+    retourne {chemin.pointé: valeur} pour tout ou partie de `provides`.
+
+    Avec `ttl` (secondes), le relevé est mis en cache ; `key(deps)` retourne une
+    clé d'invalidation peu coûteuse (ex. probe_cache.binary_key("php")).
+    """
+    def register(fn):
+        PROBES[name] = {
+            "name": name,
+            "fn": fn,
+            "provides": tuple(provides),
+            "requires": tuple(requires),
+            "timeout": timeout,
+            "ttl": ttl,
+            "key": key,
+        }
+        return fn
+    return register
+
+def run_cmd(args, timeout, input_data=None):
+    """stdout d'une commande, ou None (absente, échec, timeout)."""
+    if shutil.which(args[0]) is None:
+        return None
+    try:
+        r = subprocess.run(
+            args, input=input_data, capture_output=True, timeout=timeout,
+            stdin=None if input_data is not None else subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return r.stdout.decode("utf-8", "replace")
+
+def read_text(path):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+# -----------------------------
+# Scheduler
+# -----------------------------
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def run_probes(probes, max_workers=8, timeout_scale=1.0, cache=None):
+    """
+    Exécute les sondes en respectant leurs dépendances.
+    Retourne (valeurs {chemin: valeur}, rapport {sonde: {status, duration_ms}}).
+    Les threads de sonde sont des démons: une sonde bloquée n'empêche ni la
+    fin de la collecte ni la sortie du processus.
+
+    Avec `cache` (ProbeCache), une sonde à ttl dont le relevé est valide n'est
+    pas lancée : statut "cached" et heure de mesure (`measured_at`) au rapport.
+    """
+    for p in probes.values():
+        missing = [r for r in p["requires"] if r not in probes]
+        if missing:
+            raise ValueError(f"Sonde '{p['name']}': dépendance inconnue {missing}")
+
+    done = queue.Queue()
+    pending = dict(probes)
+    running = {}  # nom -> (démarrage, échéance)
+    keys = {}  # nom -> clé de cache de la sonde lancée
+    results = {}
+    report = {}
+
+    def worker(p, deps):
+        start = time.monotonic()
+        try:
+            values, error = p["fn"](deps) or {}, None
+        except Exception as e:
+            values, error = {}, f"{type(e).__name__}: {e}"
+        done.put((p["name"], values, error, time.monotonic() - start))
+
+    while pending or running:
+        served = False
+        for name in list(pending):
+            p = pending[name]
+            if len(running) >= max_workers:
+                break
+            if all(r in results for r in p["requires"]):
+                deps = {r: results[r] for r in p["requires"]}
+                if cache is not None and p["ttl"]:
+                    keys[name] = cache.key(p, deps)
+                    hit = cache.lookup(p, keys[name])
+                    if hit is not None:
+                        del pending[name]
+                        results[name] = {k: v for k, v in hit["values"].items() if k in p["provides"]}
+                        report[name] = {"status": "cached", "duration_ms": 0.0,
+                                        "measured_at": _iso(hit["measured_at"])}
+                        served = True
+                        continue
+                now = time.monotonic()
+                running[name] = (now, now + p["timeout"] * timeout_scale)
+                del pending[name]
+                threading.Thread(target=worker, args=(p, deps), name=f"probe-{name}", daemon=True).start()
+
+        if served and not running:
+            continue  # dépendances satisfaites par le cache: nouveau passage
+        if not running:
+            # Dépendances jamais satisfaites (cycle)
+            for name in pending:
+                results[name] = {}
+                report[name] = {"status": "skipped", "duration_ms": 0.0}
+            break
+
+        wait = max(0.0, min(deadline for _, deadline in running.values()) - time.monotonic())
+        try:
+            name, values, error, elapsed = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (start, deadline) in list(running.items()):
+                if deadline <= now:
+                    del running[name]
+                    results[name] = {}
+                    report[name] = {"status": "timeout", "duration_ms": round((now - start) * 1000, 1)}
+            continue
+        if name not in running:
+            continue  # résultat tardif d'une sonde déjà expirée
+        del running[name]
+        results[name] = {k: v for k, v in values.items() if k in probes[name]["provides"]}
+        report[name] = {"status": "error" if error else "ok", "duration_ms": round(elapsed * 1000, 1)}
+        if error:
+            report[name]["error"] = error
+        elif name in keys:
+            cache.store(name, keys[name], results[name])
+
+    values = {}
+    for name in probes:
+        values.update(results.get(name, {}))
+    return values, report
+
+def build_document(values, report, elapsed):
+    doc = {}
+    for block, keys in LAYOUT.items():
+        doc[block] = {k: values.get(f"{block}.{k}", NM) for k in keys}
+    # Facts hors format historique (ajouts des sondes Python)
+    for path, v in values.items():
+        block, _, key = path.partition(".")
+        doc.setdefault(block, {}).setdefault(key, v)
+    doc["collector"] = {
+        "version": COLLECTOR_VERSION,
+        "collected_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration_ms": round(elapsed * 1000, 1),
+        "probes": report,
+    }
+    return doc
+
+# -----------------------------
+# System probes (lecture directe /proc, statvfs)
+# -----------------------------
+@probe("os_release", provides=["system.os_name", "system.os_version"], timeout=1,
+       ttl=86400, key=lambda deps: content_key("/etc/os-release"))
+def probe_os_release(deps):
+    text = read_text("/etc/os-release")
+    if text is None:
+        return {}
+    fields = {}
+    for line in text.splitlines():
+        k, sep, v = line.partition("=")
+        if sep:
+            fields[k.strip()] = v.strip().strip('"').strip("'")
+    return {
+        "system.os_name": fields.get("ID") or NM,
+        "system.os_version": fields.get("VERSION_ID") or NM,
+    }
+
+@probe("uptime", provides=["system.uptime_hours"], timeout=1)
+def probe_uptime(deps):
+    text = read_text("/proc/uptime")
+    return {"system.uptime_hours": int(float(text.split()[0]) // 3600)} if text else {}
+
+@probe("loadavg", provides=["system.cpu_load_15m", "system.cpu_count"], timeout=1)
+def probe_loadavg(deps):
+    out = {"system.cpu_count": os.cpu_count() or NM}
+    text = read_text("/proc/loadavg")
+    if text:
+        out["system.cpu_load_15m"] = float(text.split()[2])
+    return out
+
+@probe("meminfo", provides=["system.ram_free_percent"], timeout=1)
+def probe_meminfo(deps):
+    text = read_text("/proc/meminfo")
+    if not text:
+        return {}
+    mem = {}
+    for line in text.splitlines():
+        k, _, v = line.partition(":")
+        mem[k] = int(v.split()[0]) if v.split() else 0
+    if not mem.get("MemTotal"):
+        return {}
+    # Même définition que `free` ($4/$2): MemFree / MemTotal
+    return {"system.ram_free_percent": int(mem.get("MemFree", 0) * 100 / mem["MemTotal"])}
+
+@probe("disk", provides=["system.disk_used_percent"], timeout=2)
+def probe_disk(deps):
+    st = os.statvfs("/")
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    avail = st.f_bavail * st.f_frsize
+    if used + avail <= 0:
+        return {}
+    # Même arrondi que `df` (Use% arrondi au supérieur)
+    return {"system.disk_used_percent": int(math.ceil(used * 100 / (used + avail)))}
+
+# -----------------------------
+# Security infra
+# -----------------------------
+@probe("firewall", provides=["security_infra.firewall_present"], timeout=5)
+def probe_firewall(deps):
+    out = run_cmd(["ufw", "status"], timeout=5)
+    # Comme collect_all_facts.sh: ufw absent ou en échec -> false
+    active = out is not None and re.search(r"^Status:\s*active\b", out, re.I | re.M) is not None
+    return {"security_infra.firewall_present": active}
+
+@probe("fail2ban", provides=["security_infra.fail2ban_present"], timeout=1)
+def probe_fail2ban(deps):
+    return {"security_infra.fail2ban_present": True} if shutil.which("fail2ban-client") else {}
+
+@probe("ssh_root", provides=["security_infra.ssh_root_login"], timeout=1)
+def probe_ssh_root(deps):
+    text = read_text("/etc/ssh/sshd_config") or ""
+    return {"security_infra.ssh_root_login": re.search(r"^\s*PermitRootLogin\s+yes", text, re.M) is not None}
+
+@probe("open_ports", provides=[
+    "security_infra.open_ports", "security_infra.exposed_ports", "security_infra.listeners",
+], timeout=5)
+def probe_open_ports(deps):
+    # Lecture directe de /proc/net (sans ss) ; adresse d'écoute et processus conservés
+    listeners = list_listeners()
+    return socket_facts(listeners) if listeners is not None else {}
+
+# -----------------------------
+# Resilience / logs
+# -----------------------------
+@probe("resilience", provides=["resilience.backups_present", "resilience.cron_system_active"], timeout=1)
+def probe_resilience(deps):
+    out = {}
+    if os.path.isdir("/var/backups"):
+        out["resilience.backups_present"] = True
+    if shutil.which("crontab"):
+        out["resilience.cron_system_active"] = True
+    return out
+
+@probe("logs", provides=[
+    "logs.syslog_errors_recent", "logs.syslog_errors_1h", "logs.web_5xx_recent",
+    "logs.web_status_1h", "logs.web_status_24h",
+], timeout=60)
+def probe_logs(deps):
+    # Lecture incrémentale (checkpoints) : seuls les octets ajoutés depuis le run précédent
+    facts, _ = scan_logs(STATE_DIR / "log_scanner.json")
+    return facts
+
+# -----------------------------
+# Performance (tampon du démon sampler.py)
+# -----------------------------
+@probe("sampler", provides=[
+    "performance.cpu_spikes_detected", "performance.cpu_spike_count", "performance.cpu_busy_percent",
+    "performance.load_1m", "performance.ram_free_percent_min", "performance.ram_free_percent_p5",
+    "performance.psi_avg10", "performance.sampler_window_hours",
+], timeout=2)
+def probe_sampler(deps):
+    # Lecture directe du fichier memory-mappé ; {} si le démon ne tourne pas
+    return summarize(STATE_DIR / "sampler.ring")
+
+@probe("http_bench", provides=["performance.response_time_ms", "performance.http_benchmark"],
+       requires=["open_ports"], timeout=15)
+def probe_http_bench(deps):
+    # Rafale bornée (4 connexions, 100 requêtes, 5 s max) sur les vhosts locaux
+    ports = deps["open_ports"].get("security_infra.open_ports")
+    if not isinstance(ports, list):
+        return {}
+    urls = [f"https://{name}:{port}/" for name, port in discover_targets() if str(port) in ports][:8]
+    if not urls and "443" in ports:
+        urls = ["https://localhost/"]
+    elif not urls and "80" in ports:
+        urls = ["http://localhost/"]
+    if not urls:
+        return {}
+    return bench_facts(benchmark(urls, concurrency=4, max_requests=100, duration=5.0, address="127.0.0.1"))
+
+# -----------------------------
+# Web security
+# -----------------------------
+@probe("tls", provides=[
+    "web_security.ssl_certificate_present", "web_security.ssl_certificate_expiry_days",
+    "web_security.ssl_certificates",
+], requires=["open_ports"], timeout=30, ttl=3600,
+   key=lambda deps: [deps["open_ports"].get("security_infra.open_ports"), file_key(*certificate_files())])
+def probe_tls(deps):
+    # Tous les vhosts TLS (nginx/apache) en parallèle ; expiration minimale pour le fact historique
+    targets = discover_targets() or [("localhost", 443)]
+    ports = deps["open_ports"].get("security_infra.open_ports")
+    if isinstance(ports, list):
+        targets = [t for t in targets if str(t[1]) in ports]
+    if not targets:
+        return {}  # aucun port TLS en écoute: inutile d'attendre un handshake
+    results, _ = probe_certificates(STATE_DIR / "tls_probe.json", targets, max_age=3600)
+    return tls_facts(results)
+
+@probe("web_root", provides=[
+    "web_security.web_root_permissions", "web_security.wp_config_permissions",
+    "web_security.wp_configs", "web_security.suspicious_files_detected", "web_security.suspicious_files",
+    "web_security.world_writable_count", "web_security.world_writable_files", "web_security.webroot_scan",
+], timeout=600)
+def probe_web_root(deps):
+    # Parcours parallèle ; seuls les fichiers PHP modifiés depuis le dernier run sont rehachés.
+    # Pas de ttl: fichiers suspects et droits sont des constats de sécurité, toujours re-mesurés
+    # (l'index (inode, mtime, taille) du scanner rend déjà le re-parcours peu coûteux)
+    if not os.path.isdir("/var/www"):
+        return {}
+    result = scan(["/var/www"], STATE_DIR / "webroot_index.sqlite",
+                  signatures=os.environ.get("AUDIT_WEBROOT_SIGNATURES") or None)
+    return webroot_facts(result, "/var/www")
+
+# -----------------------------
+# WordPress (un bootstrap WP-CLI par site, sites en parallèle)
+# -----------------------------
+@probe("wordpress", provides=[
+    "wordpress.core_version", "wordpress.auto_updates_enabled", "wordpress.total_plugins",
+    "wordpress.outdated_plugins", "wordpress.admin_count", "wordpress.db_size_mb",
+    "wordpress.wp_cron_active", "wordpress.sites_count", "wordpress.sites",
+], timeout=120)
+def probe_wordpress(deps):
+    wp_bin = os.environ.get("AUDIT_WP_CLI", "wp")
+    if shutil.which(wp_bin) is None:
+        return {}
+    sites = discover_sites()
+    if not sites:
+        return {}
+    results, _ = probe_sites(STATE_DIR / "wp_probe.json", sites, wp_bin, limit=4, timeout=30)
+    return wp_facts(results)
+
+# -----------------------------
+# Stack
+# -----------------------------
+@probe("php", provides=["stack.php_version"], timeout=5, ttl=86400, key=lambda deps: binary_key("php"))
+def probe_php(deps):
+    out = run_cmd(["php", "-r", "echo PHP_VERSION;"], timeout=5)
+    return {"stack.php_version": out.strip()} if out and out.strip() else {}
+
+@probe("mysql", provides=["stack.mysql_version"], timeout=5, ttl=86400, key=lambda deps: binary_key("mysql"))
+def probe_mysql(deps):
+    out = run_cmd(["mysql", "--version"], timeout=5)
+    cols = (out or "").split()
+    return {"stack.mysql_version": cols[4].strip(",")} if len(cols) >= 5 else {}
+
+# -----------------------------
+# Metrics (textfile collector node_exporter)
+# -----------------------------
+def prometheus_text(collector):
+    """Durée et statut de chaque sonde + durée totale, au format Prometheus."""
+    probes = collector["probes"]
+    lines = [
+        "# HELP audit_collector_probe_duration_seconds Durée de la sonde au dernier run",
+        "# TYPE audit_collector_probe_duration_seconds gauge",
+    ]
+    lines += [f'audit_collector_probe_duration_seconds{{probe="{n}"}} {r["duration_ms"] / 1000:.4f}'
+              for n, r in sorted(probes.items())]
+    lines += [
+        "# HELP audit_collector_probe_status Statut de la sonde au dernier run (1 = statut courant)",
+        "# TYPE audit_collector_probe_status gauge",
+    ]
+    for n, r in sorted(probes.items()):
+        for status in ("ok", "cached", "error", "timeout", "skipped"):
+            lines.append(f'audit_collector_probe_status{{probe="{n}",status="{status}"}} {int(r["status"] == status)}')
+    lines += [
+        "# HELP audit_collector_duration_seconds Durée totale de la collecte",
+        "# TYPE audit_collector_duration_seconds gauge",
+        f"audit_collector_duration_seconds {collector['duration_ms'] / 1000:.4f}",
+        "# HELP audit_collector_last_run_timestamp_seconds Fin de la dernière collecte (epoch)",
+        "# TYPE audit_collector_last_run_timestamp_seconds gauge",
+        f"audit_collector_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+# -----------------------------
+# Main
+# -----------------------------
+def collect(max_workers=8, timeout_scale=1.0, only=None, refresh=False):
+    probes = {n: p for n, p in PROBES.items() if not only or n in only}
+    cache = ProbeCache(STATE_DIR / "probe_cache.json", refresh)
+    start = time.monotonic()
+    values, report = run_probes(probes, max_workers, timeout_scale, cache)
+    doc = build_document(values, report, time.monotonic() - start)
+    cache.save()
+    return doc
+
+def main():
+    global STATE_DIR
+    ap = argparse.ArgumentParser(description="Collecte des facts (sondes parallèles)")
+    ap.add_argument("--out", default="facts/facts_all.json", help="Fichier de sortie, ou '-' pour stdout (une ligne JSON)")
+    ap.add_argument("--ndjson", action="store_true", help='Sortie {"host", "facts"} sur une ligne (pour --stream)')
+    ap.add_argument("--workers", type=int, default=8, help="Sondes exécutées simultanément")
+    ap.add_argument("--timeout-scale", type=float, default=1.0, help="Multiplicateur des timeouts de sonde")
+    ap.add_argument("--probe", action="append", help="Limiter à ces sondes (répétable)")
+    ap.add_argument("--state-dir", default=str(STATE_DIR), help="État persistant des sondes incrémentales")
+    ap.add_argument("--refresh", action="store_true", help="Ignorer le cache des sondes à ttl (tout re-mesurer)")
+    ap.add_argument("--metrics-json", help="Durées et statuts des sondes (JSON)")
+    ap.add_argument("--metrics-prom", help="Durées et statuts des sondes (textfile-collector Prometheus)")
+    args = ap.parse_args()
+
+    STATE_DIR = Path(args.state_dir)
+
+    facts = collect(args.workers, args.timeout_scale, args.probe, args.refresh)
+    doc = {"host": socket.gethostname(), "facts": facts} if args.ndjson else facts
+
+    if args.out == "-":
+        sys.stdout.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n")
+        sys.stdout.flush()
+    else:
+        out = Path(args.out)
+        write_text(out, json.dumps(doc, indent=2, ensure_ascii=False) + "\n")
+        print(f"[OK] facts_all.json généré : {out} ({facts['collector']['duration_ms']} ms)")
+
+    if args.metrics_json:
+        write_text(args.metrics_json, json.dumps(facts["collector"], indent=2) + "\n")
+    if args.metrics_prom:
+        write_text(args.metrics_prom, prometheus_text(facts["collector"]))
+
+    for name, r in facts["collector"]["probes"].items():
+        if r["status"] not in ("ok", "cached"):
+            print(f"[WARN] sonde {name}: {r['status']} ({r['duration_ms']} ms)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
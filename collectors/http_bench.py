@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mesure du temps de réponse HTTP(S) des sites locaux par une rafale bornée.
+
+Quelques workers (connexions keep-alive réutilisées, une par worker et par
+site) envoient des GET sur les URLs données jusqu'à épuisement du budget de
+requêtes ou de la durée maximale. Concurrence, durée et nombre de requêtes sont
+plafonnés (MAX_*) quels que soient les paramètres : la mesure ne doit jamais
+charger un serveur de production.
+
+Les connexions peuvent viser une adresse fixe (127.0.0.1) tout en conservant le
+nom du site (Host + SNI) : les vhosts sont mesurés sans passer par le DNS.
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+from quantiles import percentile
+
+MAX_CONCURRENCY = 16
+MAX_DURATION = 30.0
+MAX_REQUESTS = 1000
+USER_AGENT = "audit-server-engine/http_bench"
+
+# -----------------------------
+# Connections
+# -----------------------------
+def _tls_context():
+    # Mesure locale: certificats auto-signés acceptés (la validité est le rôle de tls_probe)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+def _open(scheme, host, port, address, timeout, ctx):
+    if scheme == "https":
+        conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=ctx)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    if address:
+        sock = socket.create_connection((address, port), timeout)
+        if scheme == "https":
+            sock = ctx.wrap_socket(sock, server_hostname=host)
+        conn.sock = sock  # Host / SNI = nom du site, connexion = adresse imposée
+    return conn
+
+def _parse_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"URL invalide: {url!r}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return parts.scheme, parts.hostname, port, path
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def benchmark(urls, concurrency=4, max_requests=100, duration=5.0, timeout=5.0, address=None):
+    """
+    Rafale de GET sur `urls` (réparties en tourniquet). Retourne:
+      {requests, errors, error_rate, throughput_rps, duration_s, latency_ms: {p50, p95, p99, max}}
+    Une erreur = exception réseau/timeout ou statut >= 500.
+    """
+    targets = [_parse_url(u) for u in urls]
+    if not targets:
+        raise ValueError("Aucune URL à mesurer")
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    max_requests = max(1, min(int(max_requests), MAX_REQUESTS))
+    duration = max(0.1, min(float(duration), MAX_DURATION))
+    ctx = _tls_context()
+
+    lock = threading.Lock()
+    issued = [0]
+    latencies, errors = [], [0]
+    start = time.monotonic()
+    deadline = start + duration
+
+    def next_index():
+        with lock:
+            if issued[0] >= max_requests or time.monotonic() >= deadline:
+                return None
+            issued[0] += 1
+            return issued[0] - 1
+
+    def worker():
+        conns = {}
+        local_lat, local_err = [], 0
+        while True:
+            i = next_index()
+            if i is None:
+                break
+            scheme, host, port, path = targets[i % len(targets)]
+            key = (scheme, host, port)
+            t0 = time.perf_counter()
+            try:
+                conn = conns.get(key)
+                if conn is None:
+                    conn = conns[key] = _open(scheme, host, port, address, timeout, ctx)
+                conn.request("GET", path, headers={"User-Agent": USER_AGENT})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.will_close:
+                    conn.close()
+                    conns.pop(key, None)
+                if resp.status >= 500:
+                    local_err += 1
+                else:
+                    local_lat.append((time.perf_counter() - t0) * 1000)
+            except (OSError, http.client.HTTPException):
+                local_err += 1
+                bad = conns.pop(key, None)
+                if bad is not None:
+                    bad.close()
+        for conn in conns.values():
+            conn.close()
+        with lock:
+            latencies.extend(local_lat)
+            errors[0] += local_err
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(duration + timeout + 1)
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    total = len(latencies) + errors[0]
+    return {
+        "requests": total,
+        "errors": errors[0],
+        "error_rate": round(100.0 * errors[0] / total, 2) if total else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "duration_s": round(elapsed, 3),
+        "latency_ms": {
+            "p50": percentile(latencies, 50, 1),
+            "p95": percentile(latencies, 95, 1),
+            "p99": percentile(latencies, 99, 1),
+            "max": round(latencies[-1], 1) if latencies else None,
+        },
+    }
+
+def bench_facts(result):
+    """Facts performance: temps de réponse médian (fact historique) + détail de la mesure."""
+    if not result["requests"]:
+        return {}
+    facts = {"performance.http_benchmark": result}
+    if result["latency_ms"]["p50"] is not None:
+        facts["performance.response_time_ms"] = result["latency_ms"]["p50"]
+    return facts
+
+def main():
+    ap = argparse.ArgumentParser(description="Rafale HTTP bornée: latences p50/p95/p99, débit, taux d'erreur")
+    ap.add_argument("url", nargs="+", help="URLs à mesurer (http/https)")
+    ap.add_argument("--concurrency", type=int, default=4, help=f"Connexions simultanées (max {MAX_CONCURRENCY})")
+    ap.add_argument("--requests", type=int, default=100, help=f"Budget de requêtes (max {MAX_REQUESTS})")
+    ap.add_argument("--duration", type=float, default=5.0, help=f"Durée maximale en secondes (max {MAX_DURATION:g})")
+    ap.add_argument("--timeout", type=float, default=5.0, help="Timeout par requête")
+    ap.add_argument("--address", help="Adresse de connexion imposée (ex. 127.0.0.1), Host/SNI inchangés")
+    args = ap.parse_args()
+
+    result = benchmark(args.url, args.concurrency, args.requests, args.duration, args.timeout, args.address)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
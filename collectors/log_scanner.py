@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scanner de logs incrémental avec points de reprise.
+
+Pour chaque fichier lu, un checkpoint (device, inode, empreinte de l'en-tête,
+offset) est conservé : un run suivant ne lit que les octets ajoutés depuis.
+- rotation (syslog -> syslog.1) : l'inode suit le fichier renommé, la fin
+  non lue est reprise puis le nouveau fichier est lu depuis 0
+- archives .gz : reconnues par l'empreinte de leur contenu décompressé ;
+  une archive lue jusqu'au bout est marquée terminée (inode, taille, mtime)
+  et n'est plus jamais rouverte
+- copytruncate : fichier plus court que l'offset -> relecture depuis 0
+
+Les occurrences sont agrégées par tranches de temps (horodatage de la ligne),
+ce qui donne de vrais compteurs glissants (1h / 24h) par classe.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from atomic_write import write_text
+
+STATE_VERSION = 1
+CHUNK_SIZE = 4 * 1024 * 1024
+HEAD_SIZE = 1024
+BUCKET_SECONDS = 300
+RETENTION_SECONDS = 86400
+
+# -----------------------------
+# Log families
+# -----------------------------
+# nginx/apache (combined): [10/Oct/2000:13:55:36 -0700] "GET / HTTP/1.1" 503 ...
+_ACCESS_RE = re.compile(rb'\[(\d{2}/[A-Za-z]{3}/\d{4}:\d{2}:\d{2}):\d{2} ([+-]\d{4})\] "[^"\n]*" (\d)\d\d ')
+# syslog: "Oct 10 13:55:36 host ..." ou ISO "2024-01-16T12:00:00.123+00:00 host ..."
+_SYSLOG_ERR_RE = re.compile(
+    rb"(?mi)^([a-z]{3} [ \d]\d \d\d:\d\d|\d{4}-\d\d-\d\dT\d\d:\d\d(?::\d\d(?:\.\d+)?)?(?:Z|[+-]\d\d:?\d\d)?)?[^\n]*?error"
+)
+
+def _parse_access_minute(minute, tz):
+    return datetime.strptime(f"{minute} {tz}", "%d/%b/%Y:%H:%M %z").timestamp()
+
+def _parse_syslog_minute(prefix, now):
+    if not prefix:
+        return now
+    if prefix[:1].isdigit():
+        dt = datetime.strptime(prefix[:16], "%Y-%m-%dT%H:%M")
+        tz = re.search(r"(Z|[+-]\d\d:?\d\d)$", prefix[16:])
+        if tz and tz.group(1) == "Z":
+            dt = dt.replace(tzinfo=timezone.utc)
+        elif tz:
+            dt = dt.replace(tzinfo=datetime.strptime(tz.group(1).replace(":", ""), "%z").tzinfo)
+        return dt.timestamp()
+    # RFC3164: pas d'année, heure locale
+    year = time.localtime(now).tm_year
+    ts = datetime.strptime(f"{year} {prefix}", "%Y %b %d %H:%M").timestamp()
+    if ts > now + 86400:
+        ts = datetime.strptime(f"{year - 1} {prefix}", "%Y %b %d %H:%M").timestamp()
+    return ts
+
+def count_access(data, now, cache):
+    """{(epoch_minute, classe): n} pour un bloc de lignes d'access log."""
+    out = Counter()
+    for (minute, tz, cls), n in Counter(_ACCESS_RE.findall(data)).items():
+        key = (minute, tz)
+        if key not in cache:
+            try:
+                cache[key] = _parse_access_minute(minute.decode(), tz.decode())
+            except ValueError:
+                cache[key] = now
+        out[(cache[key], f"{cls.decode()}xx")] += n
+    return out
+
+def count_syslog_errors(data, now, cache):
+    out = Counter()
+    for prefix, n in Counter(_SYSLOG_ERR_RE.findall(data)).items():
+        if prefix not in cache:
+            try:
+                cache[prefix] = _parse_syslog_minute(prefix.decode(), now)
+            except ValueError:
+                cache[prefix] = now
+        out[(cache[prefix], "error")] += n
+    return out
+
+# -----------------------------
+# File handling
+# -----------------------------
+def _open(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def _head(path):
+    try:
+        with _open(path) as f:
+            data = f.read(HEAD_SIZE)
+    except (OSError, EOFError):
+        return None, 0
+    return hashlib.sha1(data).hexdigest(), len(data)
+
+def _head_matches(path, cp):
+    try:
+        with _open(path) as f:
+            data = f.read(cp["head_len"])
+    except (OSError, EOFError):
+        return False
+    return len(data) == cp["head_len"] and hashlib.sha1(data).hexdigest() == cp["head"]
+
+def rotated_siblings(path):
+    """Fichier courant puis ses rotations (path.1, path.2.gz, path-20240101, ...)."""
+    siblings = [p for p in glob.glob(glob.escape(path) + "[.-]*") if os.path.isfile(p)]
+    files = [path] if os.path.isfile(path) else []
+    return files + sorted(siblings, key=lambda p: os.stat(p).st_mtime, reverse=True)
+
+class LogScanner:
+    def __init__(self, state_path: Path, bucket_seconds=BUCKET_SECONDS, retention=RETENTION_SECONDS):
+        self.state_path = Path(state_path)
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.state = {"version": STATE_VERSION, "families": {}}
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            if state.get("version") == STATE_VERSION:
+                self.state = state
+        except (OSError, ValueError):
+            pass
+        self.stats = {"files": 0, "bytes_read": 0, "bytes_skipped": 0, "archives_done": 0}
+
+    def save(self):
+        write_text(self.state_path, json.dumps(self.state, separators=(",", ":")))
+
+    def _find_checkpoint(self, checkpoints, path, st):
+        gz = path.endswith(".gz")
+        for i, cp in enumerate(checkpoints):
+            if not gz and (cp["dev"], cp["inode"]) != (st.st_dev, st.st_ino):
+                continue
+            if _head_matches(path, cp):
+                return i
+        return None
+
+    @staticmethod
+    def _find_done(checkpoints, st):
+        """Archive .gz déjà lue en entier (mêmes inode, taille et mtime) : rien à rouvrir."""
+        for i, cp in enumerate(checkpoints):
+            if (cp.get("done") and (cp["dev"], cp["inode"]) == (st.st_dev, st.st_ino)
+                    and cp.get("size") == st.st_size and cp.get("mtime") == st.st_mtime_ns):
+                return i
+        return None
+
+    def _read_new(self, path, offset, counter, now, cache):
+        """
+        Lit depuis `offset` jusqu'à la dernière fin de ligne. Retourne
+        (nouvel offset, fin de fichier atteinte sans erreur).
+        """
+        with _open(path) as f:
+            try:
+                if offset:
+                    if path.endswith(".gz"):
+                        remaining = offset
+                        while remaining > 0:  # gzip: pas de seek direct, on décompresse sans analyser
+                            skipped = len(f.read(min(CHUNK_SIZE, remaining)))
+                            if not skipped:
+                                return offset, True
+                            remaining -= skipped
+                    else:
+                        f.seek(offset)
+                self.stats["bytes_skipped"] += offset
+                carry = b""
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    data = carry + chunk
+                    cut = data.rfind(b"\n") + 1
+                    carry = data[cut:]
+                    if cut:
+                        self._bucketize(counter(data[:cut], now, cache))
+                        offset += cut
+                        self.stats["bytes_read"] += cut
+            except EOFError:
+                # Archive tronquée (compression en cours) : reprise au prochain run
+                return offset, False
+        return offset, True
+
+    def _bucketize(self, counts):
+        buckets = self._buckets
+        for (ts, cls), n in counts.items():
+            b = str(int(ts // self.bucket_seconds * self.bucket_seconds))
+            slot = buckets.setdefault(b, {})
+            slot[cls] = slot.get(cls, 0) + n
+
+    def scan(self, family, paths, counter, now=None):
+        """
+        Lit les octets nouveaux de `paths` (fichiers courants + rotations) et met
+        à jour les compteurs horodatés de la famille `family`.
+        """
+        now = now or time.time()
+        fam = self.state["families"].setdefault(family, {"checkpoints": [], "buckets": {}})
+        self._buckets = fam["buckets"]
+        old = fam["checkpoints"]
+        kept = []
+        cache = {}
+
+        # Fichiers non compressés d'abord: pendant une compression, l'original
+        # garde son checkpoint et l'archive identique est ignorée
+        for path in sorted(paths, key=lambda p: p.endswith(".gz")):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            gz = path.endswith(".gz")
+            if gz:
+                idx = self._find_done(old, st)
+                if idx is not None:
+                    kept.append(old.pop(idx))
+                    self.stats["archives_done"] += 1
+                    continue
+            idx = self._find_checkpoint(old, path, st)
+            if idx is not None:
+                cp = old.pop(idx)
+            elif gz and self._find_checkpoint(kept, path, st) is not None:
+                continue
+            else:
+                # Fichier inconnu: une archive plus ancienne que la rétention n'apporte rien
+                if st.st_mtime < now - self.retention:
+                    continue
+                head, head_len = _head(path)
+                if head is None:
+                    continue
+                cp = {"head": head, "head_len": head_len, "offset": 0}
+            if not gz and st.st_size < cp["offset"]:
+                cp["offset"] = 0  # copytruncate
+            cp["offset"], eof = self._read_new(path, cp["offset"], counter, now, cache)
+            if cp["head_len"] < HEAD_SIZE:
+                cp["head"], cp["head_len"] = _head(path)
+            cp.update(path=path, dev=st.st_dev, inode=st.st_ino)
+            if gz and eof:
+                # Une archive ne grandit plus: terminée tant que inode/taille/mtime sont inchangés
+                cp.update(done=True, size=st.st_size, mtime=st.st_mtime_ns)
+            kept.append(cp)
+            self.stats["files"] += 1
+
+        fam["checkpoints"] = kept
+        horizon = now - self.retention - self.bucket_seconds
+        fam["buckets"] = {b: v for b, v in fam["buckets"].items() if int(b) >= horizon}
+        return fam
+
+    def window(self, family, seconds, now=None):
+        """Somme par classe des tranches des `seconds` dernières secondes."""
+        now = now or time.time()
+        fam = self.state["families"].get(family)
+        if fam is None:
+            return None
+        since = now - seconds
+        total = Counter()
+        for b, counts in fam["buckets"].items():
+            if int(b) + self.bucket_seconds > since:
+                total.update(counts)
+        return dict(total)
+
+# -----------------------------
+# Facts
+# -----------------------------
+def scan_logs(state_path, syslog="/var/log/syslog", web_log_dir="/var/log/nginx", now=None):
+    """
+    Facts du bloc `logs` (None si la source n'existe pas):
+      syslog_errors_recent / syslog_errors_1h : lignes "error" sur 24h / 1h
+      web_5xx_recent : réponses 5xx sur 24h
+      web_status_1h / web_status_24h : réponses par classe {"2xx": n, ...}
+    """
+    now = now or time.time()
+    scanner = LogScanner(state_path)
+    facts = {}
+
+    if os.access(syslog, os.R_OK):
+        scanner.scan("syslog", rotated_siblings(syslog), count_syslog_errors, now)
+        facts["logs.syslog_errors_recent"] = scanner.window("syslog", 86400, now).get("error", 0)
+        facts["logs.syslog_errors_1h"] = scanner.window("syslog", 3600, now).get("error", 0)
+
+    if os.path.isdir(web_log_dir):
+        paths = []
+        for live in sorted(glob.glob(os.path.join(web_log_dir, "*.log"))):
+            if "error" not in os.path.basename(live):
+                paths.extend(rotated_siblings(live))
+        scanner.scan("web", paths, count_access, now)
+        classes = ("2xx", "3xx", "4xx", "5xx")
+        day = scanner.window("web", 86400, now)
+        hour = scanner.window("web", 3600, now)
+        facts["logs.web_5xx_recent"] = day.get("5xx", 0)
+        facts["logs.web_status_24h"] = {c: day.get(c, 0) for c in classes}
+        facts["logs.web_status_1h"] = {c: hour.get(c, 0) for c in classes}
+
+    scanner.save()
+    return facts, scanner.stats
+
+def main():
+    ap = argparse.ArgumentParser(description="Scan incrémental des logs (syslog, access logs web)")
+    ap.add_argument("--state", default="facts/.state/log_scanner.json", help="Fichier de checkpoints")
+    ap.add_argument("--syslog", default="/var/log/syslog")
+    ap.add_argument("--web-log-dir", default="/var/log/nginx")
+    args = ap.parse_args()
+
+    start = time.monotonic()
+    facts, stats = scan_logs(Path(args.state), args.syslog, args.web_log_dir)
+    print(json.dumps(facts, indent=2))
+    print(
+        f"[OK] {stats['files']} fichiers, {stats['bytes_read']} octets lus, "
+        f"{stats['bytes_skipped']} repris depuis checkpoint, {stats['archives_done']} archives terminées ignorées, "
+        f"{time.monotonic() - start:.2f}s"
+    )
+
+if __name__ == "__main__":
+    main()
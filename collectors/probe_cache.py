@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache des sondes à évolution lente (versions PHP / MySQL, OS, certificats).
+
+Chaque sonde déclare une durée de validité (ttl, secondes) et une clé
+d'invalidation peu coûteuse : date de modification et taille du binaire
+interrogé, contenu de /etc/os-release, dates des fichiers de certificat, ...
+Tant que la clé est inchangée et que le relevé a moins de `ttl` secondes, la
+valeur en cache est servie sans rien exécuter, avec l'heure de sa mesure.
+
+La fonction de clé reçoit les valeurs des sondes requises (dépendances) et
+peut en retenir une partie : un relevé TLS n'est pas réutilisé si les ports en
+écoute ont changé.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from atomic_write import write_text
+
+CACHE_VERSION = 1
+
+# -----------------------------
+# Invalidation keys
+# -----------------------------
+def file_key(*paths):
+    """[(chemin, mtime_ns, taille)] ; None pour un fichier absent."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            out.append((path, None))
+            continue
+        out.append((path, st.st_mtime_ns, st.st_size))
+    return out
+
+def binary_key(name):
+    """Binaire résolu dans le PATH (lien suivi) : une mise à jour du paquet change la clé."""
+    path = shutil.which(name)
+    return file_key(os.path.realpath(path)) if path else None
+
+def content_key(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+# -----------------------------
+# Cache
+# -----------------------------
+class ProbeCache:
+    def __init__(self, path, refresh=False):
+        # refresh: aucune entrée servie, toutes les sondes mesurées puis remises en cache
+        self.path = Path(path)
+        self.refresh = refresh
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data["probes"]
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(probe, deps):
+        """Empreinte de la clé d'invalidation de la sonde ; None si incalculable."""
+        try:
+            raw = probe["key"](deps) if probe["key"] else None
+            return hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        except Exception:
+            return None
+
+    def lookup(self, probe, key, now=None):
+        """Entrée {values, measured_at} valide pour cette clé, ou None."""
+        entry = self.entries.get(probe["name"])
+        now = now or time.time()
+        if (self.refresh or key is None or entry is None or entry["key"] != key
+                or now - entry["measured_at"] >= probe["ttl"]):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry
+
+    def store(self, name, key, values, now=None):
+        if key is not None:
+            self.entries[name] = {"key": key, "measured_at": now or time.time(), "values": values}
+
+    def save(self):
+        write_text(self.path, json.dumps({"version": CACHE_VERSION, "probes": self.entries},
+                                         ensure_ascii=False, separators=(",", ":")))
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Percentiles partagés par les collecteurs (sampler, http_bench), le moteur
+(résumé de flotte, /status du service d'ingestion) et les benchmarks : un
+même « p50 / p95 / p99 » partout.
+
+Interpolation linéaire entre les deux rangs encadrants (méthode « linear » de
+numpy) : p50 d'une série paire = moyenne des deux valeurs centrales.
+"""
+
+def percentile(sorted_values, pct, ndigits=None):
+    """
+    Percentile `pct` (0-100) d'une liste déjà triée ; None si elle est vide.
+    `ndigits`: arrondi du résultat (round), aucun par défaut.
+    """
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    value = sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+    return value if ndigits is None else round(value, ndigits)
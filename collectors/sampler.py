@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Échantillonneur léger (démon) : CPU, charge, mémoire et pression (PSI).
+
+À intervalle fixe, /proc/stat, /proc/loadavg, /proc/meminfo et /proc/pressure/*
+sont relus (descripteurs gardés ouverts, pread) et un enregistrement de taille
+fixe est écrit dans un tampon circulaire sur disque, memory-mappé. Le
+collecteur lit ce fichier directement (pas d'IPC) et en tire percentiles,
+nombre de pics CPU et chiffres de stall PSI.
+
+Format du fichier: en-tête (magic, version, capacité, intervalle, compteur
+d'écritures) puis `capacité` enregistrements. Le compteur n'est incrémenté
+qu'une fois l'enregistrement écrit ; le lecteur ignore l'emplacement en cours
+de réécriture.
+
+    python3 collectors/sampler.py run --interval 10
+    python3 collectors/sampler.py summary --window 3600
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import signal
+import struct
+import sys
+import time
+from pathlib import Path
+
+from atomic_write import atomic_open
+from quantiles import percentile
+
+MAGIC = b"AUDSMPL1"
+HEADER = struct.Struct("<8sIIdQ")     # magic, version, capacité, intervalle, écritures
+RECORD = struct.Struct("<d7f")        # ts, cpu_busy, load1, ram_free, psi cpu/mem/io some, mem full
+RING_VERSION = 1
+DEFAULT_RING = "facts/.state/sampler.ring"
+DEFAULT_INTERVAL = 10.0
+DEFAULT_CAPACITY = 8640               # 24h à 10s
+SPIKE_THRESHOLD = 90.0                # % CPU occupé
+
+FIELDS = ("ts", "cpu_busy", "load1", "ram_free", "psi_cpu", "psi_mem", "psi_io", "psi_mem_full")
+NAN = float("nan")
+
+# -----------------------------
+# Ring buffer
+# -----------------------------
+def _ring_size(capacity):
+    return HEADER.size + capacity * RECORD.size
+
+class Ring:
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, interval=DEFAULT_INTERVAL, create=False):
+        self.path = Path(path)
+        if create and not self._compatible(capacity):
+            with atomic_open(self.path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, RING_VERSION, capacity, interval, 0))
+                f.truncate(_ring_size(capacity))
+        self._fd = os.open(self.path, os.O_RDWR if create else os.O_RDONLY)
+        access = mmap.ACCESS_WRITE if create else mmap.ACCESS_READ
+        self.mm = mmap.mmap(self._fd, 0, access=access)
+        magic, version, self.capacity, self.interval, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != RING_VERSION or len(self.mm) < _ring_size(self.capacity):
+            self.close()
+            raise ValueError(f"{self.path}: tampon d'échantillons invalide")
+        if create and self.interval != interval:
+            HEADER.pack_into(self.mm, 0, MAGIC, RING_VERSION, self.capacity, interval, self.count)
+            self.interval = interval
+
+    def _compatible(self, capacity):
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, cap, _, _ = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return magic == MAGIC and version == RING_VERSION and cap == capacity
+
+    @property
+    def count(self):
+        return HEADER.unpack_from(self.mm, 0)[4]
+
+    def append(self, record):
+        n = self.count
+        RECORD.pack_into(self.mm, HEADER.size + (n % self.capacity) * RECORD.size, *record)
+        struct.pack_into("<Q", self.mm, HEADER.size - 8, n + 1)
+
+    def records(self):
+        """Enregistrements du plus ancien au plus récent (emplacement en cours d'écriture exclu)."""
+        n = self.count
+        first = max(0, n - self.capacity + 1)
+        out = []
+        for i in range(first, n):
+            out.append(RECORD.unpack_from(self.mm, HEADER.size + (i % self.capacity) * RECORD.size))
+        return out
+
+    def close(self):
+        self.mm.close()
+        os.close(self._fd)
+
+# -----------------------------
+# /proc readers (descripteurs persistants)
+# -----------------------------
+class ProcReader:
+    PSI = ("cpu", "memory", "io")
+
+    def __init__(self, proc="/proc"):
+        self.fds = {}
+        for name in ("stat", "loadavg", "meminfo"):
+            self.fds[name] = os.open(os.path.join(proc, name), os.O_RDONLY)
+        for name in self.PSI:
+            try:
+                self.fds[f"psi_{name}"] = os.open(os.path.join(proc, "pressure", name), os.O_RDONLY)
+            except OSError:
+                pass  # noyau sans PSI
+        self.prev_cpu = None
+
+    def _read(self, name):
+        return os.pread(self.fds[name], 65536, 0).decode("ascii", "replace")
+
+    def cpu_busy(self):
+        line = self._read("stat").split("\n", 1)[0].split()
+        vals = [int(x) for x in line[1:]]
+        idle = vals[3] + (vals[4] if len(vals) > 4 else 0)  # idle + iowait
+        total = sum(vals[:8])  # guest déjà compté dans user
+        prev, self.prev_cpu = self.prev_cpu, (idle, total)
+        if prev is None or total == prev[1]:
+            return NAN
+        return round(100.0 * (1 - (idle - prev[0]) / (total - prev[1])), 2)
+
+    def load1(self):
+        return float(self._read("loadavg").split()[0])
+
+    def ram_free(self):
+        mem = {}
+        for line in self._read("meminfo").splitlines():
+            key, _, rest = line.partition(":")
+            if key in ("MemTotal", "MemAvailable", "MemFree"):
+                mem[key] = int(rest.split()[0])
+        total = mem.get("MemTotal")
+        avail = mem.get("MemAvailable", mem.get("MemFree"))
+        return round(100.0 * avail / total, 2) if total and avail is not None else NAN
+
+    def psi(self, name, kind="some"):
+        fd = f"psi_{name}"
+        if fd not in self.fds:
+            return NAN
+        for line in self._read(fd).splitlines():
+            if line.startswith(kind):
+                return float(line.split()[1].partition("=")[2])  # avg10
+        return NAN
+
+    def sample(self, now=None):
+        return (
+            now or time.time(), self.cpu_busy(), self.load1(), self.ram_free(),
+            self.psi("cpu"), self.psi("memory"), self.psi("io"), self.psi("memory", "full"),
+        )
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+
+def run(ring_path, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY, iterations=None):
+    """Boucle du démon: un échantillon toutes les `interval` secondes (dérive compensée)."""
+    ring = Ring(ring_path, capacity, interval, create=True)
+    reader = ProcReader()
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(1))
+    reader.cpu_busy()  # référence pour le premier delta
+    next_tick = time.monotonic() + interval
+    done = 0
+    try:
+        while not stop and (iterations is None or done < iterations):
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_tick += interval
+            ring.append(reader.sample())
+            done += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+        ring.close()
+
+# -----------------------------
+# Summary (côté collecteur)
+# -----------------------------
+def _column(records, field):
+    i = FIELDS.index(field)
+    return [r[i] for r in records if not math.isnan(r[i])]
+
+def _spike_episodes(records, threshold):
+    # Un pic = passage au-dessus du seuil (échantillons consécutifs = un seul pic)
+    episodes, above = 0, False
+    for r in records:
+        busy = r[1]
+        if math.isnan(busy):
+            continue
+        if busy >= threshold and not above:
+            episodes += 1
+        above = busy >= threshold
+    return episodes
+
+def summarize(ring_path, window=86400, now=None, spike_threshold=SPIKE_THRESHOLD, min_samples=6):
+    """
+    Facts dérivés des échantillons des `window` dernières secondes ;
+    {} si le démon ne tourne pas (fichier absent) ou trop peu d'échantillons.
+    """
+    now = now or time.time()
+    try:
+        ring = Ring(ring_path)
+    except (OSError, ValueError):
+        return {}
+    try:
+        # Échantillons trop anciens (démon arrêté): ignorés
+        records = [r for r in ring.records() if now - window <= r[0] <= now + ring.interval]
+        interval = ring.interval
+    finally:
+        ring.close()
+    if len(records) < min_samples:
+        return {}
+
+    def pcts(field):
+        values = sorted(_column(records, field))
+        if not values:
+            return None
+        return {"p50": percentile(values, 50, 2), "p95": percentile(values, 95, 2),
+                "p99": percentile(values, 99, 2), "max": round(values[-1], 2)}
+
+    facts = {
+        "performance.sampler_window_hours": round(len(records) * interval / 3600, 2),
+        "performance.cpu_busy_percent": pcts("cpu_busy"),
+        "performance.load_1m": pcts("load1"),
+    }
+    busy = _column(records, "cpu_busy")
+    if busy:
+        spikes = _spike_episodes(records, spike_threshold)
+        facts["performance.cpu_spikes_detected"] = spikes > 0
+        facts["performance.cpu_spike_count"] = spikes
+    ram = sorted(_column(records, "ram_free"))
+    if ram:
+        facts["performance.ram_free_percent_min"] = round(ram[0], 2)
+        facts["performance.ram_free_percent_p5"] = percentile(ram, 5, 2)
+    psi = {}
+    for field, key in (("psi_cpu", "cpu_some"), ("psi_mem", "memory_some"),
+                       ("psi_io", "io_some"), ("psi_mem_full", "memory_full")):
+        values = _column(records, field)
+        if values:
+            psi[key] = {"avg": round(sum(values) / len(values), 2), "max": round(max(values), 2)}
+    if psi:
+        facts["performance.psi_avg10"] = psi
+    return {k: v for k, v in facts.items() if v is not None}
+
+def main():
+    ap = argparse.ArgumentParser(description="Échantillonneur CPU / mémoire / PSI (tampon circulaire mmap)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="Démon d'échantillonnage")
+    p.add_argument("--ring", default=DEFAULT_RING)
+    p.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Secondes entre deux échantillons")
+    p.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Nombre d'échantillons conservés")
+    p.add_argument("--iterations", type=int, help="S'arrêter après N échantillons")
+    p = sub.add_parser("summary", help="Facts calculés sur la fenêtre")
+    p.add_argument("--ring", default=DEFAULT_RING)
+    p.add_argument("--window", type=float, default=86400, help="Fenêtre (secondes)")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        if args.interval <= 0 or args.capacity < 2:
+            print("[ERREUR] --interval > 0 et --capacity >= 2 requis", file=sys.stderr)
+            sys.exit(1)
+        run(args.ring, args.interval, args.capacity, args.iterations)
+    else:
+        facts = summarize(args.ring, args.window)
+        if not facts:
+            print(f"[WARN] Pas assez d'échantillons dans {args.ring}", file=sys.stderr)
+        print(json.dumps(facts, indent=2))
+
+if __name__ == "__main__":
+    main()
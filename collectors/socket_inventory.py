@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inventaire des sockets en écoute, lu directement dans /proc (sans ss, awk ni jq).
+
+- /proc/net/tcp, tcp6 : sockets en état LISTEN
+- /proc/net/udp, udp6 : sockets liées sans pair (état 07)
+- un seul parcours de /proc/*/fd associe chaque inode de socket à son processus
+
+Chaque écoute est décrite par {proto, address, port, pid, process} ; l'adresse
+permet de distinguer 127.0.0.1:3306 (local) de 0.0.0.0:3306 (exposé).
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import socket
+
+PROC_NET = "/proc/net"
+TCP_LISTEN = "0A"
+UDP_UNCONNECTED = "07"
+
+# -----------------------------
+# /proc/net parsing
+# -----------------------------
+def _decode_address(hex_addr):
+    """'0100007F:0CEA' -> ('127.0.0.1', 3306) ; adresses IPv6 en 4 mots little-endian."""
+    host, port = hex_addr.split(":")
+    raw = bytes.fromhex(host)
+    if len(raw) == 4:
+        addr = socket.inet_ntop(socket.AF_INET, raw[::-1])
+    else:
+        words = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+        addr = socket.inet_ntop(socket.AF_INET6, words)
+    return addr, int(port, 16)
+
+def read_sockets(proto, proc_net=PROC_NET):
+    """Sockets en écoute d'une table /proc/net (tcp, tcp6, udp, udp6): [(adresse, port, inode)]."""
+    wanted = TCP_LISTEN if proto.startswith("tcp") else UDP_UNCONNECTED
+    try:
+        with open(os.path.join(proc_net, proto), encoding="ascii") as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return None
+    out = []
+    for line in lines:
+        cols = line.split()
+        # sl local_address rem_address st tx:rx tr:when retrnsmt uid timeout inode
+        if len(cols) < 10 or cols[3] != wanted:
+            continue
+        addr, port = _decode_address(cols[1])
+        out.append((addr, port, int(cols[9])))
+    return out
+
+# -----------------------------
+# inode -> process
+# -----------------------------
+def map_inodes(inodes, proc="/proc"):
+    """{inode: (pid, nom)} par un seul parcours de /proc/*/fd, arrêté dès que tout est trouvé."""
+    found = {}
+    remaining = set(inodes)
+    if not remaining:
+        return found
+    try:
+        pids = [e.name for e in os.scandir(proc) if e.name.isdigit()]
+    except OSError:
+        return found
+    for pid in pids:
+        fd_dir = os.path.join(proc, pid, "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue  # processus terminé ou non lisible (non root)
+        name = None
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if not target.startswith("socket:["):
+                continue
+            inode = int(target[8:-1])
+            if inode in remaining:
+                if name is None:
+                    try:
+                        with open(os.path.join(proc, pid, "comm"), encoding="utf-8", errors="replace") as f:
+                            name = f.read().strip()
+                    except OSError:
+                        name = ""
+                found[inode] = (int(pid), name or None)
+                remaining.discard(inode)
+        if not remaining:
+            break
+    return found
+
+# -----------------------------
+# Inventory + facts
+# -----------------------------
+def is_loopback(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_loopback
+
+def list_listeners(protos=("tcp", "tcp6", "udp", "udp6"), proc="/proc"):
+    """Écoutes triées [{proto, address, port, pid, process}], None si /proc/net est illisible."""
+    raw = []
+    readable = False
+    for proto in protos:
+        entries = read_sockets(proto, os.path.join(proc, "net"))
+        if entries is None:
+            continue
+        readable = True
+        family = "udp" if proto.startswith("udp") else "tcp"
+        raw.extend((family, addr, port, inode) for addr, port, inode in entries)
+    if not readable:
+        return None
+
+    owners = map_inodes({inode for *_, inode in raw}, proc)
+    listeners = {}
+    for family, addr, port, inode in raw:
+        pid, name = owners.get(inode, (None, None))
+        # Un même service peut écouter via plusieurs sockets (SO_REUSEPORT, workers)
+        listeners.setdefault((family, addr, port), {
+            "proto": family, "address": addr, "port": port, "pid": pid, "process": name,
+        })
+    return [listeners[k] for k in sorted(listeners, key=lambda k: (k[2], k[0], k[1]))]
+
+def _port_list(ports):
+    return sorted({str(p) for p in ports}, key=lambda p: (len(p), p))
+
+def socket_facts(listeners):
+    """
+    security_infra.open_ports : ports TCP en écoute (format historique, toutes adresses)
+    security_infra.exposed_ports : ports TCP en écoute hors loopback
+    security_infra.listeners : détail structuré (TCP et UDP)
+    """
+    tcp = [l for l in listeners if l["proto"] == "tcp"]
+    return {
+        "security_infra.open_ports": _port_list(l["port"] for l in tcp),
+        "security_infra.exposed_ports": _port_list(l["port"] for l in tcp if not is_loopback(l["address"])),
+        "security_infra.listeners": listeners,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Sockets en écoute (lecture directe de /proc/net)")
+    ap.add_argument("--proc", default="/proc", help="Racine procfs")
+    ap.add_argument("--json", action="store_true", help="Sortie JSON (facts)")
+    args = ap.parse_args()
+
+    listeners = list_listeners(proc=args.proc)
+    if listeners is None:
+        raise SystemExit(f"[ERREUR] {args.proc}/net illisible")
+    if args.json:
+        print(json.dumps(socket_facts(listeners), indent=2))
+    else:
+        for l in listeners:
+            scope = "local " if is_loopback(l["address"]) else "exposé"
+            print(f"{l['proto']:<4} {l['address']:>39}:{l['port']:<5} {scope}  {l['process'] or '?'} ({l['pid'] or '?'})")
+
+if __name__ == "__main__":
+    main()
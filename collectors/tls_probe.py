@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sonde TLS multi-vhost.
+
+Les noms de serveur (SNI) sont découverts dans les configurations nginx et
+apache (blocs TLS uniquement), puis tous les handshakes sont faits en
+parallèle (asyncio) vers l'hôte local, avec une limite de connexions et un
+timeout par nom. Le certificat n'est pas vérifié (auto-signé accepté) : seules
+son empreinte et sa date d'expiration sont relevées.
+
+Un cache (empreinte, date d'expiration, date du relevé) est conservé entre les
+runs : un nom relevé depuis moins de `max_age` secondes n'est pas recontacté,
+et l'expiration d'une empreinte déjà connue n'est pas re-décodée.
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import re
+import ssl
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from atomic_write import write_text
+
+CACHE_VERSION = 1
+
+NGINX_CONF_GLOBS = (
+    "/etc/nginx/nginx.conf",
+    "/etc/nginx/conf.d/*.conf",
+    "/etc/nginx/sites-enabled/*",
+)
+APACHE_CONF_GLOBS = (
+    "/etc/apache2/sites-enabled/*",
+    "/etc/apache2/conf-enabled/*.conf",
+    "/etc/httpd/conf/httpd.conf",
+    "/etc/httpd/conf.d/*.conf",
+)
+
+# -----------------------------
+# Discovery (nginx / apache)
+# -----------------------------
+_NGINX_SERVER_RE = re.compile(r"(?m)^\s*server\s*\{")
+_NGINX_LISTEN_RE = re.compile(r"(?m)^\s*listen\s+([^;]+);")
+_NGINX_NAME_RE = re.compile(r"(?m)^\s*server_name\s+([^;]+);")
+_APACHE_VHOST_RE = re.compile(r"(?si)<VirtualHost\s+([^>]+)>(.*?)</VirtualHost>")
+_APACHE_NAME_RE = re.compile(r"(?mi)^\s*Server(?:Name|Alias)\s+(.+)$")
+_APACHE_SSL_RE = re.compile(r"(?mi)^\s*SSLEngine\s+on\b")
+
+def _strip_comments(text):
+    return re.sub(r"(?m)#.*$", "", text)
+
+def _valid_name(name):
+    # Noms génériques ("_"), jokers et expressions régulières: pas de SNI possible
+    return bool(name) and name != "_" and not name.startswith(("~", "*", ".")) and "*" not in name
+
+def _nginx_targets(text):
+    targets = set()
+    # Découpage par bloc `server {` (les blocs location imbriqués restent dans leur serveur)
+    for block in _NGINX_SERVER_RE.split(_strip_comments(text))[1:]:
+        ports = set()
+        for listen in _NGINX_LISTEN_RE.findall(block):
+            parts = listen.split()
+            m = re.search(r"(\d+)$", parts[0])
+            port = int(m.group(1)) if m else 80
+            if "ssl" in parts[1:] or port == 443:
+                ports.add(port)
+        for names in _NGINX_NAME_RE.findall(block):
+            for name in names.split():
+                if _valid_name(name):
+                    targets.update((name.lower(), port) for port in ports)
+    return targets
+
+def _apache_targets(text):
+    targets = set()
+    for addrs, body in _APACHE_VHOST_RE.findall(_strip_comments(text)):
+        ports = {int(p) for p in re.findall(r":(\d+)", addrs)}
+        if not _APACHE_SSL_RE.search(body):
+            ports &= {443}
+        for names in _APACHE_NAME_RE.findall(body):
+            for name in names.split():
+                name = name.split(":")[0]
+                if _valid_name(name):
+                    targets.update((name.lower(), port) for port in ports)
+    return targets
+
+def _read_confs(patterns):
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    yield f.read()
+            except OSError:
+                continue
+
+def discover_targets(nginx_globs=NGINX_CONF_GLOBS, apache_globs=APACHE_CONF_GLOBS):
+    """Couples (nom SNI, port) des vhosts TLS déclarés, triés."""
+    targets = set()
+    for text in _read_confs(nginx_globs):
+        targets |= _nginx_targets(text)
+    for text in _read_confs(apache_globs):
+        targets |= _apache_targets(text)
+    return sorted(targets)
+
+_CERT_FILE_RE = re.compile(r"^\s*(?:ssl_certificate|SSLCertificateFile)\s+[\"']?([^\s;\"']+)", re.I | re.M)
+
+def certificate_files(nginx_globs=NGINX_CONF_GLOBS, apache_globs=APACHE_CONF_GLOBS):
+    """Fichiers de configuration et certificats déclarés (clé d'invalidation du cache de sonde)."""
+    files = set()
+    for pattern in nginx_globs + apache_globs:
+        files.update(glob.glob(pattern))
+    for text in _read_confs(nginx_globs + apache_globs):
+        files.update(_CERT_FILE_RE.findall(_strip_comments(text)))
+    return sorted(files)
+
+# -----------------------------
+# Certificate decoding (DER minimal: tbsCertificate.validity.notAfter)
+# -----------------------------
+def _der_item(buf, pos):
+    tag = buf[pos]
+    length = buf[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7F
+        length = int.from_bytes(buf[pos:pos + n], "big")
+        pos += n
+    return tag, pos, pos + length
+
+def _der_children(buf, start, end):
+    pos = start
+    while pos < end:
+        tag, s, e = _der_item(buf, pos)
+        yield tag, s, e
+        pos = e
+
+def _der_time(tag, raw):
+    text = raw.decode("ascii").rstrip("Z")
+    if tag == 0x17:  # UTCTime: YYMMDDHHMMSS
+        year = int(text[:2])
+        text = str(1900 + year if year >= 50 else 2000 + year) + text[2:]
+    return datetime.strptime(text[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+
+def cert_not_after(der):
+    """Date d'expiration (datetime UTC) d'un certificat X.509 encodé en DER."""
+    _, cs, ce = _der_item(der, 0)
+    _, ts, te = _der_item(der, cs)
+    fields = [(tag, s, e) for tag, s, e in _der_children(der, ts, te)]
+    if fields[0][0] == 0xA0:  # [0] version (explicite)
+        fields = fields[1:]
+    # serial, signature, issuer, validity
+    _, vs, ve = fields[3]
+    times = list(_der_children(der, vs, ve))
+    tag, s, e = times[1]
+    return _der_time(tag, der[s:e])
+
+# -----------------------------
+# Handshakes
+# -----------------------------
+def _client_context():
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+async def _fetch_cert(address, port, name, ctx, timeout):
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port, ssl=ctx, server_hostname=name), timeout
+        )
+        return writer.get_extra_info("ssl_object").getpeercert(binary_form=True)
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), 1)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError):
+                pass
+
+async def _handshake_all(targets, address, limit, timeout):
+    ctx = _client_context()
+    sem = asyncio.Semaphore(limit)
+
+    async def one(name, port):
+        async with sem:
+            try:
+                return await _fetch_cert(address, port, name, ctx, timeout), None
+            except asyncio.TimeoutError:
+                return None, "timeout"
+            except (OSError, ssl.SSLError) as e:
+                return None, e.__class__.__name__
+
+    return await asyncio.gather(*(one(name, port) for name, port in targets))
+
+def handshake_all(targets, address="127.0.0.1", limit=16, timeout=5.0):
+    """Certificat DER (ou erreur) pour chaque (nom, port), dans l'ordre de `targets`."""
+    if not targets:
+        return []
+    return asyncio.run(_handshake_all(targets, address, limit, timeout))
+
+# -----------------------------
+# Cache + facts
+# -----------------------------
+def _load_cache(path):
+    try:
+        cache = json.loads(Path(path).read_text(encoding="utf-8"))
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "names": {}, "certs": {}}
+
+def _save_cache(path, cache):
+    write_text(path, json.dumps(cache, separators=(",", ":")))
+
+def probe_certificates(cache_path, targets=None, address="127.0.0.1", limit=16, timeout=5.0,
+                       max_age=0, now=None):
+    """
+    Retourne (résultats par nom, statistiques). Chaque résultat:
+      {name, port, fingerprint, not_after, expiry_days, error, cached}
+    `targets` par défaut: vhosts découverts, sinon ("localhost", 443).
+    """
+    now = now or time.time()
+    if targets is None:
+        targets = discover_targets() or [("localhost", 443)]
+    cache = _load_cache(cache_path)
+    names, certs = cache["names"], cache["certs"]
+
+    fresh, todo = {}, []
+    for name, port in targets:
+        key = f"{name}:{port}"
+        entry = names.get(key)
+        if max_age and entry and now - entry["checked_at"] < max_age and entry["fingerprint"] in certs:
+            fresh[key] = entry
+        else:
+            todo.append((name, port))
+
+    stats = {"targets": len(targets), "handshakes": len(todo), "cached": len(fresh), "errors": 0}
+    for (name, port), (der, error) in zip(todo, handshake_all(todo, address, limit, timeout)):
+        key = f"{name}:{port}"
+        if der is None:
+            fresh[key] = {"fingerprint": None, "error": error, "checked_at": now}
+            stats["errors"] += 1
+            continue
+        fp = hashlib.sha256(der).hexdigest()
+        if fp not in certs:
+            try:
+                certs[fp] = {"not_after": cert_not_after(der).strftime("%Y-%m-%dT%H:%M:%SZ")}
+            except (IndexError, ValueError):
+                fresh[key] = {"fingerprint": None, "error": "certificat illisible", "checked_at": now}
+                stats["errors"] += 1
+                continue
+        fresh[key] = names[key] = {"fingerprint": fp, "checked_at": now}
+
+    results = []
+    for name, port in targets:
+        entry = fresh[f"{name}:{port}"]
+        fp = entry["fingerprint"]
+        r = {"name": name, "port": port, "fingerprint": fp, "not_after": None, "expiry_days": None,
+             "error": entry.get("error"), "cached": entry["checked_at"] != now}
+        if fp:
+            not_after = certs[fp]["not_after"]
+            expiry = datetime.strptime(not_after, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            r["not_after"] = not_after
+            r["expiry_days"] = int((expiry.timestamp() - now) // 86400)
+        results.append(r)
+
+    # Empreintes plus référencées par aucun nom: oubliées
+    used = {e["fingerprint"] for e in names.values()}
+    cache["certs"] = {fp: v for fp, v in certs.items() if fp in used}
+    _save_cache(cache_path, cache)
+    return results, stats
+
+def tls_facts(results):
+    """Facts web_security: présence, expiration minimale (fact historique) et détail par nom."""
+    ok = [r for r in results if r["fingerprint"]]
+    if not ok:
+        return {}
+    return {
+        "web_security.ssl_certificate_present": True,
+        "web_security.ssl_certificate_expiry_days": min(r["expiry_days"] for r in ok),
+        "web_security.ssl_certificates": [
+            {k: r[k] for k in ("name", "port", "expiry_days", "not_after", "fingerprint", "error")}
+            for r in results
+        ],
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Relevé des certificats TLS de tous les vhosts locaux")
+    ap.add_argument("--cache", default="facts/.state/tls_probe.json", help="Fichier cache")
+    ap.add_argument("--address", default="127.0.0.1", help="Adresse contactée (SNI = nom du vhost)")
+    ap.add_argument("--target", action="append", help="nom[:port] (répétable) au lieu de la découverte")
+    ap.add_argument("--limit", type=int, default=16, help="Handshakes simultanés")
+    ap.add_argument("--timeout", type=float, default=5.0, help="Timeout par nom (s)")
+    ap.add_argument("--max-age", type=float, default=0, help="Réutiliser un relevé de moins de N secondes")
+    args = ap.parse_args()
+
+    targets = None
+    if args.target:
+        targets = []
+        for t in args.target:
+            name, _, port = t.partition(":")
+            targets.append((name, int(port or 443)))
+
+    start = time.monotonic()
+    results, stats = probe_certificates(args.cache, targets, args.address, args.limit, args.timeout, args.max_age)
+    for r in results:
+        state = r["error"] or f"{r['expiry_days']} j ({r['not_after']})"
+        print(f"{r['name']}:{r['port']}  {state}{'  [cache]' if r['cached'] else ''}")
+    print(
+        f"[OK] {stats['targets']} noms, {stats['handshakes']} handshakes, {stats['cached']} en cache, "
+        f"{stats['errors']} erreurs, {time.monotonic() - start:.2f}s"
+    )
+
+if __name__ == "__main__":
+    main()
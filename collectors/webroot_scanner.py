@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scanner des racines web: permissions et fichiers suspects.
+
+L'arborescence est parcourue avec os.scandir par plusieurs threads (une file
+de dossiers partagée). Sont relevés :
+  - les fichiers et dossiers modifiables par tous (o+w) ;
+  - les droits de chaque wp-config.php (toutes les installations) ;
+  - les fichiers suspects : PHP sous wp-content/uploads, empreinte SHA-256
+    connue ou motif de code malveillant (eval(base64_decode(...)), ...)
+    dans les fichiers PHP.
+
+Un index (inode, mtime, taille) -> (empreinte, motif reconnu) est conservé en
+SQLite entre les runs : seuls les fichiers PHP nouveaux ou modifiés sont relus
+et rehachés. Une nouvelle liste d'empreintes est confrontée aux empreintes de
+l'index sans relire les fichiers ; seul un changement des motifs impose de
+relire le contenu.
+
+Les noms de fichiers ne sont pas forcément de l'UTF-8 valide (fréquent sur un
+hôte compromis) : l'index les conserve en octets (os.fsencode) et le résumé
+les restitue échappés ("\\xff"), sans jamais faire échouer le scan.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import stat
+import threading
+import time
+from pathlib import Path
+
+INDEX_VERSION = 2
+PHP_EXT = (".php", ".phtml", ".php3", ".php4", ".php5", ".php7", ".phar", ".inc")
+MAX_CONTENT_BYTES = 2 << 20
+MAX_SAMPLES = 100
+SKIP_DIRS = {".git", "node_modules", ".svn"}
+
+# Motifs courants de webshells / injections (sous-ensemble volontairement prudent)
+DEFAULT_PATTERNS = {
+    "eval_base64": rb"eval\s*\(\s*base64_decode\s*\(",
+    "eval_gzinflate": rb"eval\s*\(\s*(?:gzinflate|gzuncompress|str_rot13)\s*\(",
+    "assert_request": rb"assert\s*\(\s*\$_(?:POST|GET|REQUEST|COOKIE)",
+    "preg_replace_e": rb"preg_replace\s*\(\s*['\"].{1,80}/e['\"]",
+    "request_exec": rb"(?:system|shell_exec|passthru|exec|popen)\s*\(\s*\$_(?:POST|GET|REQUEST|COOKIE)",
+    "create_function_request": rb"create_function\s*\([^)]*\$_(?:POST|GET|REQUEST)",
+}
+
+# -----------------------------
+# Signatures
+# -----------------------------
+def load_signatures(path=None):
+    """
+    {"sha256": {empreinte: libellé}, "patterns": {libellé: regex}} ; sans fichier,
+    motifs par défaut. Retourne (empreintes, motifs compilés, digest des motifs).
+    """
+    data = {"sha256": {}, "patterns": {}}
+    if path:
+        data.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    patterns = dict(DEFAULT_PATTERNS)
+    patterns.update({k: v.encode("utf-8") if isinstance(v, str) else v for k, v in data["patterns"].items()})
+    hashes = {k.lower(): v for k, v in data["sha256"].items()}
+    digest = hashlib.sha256(json.dumps(
+        sorted((k, v.decode("latin-1")) for k, v in patterns.items())
+    ).encode("utf-8")).hexdigest()
+    compiled = [(label, re.compile(rx, re.I | re.S)) for label, rx in patterns.items()]
+    return hashes, compiled, digest
+
+def display_path(path):
+    """Chemin affichable / sérialisable en JSON: octets non UTF-8 échappés en \\xNN."""
+    return os.fsencode(path).decode("utf-8", "backslashreplace")
+
+# -----------------------------
+# Index (SQLite)
+# -----------------------------
+class Index:
+    """Index des fichiers PHP, clé = chemin en octets (os.fsencode)."""
+
+    def __init__(self, path, patterns_digest):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        meta = dict(self.db.execute("SELECT k, v FROM meta"))
+        if meta.get("version") != str(INDEX_VERSION):
+            # Version 1: chemins en TEXT (échec sur les noms non UTF-8)
+            self.db.execute("DROP TABLE IF EXISTS files")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (path BLOB PRIMARY KEY, ino INTEGER, "
+                        "mtime INTEGER, size INTEGER, sha256 TEXT, pattern TEXT)")
+        if meta.get("version") == str(INDEX_VERSION) and meta.get("patterns") != patterns_digest:
+            # Motifs modifiés: contenu à relire (les empreintes restent valables)
+            self.db.execute("UPDATE files SET pattern = NULL")
+        self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                            [("version", str(INDEX_VERSION)), ("patterns", patterns_digest)])
+        self.known = {row[0]: row[1:] for row in self.db.execute(
+            "SELECT path, ino, mtime, size, sha256, pattern FROM files")}
+
+    def lookup(self, path, ino, mtime, size):
+        row = self.known.get(path)
+        if row and row[0] == ino and row[1] == mtime and row[2] == size and row[4] is not None:
+            return row[3], row[4]
+        return None
+
+    def save(self, updates, seen):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", updates)
+            gone = [(p,) for p in self.known.keys() - seen]
+            self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+        self.db.close()
+        return len(gone)
+
+# -----------------------------
+# Scan
+# -----------------------------
+def _inspect(path, patterns):
+    """(sha256, motif) d'un fichier PHP ; motif "" = aucun motif reconnu."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        data = f.read(MAX_CONTENT_BYTES)
+        h.update(data)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+            data = None  # trop gros pour la recherche de motifs
+    if data is not None:
+        for label, rx in patterns:
+            if rx.search(data):
+                return h.hexdigest(), label
+    return h.hexdigest(), ""
+
+def scan(roots, index_path, signatures=None, workers=8):
+    """
+    Parcourt `roots` et retourne un résumé:
+      {files, dirs, php_files, hashed, reused, world_writable, world_writable_count,
+       wp_configs, suspicious, root_modes, duration_s}
+    """
+    start = time.monotonic()
+    hashes, patterns, patterns_digest = load_signatures(signatures)
+    index = Index(index_path, patterns_digest)
+
+    dirs = queue.Queue()
+    lock = threading.Lock()
+    totals = {"files": 0, "dirs": 0, "php_files": 0, "hashed": 0, "reused": 0, "errors": 0}
+    world_writable, wp_configs, suspicious, updates, seen = [], [], [], [], set()
+    ww_count = [0]
+
+    def worker():
+        local = dict.fromkeys(totals, 0)
+        l_ww, l_cfg, l_susp, l_upd, l_seen, l_ww_count = [], [], [], [], [], 0
+        while True:
+            d = dirs.get()
+            if d is None:
+                dirs.task_done()
+                break
+            try:
+                with os.scandir(d) as it:
+                    entries = list(it)
+            except OSError:
+                local["errors"] += 1
+                dirs.task_done()
+                continue
+            in_uploads = "/wp-content/uploads" in d
+            for e in entries:
+                try:
+                    st = e.stat(follow_symlinks=False)
+                except OSError:
+                    local["errors"] += 1
+                    continue
+                mode = st.st_mode
+                if stat.S_ISLNK(mode):
+                    continue
+                if mode & stat.S_IWOTH and not (stat.S_ISDIR(mode) and mode & stat.S_ISVTX):
+                    l_ww_count += 1
+                    if len(l_ww) < MAX_SAMPLES:
+                        l_ww.append(e.path)
+                if stat.S_ISDIR(mode):
+                    local["dirs"] += 1
+                    if e.name not in SKIP_DIRS:
+                        dirs.put(e.path)
+                    continue
+                if not stat.S_ISREG(mode):
+                    continue
+                local["files"] += 1
+                name = e.name.lower()
+                if name == "wp-config.php":
+                    l_cfg.append({"path": e.path, "mode": format(mode & 0o777, "o")})
+                if not name.endswith(PHP_EXT):
+                    continue
+                local["php_files"] += 1
+                if in_uploads and name != "index.php":
+                    l_susp.append({"path": e.path, "reason": "php_in_uploads"})
+                key = os.fsencode(e.path)
+                l_seen.append(key)
+                mtime = st.st_mtime_ns
+                known = index.lookup(key, st.st_ino, mtime, st.st_size)
+                if known is not None:
+                    local["reused"] += 1
+                    digest, pattern = known
+                else:
+                    try:
+                        digest, pattern = _inspect(e.path, patterns)
+                    except OSError:
+                        local["errors"] += 1
+                        continue
+                    local["hashed"] += 1
+                    l_upd.append((key, st.st_ino, mtime, st.st_size, digest, pattern))
+                if digest in hashes:
+                    l_susp.append({"path": e.path, "reason": f"sha256:{hashes[digest]}"})
+                elif pattern:
+                    l_susp.append({"path": e.path, "reason": f"pattern:{pattern}"})
+            dirs.task_done()
+        with lock:
+            for k, v in local.items():
+                totals[k] += v
+            world_writable.extend(l_ww)
+            ww_count[0] += l_ww_count
+            wp_configs.extend(l_cfg)
+            suspicious.extend(l_susp)
+            updates.extend(l_upd)
+            seen.update(l_seen)
+
+    root_modes = {}
+    for root in roots:
+        try:
+            root_modes[root] = format(os.stat(root).st_mode & 0o777, "o")
+        except OSError:
+            continue
+        dirs.put(root)
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    dirs.join()
+    for _ in threads:
+        dirs.put(None)
+    for t in threads:
+        t.join()
+    removed = index.save(updates, seen)
+
+    # Chemins restitués échappés: le résumé est toujours sérialisable en JSON
+    for item in wp_configs + suspicious:
+        item["path"] = display_path(item["path"])
+    return {
+        **totals,
+        "removed_from_index": removed,
+        "root_modes": {display_path(r): m for r, m in root_modes.items()},
+        "world_writable_count": ww_count[0],
+        "world_writable": sorted(map(display_path, world_writable))[:MAX_SAMPLES],
+        "wp_configs": sorted(wp_configs, key=lambda c: c["path"]),
+        "suspicious": sorted(suspicious, key=lambda s: s["path"]),
+        "duration_s": round(time.monotonic() - start, 3),
+    }
+
+# -----------------------------
+# Facts
+# -----------------------------
+def _openness(mode):
+    # "640" < "644" < "664" < "666" < "777": bits "autres" d'abord, puis groupe
+    m = int(mode, 8)
+    return (m & 0o007, m & 0o070, m)
+
+def webroot_facts(result, root="/var/www"):
+    """Facts web_security: droits historiques (racine, wp-config le plus ouvert) + détail du scan."""
+    facts = {}
+    root = display_path(root)
+    if root in result["root_modes"]:
+        facts["web_security.web_root_permissions"] = result["root_modes"][root]
+    if result["wp_configs"]:
+        worst = max(result["wp_configs"], key=lambda c: _openness(c["mode"]))
+        facts["web_security.wp_config_permissions"] = worst["mode"]
+        facts["web_security.wp_configs"] = result["wp_configs"]
+    facts["web_security.suspicious_files_detected"] = bool(result["suspicious"])
+    facts["web_security.suspicious_files"] = result["suspicious"][:MAX_SAMPLES]
+    facts["web_security.world_writable_count"] = result["world_writable_count"]
+    facts["web_security.world_writable_files"] = result["world_writable"]
+    facts["web_security.webroot_scan"] = {k: result[k] for k in (
+        "files", "dirs", "php_files", "hashed", "reused", "errors", "duration_s")}
+    return facts
+
+def main():
+    ap = argparse.ArgumentParser(description="Scan des racines web: permissions et fichiers suspects")
+    ap.add_argument("root", nargs="*", default=["/var/www"], help="Racines à parcourir")
+    ap.add_argument("--index", default="facts/.state/webroot_index.sqlite", help="Index (inode, mtime, taille)")
+    ap.add_argument("--signatures", help='Signatures JSON {"sha256": {...}, "patterns": {...}}')
+    ap.add_argument("--workers", type=int, default=8, help="Threads de parcours")
+    args = ap.parse_args()
+
+    result = scan(args.root, args.index, args.signatures, args.workers)
+    print(json.dumps(webroot_facts(result, args.root[0]), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
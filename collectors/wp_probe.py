@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sonde WordPress multi-sites.
+
+Les installations sont découvertes sous les racines web (présence de
+wp-includes/version.php). Pour chaque site, un seul appel WP-CLI (`wp eval`)
+démarre WordPress une fois et renvoie tous les facts en JSON : version du
+cœur, extensions (total, actives, mises à jour disponibles), administrateurs,
+taille de la base, état de WP-Cron et des mises à jour automatiques.
+
+Les sites sont traités en parallèle (limite de concurrence, timeout par
+site). WordPress est démarré sans extensions ni thème (--skip-plugins
+--skip-themes) : aucun code tiers n'est exécuté par l'audit.
+
+Un cache par site est conservé entre les runs : tant que la date de
+modification de wp-includes/version.php est inchangée (pas de mise à jour du
+cœur) et que le relevé a moins de `max_age` secondes, WP-CLI n'est pas relancé.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from atomic_write import write_text
+
+CACHE_VERSION = 1
+
+WEB_ROOTS = ("/var/www", "/srv/www", "/home/*/public_html", "/home/*/www")
+MAX_DEPTH = 4
+SKIP_DIRS = {"wp-admin", "wp-content", "wp-includes", "node_modules", "vendor", ".git", "cache", "logs"}
+
+# Exécuté dans WordPress démarré (un seul bootstrap par site)
+PHP_FACTS = r"""
+global $wpdb, $wp_version;
+if (!function_exists('get_plugins')) { require_once ABSPATH . 'wp-admin/includes/plugin.php'; }
+$plugins = get_plugins();
+$updates = get_site_transient('update_plugins');
+$outdated = ($updates && isset($updates->response)) ? count(array_intersect_key((array) $updates->response, $plugins)) : null;
+$admins = get_users(array('role' => 'administrator', 'fields' => 'ID'));
+$db = $wpdb->get_var($wpdb->prepare(
+  "SELECT SUM(data_length + index_length) FROM information_schema.tables WHERE table_schema = %s", DB_NAME));
+echo "\n" . json_encode(array(
+  'core_version' => $wp_version,
+  'total_plugins' => count($plugins),
+  'active_plugins' => count((array) get_option('active_plugins', array())),
+  'outdated_plugins' => $outdated,
+  'admin_count' => count($admins),
+  'db_size_mb' => $db === null ? null : round($db / 1048576, 1),
+  'wp_cron_active' => !(defined('DISABLE_WP_CRON') && DISABLE_WP_CRON),
+  'auto_updates_enabled' => !(defined('AUTOMATIC_UPDATER_DISABLED') && AUTOMATIC_UPDATER_DISABLED)
+    && !(defined('WP_AUTO_UPDATE_CORE') && WP_AUTO_UPDATE_CORE === false),
+)) . "\n";
+"""
+
+FIELDS = ("core_version", "total_plugins", "active_plugins", "outdated_plugins", "admin_count",
+          "db_size_mb", "wp_cron_active", "auto_updates_enabled")
+
+# -----------------------------
+# Discovery
+# -----------------------------
+def _walk(root, depth, found):
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        subdirs = []
+        for entry in it:
+            if entry.name == "wp-includes" and os.path.isfile(os.path.join(entry.path, "version.php")):
+                found.append(os.path.realpath(root))
+                return  # pas d'installation imbriquée dans une installation
+            if depth < MAX_DEPTH and entry.name not in SKIP_DIRS and entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    for d in subdirs:
+        _walk(d, depth + 1, found)
+
+def discover_sites(roots=WEB_ROOTS):
+    """Dossiers racines des installations WordPress (chemins réels, triés, sans doublon)."""
+    found = []
+    for pattern in roots:
+        for root in sorted(glob.glob(pattern)):
+            _walk(root, 0, found)
+    return sorted(set(found))
+
+# -----------------------------
+# WP-CLI (un bootstrap par site)
+# -----------------------------
+def _version_mtime(site):
+    try:
+        return os.stat(os.path.join(site, "wp-includes", "version.php")).st_mtime
+    except OSError:
+        return None
+
+def run_wp(site, wp_bin="wp", timeout=30.0):
+    """Facts d'un site ({champ: valeur}) ou {"error": ...}."""
+    args = [wp_bin, "eval", PHP_FACTS, f"--path={site}", "--skip-plugins", "--skip-themes", "--quiet"]
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        args.append("--allow-root")
+    try:
+        r = subprocess.run(args, capture_output=True, timeout=timeout, stdin=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        return {"error": "timeout"}
+    except OSError as e:
+        return {"error": e.__class__.__name__}
+    # Dernière ligne JSON: les notices PHP éventuelles la précèdent
+    for line in reversed(r.stdout.decode("utf-8", "replace").splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                break
+            return {k: data.get(k) for k in FIELDS}
+    err = r.stderr.decode("utf-8", "replace").strip().splitlines()
+    return {"error": (err[-1] if err else f"code {r.returncode}")[:200]}
+
+def _load_cache(path):
+    try:
+        cache = json.loads(Path(path).read_text(encoding="utf-8"))
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "sites": {}}
+
+def _save_cache(path, cache):
+    write_text(path, json.dumps(cache, separators=(",", ":")))
+
+def probe_sites(cache_path, sites=None, wp_bin="wp", limit=4, timeout=30.0, max_age=86400, now=None):
+    """
+    Retourne (résultats par site, statistiques). Chaque résultat:
+      {path, <FIELDS>, error, cached}
+    """
+    now = now or time.time()
+    if sites is None:
+        sites = discover_sites()
+    cache = _load_cache(cache_path)
+    entries = cache["sites"]
+
+    todo, mtimes = [], {}
+    for site in sites:
+        mtimes[site] = _version_mtime(site)
+        e = entries.get(site)
+        if not (e and e["mtime"] == mtimes[site] and now - e["checked_at"] < max_age and not e["result"].get("error")):
+            todo.append(site)
+
+    stats = {"sites": len(sites), "bootstraps": len(todo), "cached": len(sites) - len(todo), "errors": 0}
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(limit, len(todo)))) as pool:
+            for site, result in zip(todo, pool.map(lambda s: run_wp(s, wp_bin, timeout), todo)):
+                entries[site] = {"mtime": mtimes[site], "checked_at": now, "result": result}
+                stats["errors"] += 1 if result.get("error") else 0
+
+    results = []
+    for site in sites:
+        e = entries[site]
+        r = {"path": site, **{k: e["result"].get(k) for k in FIELDS}}
+        r["error"] = e["result"].get("error")
+        r["cached"] = e["checked_at"] != now
+        results.append(r)
+
+    # Sites disparus: oubliés
+    cache["sites"] = {s: entries[s] for s in sites}
+    _save_cache(cache_path, cache)
+    return results, stats
+
+# -----------------------------
+# Facts
+# -----------------------------
+def _version_key(v):
+    return tuple(int(x) if x.isdigit() else 0 for x in str(v).split("."))
+
+def _total(values):
+    values = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return sum(values) if values else None
+
+def wp_facts(results):
+    """
+    Facts du bloc wordpress pour l'ensemble des sites: version du cœur la plus
+    ancienne, extensions et taille de base cumulées, nombre d'administrateurs du
+    site le moins pourvu, WP-Cron / mises à jour automatiques actifs partout ;
+    détail par site dans `wordpress.sites`.
+    """
+    ok = [r for r in results if not r["error"]]
+    if not results:
+        return {}
+    facts = {
+        "wordpress.sites_count": len(results),
+        "wordpress.sites": [{k: v for k, v in r.items() if k != "cached"} for r in results],
+    }
+    if not ok:
+        return facts
+    versions = [r["core_version"] for r in ok if r["core_version"]]
+    if versions:
+        facts["wordpress.core_version"] = min(versions, key=_version_key)
+    for name in ("total_plugins", "outdated_plugins", "db_size_mb"):
+        total = _total(r[name] for r in ok)
+        if total is not None:
+            facts[f"wordpress.{name}"] = round(total, 1) if isinstance(total, float) else total
+    admins = [r["admin_count"] for r in ok if isinstance(r["admin_count"], int)]
+    if admins:
+        facts["wordpress.admin_count"] = min(admins)
+    for name in ("wp_cron_active", "auto_updates_enabled"):
+        flags = [r[name] for r in ok if isinstance(r[name], bool)]
+        if flags:
+            facts[f"wordpress.{name}"] = all(flags)
+    return facts
+
+def main():
+    ap = argparse.ArgumentParser(description="Relevé WordPress de tous les sites (un bootstrap WP-CLI par site)")
+    ap.add_argument("--cache", default="facts/.state/wp_probe.json", help="Fichier cache")
+    ap.add_argument("--root", action="append", help="Racine web (répétable, motifs glob acceptés)")
+    ap.add_argument("--site", action="append", help="Dossier d'installation (répétable) au lieu de la découverte")
+    ap.add_argument("--wp", default=os.environ.get("AUDIT_WP_CLI", "wp"), help="Exécutable WP-CLI")
+    ap.add_argument("--limit", type=int, default=4, help="Sites traités simultanément")
+    ap.add_argument("--timeout", type=float, default=30.0, help="Timeout par site (s)")
+    ap.add_argument("--max-age", type=float, default=86400, help="Réutiliser un relevé de moins de N secondes")
+    args = ap.parse_args()
+
+    if shutil.which(args.wp) is None:
+        raise SystemExit(f"[ERREUR] WP-CLI introuvable: {args.wp}")
+    sites = [os.path.realpath(s) for s in args.site] if args.site else discover_sites(args.root or WEB_ROOTS)
+    results, stats = probe_sites(args.cache, sites, args.wp, args.limit, args.timeout, args.max_age)
+    print(json.dumps({"stats": stats, "facts": wp_facts(results)}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
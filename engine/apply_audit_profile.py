@@ -2,13 +2,32 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import glob
+import hashlib
 import json
+import os
+import sys
+import time
 from pathlib import Path
 from datetime import datetime
-import yaml
+
+import grid_cache
+import instrument
+from audit_cache import AuditCache
+from audit_delta import DELTA_FILE, DeltaStore, write_delta
+from generate_audit_raw import build_raw, raw_filename, write_raw
+from instrument import stage
+from rule_engine import Findings, compile_grid, evaluate_checks, evaluate_checks_timed, select_checks
+
+# Percentiles partagés avec les collecteurs (collectors/quantiles.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "collectors"))
+from quantiles import percentile  # noqa: E402
 
 NM = "non_mesurable"
 
+# À incrémenter à chaque changement de logique d'évaluation ou de rendu (invalide le cache)
+ENGINE_VERSION = "1.2.4"
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -16,33 +35,17 @@ def load_json(p: Path):
     return json.loads(p.read_text(encoding="utf-8"))
 
 def load_yaml(p: Path):
-    return yaml.safe_load(p.read_text(encoding="utf-8"))
+    return parse_yaml(p.read_text(encoding="utf-8"))
+
+def parse_yaml(text: str):
+    # Import différé: le chemin rapide (grilles précompilées) n'importe jamais yaml
+    import yaml
+    with stage("parse_yaml"):
+        return yaml.safe_load(text)
 
 def is_nm(v):
     return v == NM or v is None
 
-def as_int(v):
-    try:
-        if isinstance(v, bool):
-            return None
-        if isinstance(v, (int, float)):
-            return int(v)
-        if isinstance(v, str) and v.isdigit():
-            return int(v)
-        return None
-    except Exception:
-        return None
-
-def as_float(v):
-    try:
-        if isinstance(v, (int, float)):
-            return float(v)
-        if isinstance(v, str):
-            return float(v)
-        return None
-    except Exception:
-        return None
-
 def flatten_requirements(profile_yaml):
     """
     profile_yaml['facts_required'] structure:
@@ -64,186 +67,52 @@ def flatten_requirements(profile_yaml):
     return req, opt
 
 def get_value(facts, dotted_path: str):
+    return get_keys(facts, dotted_path.split("."))
+
+def set_value(out, dotted_path: str, value):
+    set_keys(out, dotted_path.split("."), value)
+
+def get_keys(facts, keys):
+    # Chemin déjà découpé (profil compilé): ("system", "os_name")
     cur = facts
-    for part in dotted_path.split("."):
+    for part in keys:
         if not isinstance(cur, dict) or part not in cur:
             return None
         cur = cur[part]
     return cur
 
-def set_value(out, dotted_path: str, value):
+def set_keys(out, keys, value):
     cur = out
-    parts = dotted_path.split(".")
-    for p in parts[:-1]:
+    for p in keys[:-1]:
         cur = cur.setdefault(p, {})
-    cur[parts[-1]] = value
+    cur[keys[-1]] = value
+
+def split_paths(paths):
+    return tuple(tuple(p.split(".")) for p in paths)
 
 # -----------------------------
-# Severity rules (module-specific, deterministic)
+# Rules (compiled once per grid, see rule_engine.py)
 # -----------------------------
-def analyze_server(facts):
-    findings = []
-
-    # Firewall
-    fw = get_value(facts, "security_infra.firewall_present")
-    if fw is False:
-        findings.append(("critical", "Pare-feu inactif (UFW): exposition réseau non filtrée sur VPS."))
-    elif is_nm(fw):
-        findings.append(("warning", "Pare-feu non mesurable: état UFW inconnu."))
-
-    # Open ports
-    ports = get_value(facts, "security_infra.open_ports")
-    if isinstance(ports, list) and len(ports) > 0:
-        # normalize to strings
-        pset = set(str(p) for p in ports)
-        unexpected = sorted(pset - set(["22", "80", "443", "2222"]))
-        if unexpected:
-            findings.append(("warning", f"Ports ouverts à justifier: {', '.join(unexpected)}."))
-    elif is_nm(ports):
-        findings.append(("warning", "Ports ouverts non mesurables."))
-
-    # SSH root
-    root = get_value(facts, "security_infra.ssh_root_login")
-    if root is True:
-        findings.append(("warning", "SSH root autorisé: augmenter la sécurité (désactiver + clés + sudo)."))
-    elif is_nm(root):
-        findings.append(("warning", "Statut SSH root non mesurable."))
-
-    # Disk
-    disk = as_int(get_value(facts, "system.disk_used_percent"))
-    if disk is not None:
-        if disk >= 90:
-            findings.append(("critical", f"Disque saturé: {disk}% (risque d'arrêt services / logs)."))
-        elif disk >= 80:
-            findings.append(("warning", f"Disque élevé: {disk}% (seuil d’alerte recommandé >=80%)."))
-    else:
-        findings.append(("warning", "Utilisation disque non mesurable."))
-
-    # RAM
-    ram = as_int(get_value(facts, "system.ram_free_percent"))
-    if ram is not None:
-        if ram < 15:
-            findings.append(("critical", f"Mémoire libre faible: {ram}% (risque OOM)."))
-        elif ram < 30:
-            findings.append(("warning", f"Mémoire libre modérée: {ram}%."))
-    else:
-        findings.append(("warning", "Mémoire libre non mesurable."))
-
-    # Load
-    load = as_float(get_value(facts, "system.cpu_load_15m"))
-    if load is not None:
-        if load > 1.5:
-            findings.append(("critical", f"Charge 15 min élevée: {load}."))
-        elif load > 1.0:
-            findings.append(("warning", f"Charge 15 min notable: {load}."))
-    else:
-        findings.append(("warning", "Charge CPU 15 min non mesurable."))
-
-    # OS interim warning (Ubuntu non-LTS heuristic)
-    os_name = get_value(facts, "system.os_name")
-    os_ver = get_value(facts, "system.os_version")
-    if os_name == "ubuntu" and isinstance(os_ver, str) and os_ver.endswith(".04") is False:
-        findings.append(("warning", f"Ubuntu {os_ver} semble être une version intermédiaire (non-LTS) : attention maintenance et cycles de support."))
-
-    # Backups presence
-    bkp = get_value(facts, "resilience.backups_present")
-    if bkp is False:
-        findings.append(("critical", "Sauvegardes absentes (ou non détectées)."))
-    elif is_nm(bkp):
-        findings.append(("warning", "Sauvegardes non mesurables."))
-    else:
-        # present but location unknown
-        loc = get_value(facts, "resilience.backups_location")
-        if is_nm(loc) or loc == "unknown":
-            findings.append(("warning", "Sauvegardes détectées, mais localisation/externalisation non mesurée."))
-
-    return findings
-
-def analyze_web_security(facts):
-    findings = []
-    sslp = get_value(facts, "web_security.ssl_certificate_present")
-    exp = as_int(get_value(facts, "web_security.ssl_certificate_expiry_days"))
-    https_forced = get_value(facts, "web_security.https_forced")
-
-    if sslp is False:
-        findings.append(("critical", "Certificat SSL absent: site potentiellement indisponible/insécurisé."))
-    elif is_nm(sslp):
-        findings.append(("warning", "Présence certificat SSL non mesurable."))
-    else:
-        if exp is not None:
-            if exp < 14:
-                findings.append(("critical", f"Certificat SSL expire très bientôt: {exp} jours."))
-            elif exp < 30:
-                findings.append(("warning", f"Certificat SSL expire bientôt: {exp} jours."))
-        else:
-            findings.append(("warning", "Date d’expiration SSL non mesurable."))
-
-    if https_forced is False:
-        findings.append(("warning", "HTTPS non forcé (redirection HTTP→HTTPS absente)."))
-    elif is_nm(https_forced):
-        findings.append(("warning", "Forçage HTTPS non mesurable."))
-
-    perms = get_value(facts, "web_security.web_root_permissions")
-    if isinstance(perms, str) and perms != NM:
-        if perms not in ["755", "750", "775"]:
-            findings.append(("warning", f"Permissions web root atypiques: {perms} (attendu souvent 755)."))
-    else:
-        findings.append(("warning", "Permissions web root non mesurables."))
-
-    wpcfgp = get_value(facts, "web_security.wp_config_permissions")
-    if isinstance(wpcfgp, str) and wpcfgp != NM:
-        # strict recommendations vary; flag overly open
-        if wpcfgp in ["777", "775", "755", "744", "666", "664"]:
-            findings.append(("warning", f"Permissions wp-config.php trop ouvertes: {wpcfgp} (viser 640/600)."))
-    elif is_nm(wpcfgp):
-        findings.append(("warning", "Permissions wp-config.php non mesurables."))
-
-    return findings
-
-def analyze_wordpress(facts):
-    findings = []
-    core = get_value(facts, "wordpress.core_version")
-    if is_nm(core):
-        findings.append(("warning", "WordPress non mesurable: WP-CLI/accès applicatif requis (mutualisé OK, VPS OK)."))
-        return findings
-
-    # Example checks (only if measurable)
-    outdated = as_int(get_value(facts, "wordpress.outdated_plugins"))
-    if outdated is not None and outdated > 0:
-        findings.append(("warning", f"Plugins non à jour: {outdated}."))
-
-    admins = as_int(get_value(facts, "wordpress.admin_count"))
-    if admins is not None and admins == 0:
-        findings.append(("critical", "Aucun compte admin détecté (anormal)."))
-
-    return findings
-
-def analyze_performance_resilience(facts):
-    findings = []
-
-    phpv = get_value(facts, "stack.php_version")
-    if is_nm(phpv):
-        findings.append(("warning", "Version PHP non mesurable."))
-    myv = get_value(facts, "stack.mysql_version")
-    if is_nm(myv):
-        findings.append(("warning", "Version MySQL/MariaDB non mesurable."))
-
-    rb = get_value(facts, "deployment.rollback_available")
-    if is_nm(rb):
-        findings.append(("warning", "Rollback non mesurable (snapshots/blue-green à vérifier)."))
-    elif rb == "none":
-        findings.append(("critical", "Aucun mécanisme de rollback détecté."))
-
-    ext = get_value(facts, "backups.backups_externalized")
-    if ext is False:
-        findings.append(("critical", "Sauvegardes non externalisées (risque perte totale en cas d'incident disque)."))
-    elif is_nm(ext):
-        findings.append(("warning", "Externalisation des sauvegardes non mesurable."))
-
-    return findings
-
-def severity_score(level: str) -> int:
-    return {"critical": 3, "warning": 2, "ok": 1}.get(level, 0)
+_RULE_GRIDS = {}
+
+def load_rule_grid(grid_path: Path):
+    text = grid_path.read_text(encoding="utf-8")
+    source_hash = grid_cache.sha256_text(text)
+    key = (grid_path.resolve(), source_hash)
+    if key not in _RULE_GRIDS:
+        compile_rule_grid(grid_path, parse_yaml(text), source_hash)
+    return _RULE_GRIDS[key]
+
+def compile_rule_grid(grid_path: Path, spec, source_hash: str):
+    """Compile une grille de règles déjà parsée (artefact précompilé ou YAML)."""
+    key = (grid_path.resolve(), source_hash)
+    if key not in _RULE_GRIDS:
+        with stage("compile_rules"):
+            compiled = compile_grid(spec)
+        compiled["source_hash"] = source_hash
+        compiled["spec"] = spec
+        _RULE_GRIDS[key] = compiled
+    return _RULE_GRIDS[key]
 
 # -----------------------------
 # Markdown rendering
@@ -253,19 +122,20 @@ def md_list(items):
         return "- Aucun point à signaler."
     return "\n".join([f"- **{lvl.upper()}** — {msg}" for (lvl, msg) in items])
 
-def compute_coverage(facts, req_paths, opt_paths):
+def compute_coverage(facts, req_paths, opt_paths, req_keys=None, opt_keys=None):
+    """req_keys / opt_keys: mêmes chemins pré-découpés (profil chargé), sinon découpés ici."""
     req_total = len(req_paths)
     opt_total = len(opt_paths)
 
     req_missing = []
     opt_missing = []
-    for p in req_paths:
-        v = get_value(facts, p)
+    for p, keys in zip(req_paths, req_keys or split_paths(req_paths)):
+        v = get_keys(facts, keys)
         if v is None or is_nm(v):
             req_missing.append(p)
 
-    for p in opt_paths:
-        v = get_value(facts, p)
+    for p, keys in zip(opt_paths, opt_keys or split_paths(opt_paths)):
+        v = get_keys(facts, keys)
         if v is None or is_nm(v):
             opt_missing.append(p)
 
@@ -281,50 +151,127 @@ def compute_coverage(facts, req_paths, opt_paths):
         "optional_missing": opt_missing,
     }
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--facts", default="facts/facts_all.json", help="Chemin vers facts_all.json")
-    ap.add_argument("--profile", required=True, help="Chemin vers grids/audit_*.yaml")
-    ap.add_argument("--outdir", default="reports", help="Dossier reports")
-    args = ap.parse_args()
-
-    facts_path = Path(args.facts)
-    profile_path = Path(args.profile)
-    outdir = Path(args.outdir)
 
-    facts = load_json(facts_path)
-    profile = load_yaml(profile_path)
+# -----------------------------
+# Profile application
+# -----------------------------
+def _compile_profile_source(profile_path: Path, text: str):
+    """Lecture YAML (chemin lent): données de l'artefact précompilé."""
+    grid = parse_yaml(text)
+    req_paths, opt_paths = flatten_requirements(grid)
+    data = {
+        "grid": grid,
+        "required": req_paths,
+        "optional": opt_paths,
+        "required_keys": split_paths(req_paths),
+        "optional_keys": split_paths(opt_paths),
+        "rule_grid": None,
+        "sources": [],
+    }
+    rules_cfg = grid.get("rules", {}) or {}
+    if rules_cfg:
+        grid_path = profile_path.parent / rules_cfg.get("grid", "audit_grid_v1.yaml")
+        rule_grid = load_rule_grid(grid_path)
+        data["rule_grid"] = {"path": str(grid_path), "spec": rule_grid["spec"], "source_hash": rule_grid["source_hash"]}
+        data["sources"] = [(str(grid_path), rule_grid["source_hash"])]
+    return data
+
+def load_profile(profile_path: Path, use_cache: bool = True):
+    """
+    Charge une grille de profil une seule fois (YAML + chemins requis/optionnels).
+    Le résultat est réutilisable pour autant d'hôtes que nécessaire.
 
-    profile_name = profile.get("meta", {}).get("name", profile_path.stem)
-    profile_slug = profile_path.stem
+    Les grilles sont précompilées dans grids/.cache/ (voir grid_cache.py): tant
+    que ni la grille ni sa grille de règles ne changent, yaml n'est pas importé.
+    """
+    text = profile_path.read_text(encoding="utf-8")
+    data = grid_cache.load(profile_path, text, ENGINE_VERSION) if use_cache else None
+    if data is None:
+        data = _compile_profile_source(profile_path, text)
+        if use_cache:
+            grid_cache.store(profile_path, text, ENGINE_VERSION, data)
+        instrument.count("grid_cache_misses")
+    else:
+        instrument.count("grid_cache_hits")
+    grid = data["grid"]
+    req_paths, opt_paths = data["required"], data["optional"]
+
+    # Contrôles à exécuter: domaines de la grille de règles déclarés par le profil
+    rules_cfg = grid.get("rules", {}) or {}
+    rule_grid = None
+    checks = []
+    if data["rule_grid"] is not None:
+        src = data["rule_grid"]
+        rule_grid = compile_rule_grid(Path(src["path"]), src["spec"], src["source_hash"])
+        checks = select_checks(rule_grid, rules_cfg.get("domains", []) or [])
+
+    # Chemins dont dépend le résultat (facts filtrés + facts lus par les règles): clé de cache
+    key_paths = set(req_paths) | set(opt_paths)
+    for check in checks:
+        for name in check["reads"]:
+            key_paths.update(rule_grid["fact_sources"][name])
+    # Mesures volatiles (grille de règles + profil): exclues du test « delta non vide »
+    volatile = set(rule_grid["volatile"]) if rule_grid is not None else set()
+    volatile.update(grid.get("volatile_facts", []) or [])
+
+    grid_hash = hashlib.sha256(text.encode("utf-8"))
+    if rule_grid is not None:
+        grid_hash.update(rule_grid["source_hash"].encode("ascii"))
 
-    req_paths, opt_paths = flatten_requirements(profile)
-    coverage = compute_coverage(facts, req_paths, opt_paths)
+    return {
+        "slug": profile_path.stem,
+        "name": grid.get("meta", {}).get("name", profile_path.stem),
+        "grid": grid,
+        "required": req_paths,
+        "optional": opt_paths,
+        "required_keys": data["required_keys"],
+        "optional_keys": data["optional_keys"],
+        "rule_grid": rule_grid,
+        "checks": checks,
+        "recommendations": grid.get("recommendations", []) or [],
+        "key_paths": split_paths(sorted(key_paths)),
+        "volatile_paths": tuple(sorted(volatile)),
+        "grid_hash": grid_hash.hexdigest(),
+    }
 
-    # Filtered facts = keep only domains referenced in profile
-    filtered = {}
-    for p in req_paths + opt_paths:
-        v = get_value(facts, p)
-        set_value(filtered, p, v if v is not None else NM)
+def evaluate_profile(facts, profile):
+    req_keys = profile["required_keys"]
+    opt_keys = profile["optional_keys"]
+
+    with stage("coverage"):
+        coverage = compute_coverage(facts, profile["required"], profile["optional"], req_keys, opt_keys)
+
+    with stage("filter"):
+        filtered = {}
+        for keys in req_keys + opt_keys:
+            v = get_keys(facts, keys)
+            set_keys(filtered, keys, v if v is not None else NM)
+
+    # Deterministic analysis: compiled grid rules declared by the profile
+    findings, levels = Findings(profile["rule_grid"]), {}
+    if profile["checks"]:
+        if instrument.ENABLED:
+            with stage("rules"):
+                findings, levels = evaluate_checks_timed(
+                    profile["rule_grid"], profile["checks"], facts, instrument.record_rule)
+        else:
+            findings, levels = evaluate_checks(profile["rule_grid"], profile["checks"], facts)
 
-    # Deterministic analysis by profile type (based on filename)
-    findings = []
-    if "audit_server" in profile_slug:
-        findings = analyze_server(facts)
-    elif "audit_web_security" in profile_slug:
-        findings = analyze_web_security(facts)
-    elif "audit_wordpress" in profile_slug:
-        findings = analyze_wordpress(facts)
-    elif "audit_performance_resilience" in profile_slug:
-        findings = analyze_performance_resilience(facts)
+    # Sort findings by severity (niveaux entiers, messages non rendus)
+    return {
+        "filtered": filtered,
+        "coverage": coverage,
+        "findings": findings.sorted(),
+        "levels": levels,
+    }
 
-    # Sort findings by severity
-    findings_sorted = sorted(findings, key=lambda x: severity_score(x[0]), reverse=True)
+def render_report(profile, result):
+    coverage = result["coverage"]
+    findings_sorted = result["findings"]
 
-    # Build report markdown
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     lines = []
-    lines.append(f"# {profile_name}")
+    lines.append(f"# {profile['name']}")
     lines.append("")
     lines.append(f"_Généré le {now}_")
     lines.append("")
@@ -352,39 +299,346 @@ def main():
     lines.append("Les données ci-dessous sont strictement limitées au périmètre du module.")
     lines.append("")
     lines.append("```json")
-    lines.append(json.dumps(filtered, indent=2, ensure_ascii=False))
+    lines.append(json.dumps(result["filtered"], indent=2, ensure_ascii=False))
     lines.append("```")
     lines.append("")
     lines.append("## 4. Recommandations (actions)")
     lines.append("")
     # Simple recommendation set, deterministic
-    if any(lvl == "critical" for lvl, _ in findings_sorted):
+    if findings_sorted.count("critical"):
         lines.append("- Prioriser les points **CRITICAL** avant toute optimisation.")
-    if "audit_server" in profile_slug:
-        lines.append("- Activer un pare-feu (UFW) et restreindre les ports exposés au strict nécessaire.")
-        lines.append("- Qualifier la stratégie de sauvegarde (externalisation + rétention + test de restauration).")
-    if "audit_web_security" in profile_slug:
-        lines.append("- Forcer HTTPS et surveiller l’expiration du certificat (alerte automatique).")
-        lines.append("- Durcir les permissions et vérifier les fichiers sensibles (wp-config.php).")
-    if "audit_wordpress" in profile_slug:
-        lines.append("- Mettre à jour core/plugins/thèmes et contrôler les comptes administrateurs.")
-    if "audit_performance_resilience" in profile_slug:
-        lines.append("- Vérifier versions PHP/MySQL, activer OPcache, qualifier cache applicatif si pertinent.")
-        lines.append("- Mettre en place un rollback réel (snapshots/blue-green) selon RTO attendu.")
+    lines.extend([f"- {r}" for r in profile["recommendations"]])
     lines.append("")
+    return "\n".join(lines)
+
+def write_outputs(report_dir: Path, result, markdown: str):
+    with stage("serialize"):
+        filtered_json = json.dumps(result["filtered"], indent=2, ensure_ascii=False)
+        coverage_json = json.dumps(result["coverage"], indent=2, ensure_ascii=False)
+    with stage("write"):
+        report_dir.mkdir(parents=True, exist_ok=True)
+        (report_dir / "facts.filtered.json").write_text(filtered_json, encoding="utf-8")
+        (report_dir / "coverage.json").write_text(coverage_json, encoding="utf-8")
+        (report_dir / "report.md").write_text(markdown, encoding="utf-8")
+
+def evaluate_cached(facts, profile, cache=None, key=None):
+    if cache is None:
+        return evaluate_profile(facts, profile)
+    key = key or cache.key(facts, profile)
+    result = cache.get(key)
+    if result is None:
+        result = evaluate_profile(facts, profile)
+        cache.put(key, result)
+    else:
+        result["findings"] = Findings.from_state(profile["rule_grid"], result["findings"])
+    return result
+
+def write_report(report_dir: Path, profile, result, raw, host):
+    with stage("render"):
+        markdown = render_report(profile, result)
+    write_outputs(report_dir, result, markdown)
+    if raw:
+        with stage("raw"):
+            write_raw(report_dir, profile, build_raw(profile, result, host))
+
+def apply_profile(facts, profile, outdir: Path, cache=None, raw=False, host=None, deltas=None, delta_only=False):
+    """
+    Évalue un profil et écrit ses rapports ; avec `raw`, l'objet RAW (AI-ready)
+    est construit depuis le même résultat en mémoire et écrit à côté.
+
+    Avec `deltas` (DeltaStore), delta.json décrit les changements depuis le run
+    précédent ; avec `delta_only`, les rapports complets ne sont écrits qu'au
+    premier run de l'hôte (aucun état précédent).
+    """
+    report_dir = outdir / profile["slug"]
+    result = None
+    if deltas is not None:
+        with stage("delta"):
+            delta, result = deltas.track(host, profile, facts, lambda: evaluate_cached(facts, profile, cache))
+            write_delta(report_dir, delta)
+        if delta_only and not (delta and delta["baseline"]):
+            return report_dir
+
+    if cache is None:
+        result = result or evaluate_profile(facts, profile)
+        write_report(report_dir, profile, result, raw, host)
+        return report_dir
+
+    key = cache.key(facts, profile)
+    if cache.is_current(report_dir, key) and (not raw or (report_dir / raw_filename(profile)).exists()):
+        return report_dir
+    result = result or evaluate_cached(facts, profile, cache, key)
+    write_report(report_dir, profile, result, raw, host)
+    cache.mark(report_dir, key)
+    return report_dir
 
-    # Write outputs
-    report_dir = outdir / profile_slug
-    report_dir.mkdir(parents=True, exist_ok=True)
+# -----------------------------
+# Streaming mode (NDJSON in, NDJSON out)
+# -----------------------------
+def iter_ndjson_facts(stream):
+    """
+    Lit un flux NDJSON ligne à ligne (mémoire constante).
+    Chaque ligne est soit {"host": ..., "facts": {...}}, soit un document facts brut
+    (l'hôte est alors identifié par son numéro de ligne: "#<n>").
+    """
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            with stage("load_facts"):
+                rec = json.loads(line)
+        except ValueError as e:
+            print(f"[ERREUR] ligne {lineno}: JSON invalide ({e})", file=sys.stderr)
+            continue
+        if not isinstance(rec, dict):
+            print(f"[ERREUR] ligne {lineno}: objet JSON attendu", file=sys.stderr)
+            continue
+        if isinstance(rec.get("facts"), dict):
+            yield str(rec.get("host") or f"#{lineno}"), rec["facts"]
+        else:
+            yield f"#{lineno}", rec
 
-    (report_dir / "facts.filtered.json").write_text(json.dumps(filtered, indent=2, ensure_ascii=False), encoding="utf-8")
-    (report_dir / "coverage.json").write_text(json.dumps(coverage, indent=2, ensure_ascii=False), encoding="utf-8")
-    (report_dir / "report.md").write_text("\n".join(lines), encoding="utf-8")
+def stream_record(host, profile, result):
+    return {
+        "host": host,
+        "profile": profile["slug"],
+        "engine_version": ENGINE_VERSION,
+        "coverage": result["coverage"],
+        "findings": [{"code": code, "level": lvl, "message": msg}
+                     for code, (lvl, msg) in zip(result["findings"].codes(), result["findings"])],
+    }
+
+def run_stream(source: str, profile_paths, dest: str, cache=None, raw=False, deltas=None, delta_only=False):
+    """
+    Avec `deltas`, chaque enregistrement porte le delta depuis le run précédent
+    ("delta") ; avec `delta_only`, seuls les deltas non vides sont émis.
+    """
+    profiles = [load_profile(Path(p)) for p in profile_paths]
+    src = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    out = sys.stdout if dest == "-" else open(dest, "w", encoding="utf-8")
+    hosts = 0
+    try:
+        for host, facts in iter_ndjson_facts(src):
+            for profile in profiles:
+                delta = result = None
+                if deltas is not None:
+                    with stage("delta"):
+                        delta, result = deltas.track(host, profile, facts, lambda: evaluate_cached(facts, profile, cache))
+                    if delta_only:
+                        if delta is not None:
+                            with stage("write"):
+                                out.write(json.dumps(delta, ensure_ascii=False) + "\n")
+                        continue
+                result = result or evaluate_cached(facts, profile, cache)
+                with stage("serialize"):
+                    record = build_raw(profile, result, host) if raw else stream_record(host, profile, result)
+                    if delta is not None:
+                        record["delta"] = delta
+                    line = json.dumps(record, ensure_ascii=False) + "\n"
+                with stage("write"):
+                    out.write(line)
+            # Un hôte = une écriture visible en aval (pipes)
+            out.flush()
+            hosts += 1
+            instrument.count("hosts")
+    except BrokenPipeError:
+        # Consommateur aval fermé: arrêt propre, sans trace
+        sys.stderr.close()
+        return 1
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"[OK] Stream: {hosts} hôtes x {len(profiles)} profils", file=sys.stderr)
+    return 0
+
+# -----------------------------
+# Fleet mode (many hosts, one process pool)
+# -----------------------------
+_FLEET_PROFILES = []
+_FLEET_OUTDIR = None
+_FLEET_CACHE = None
+_FLEET_RAW = False
+_FLEET_DELTAS = None
+_FLEET_DELTA_ONLY = False
+
+def discover_facts_files(source: str):
+    """
+    `source` est un dossier (recherche récursive de facts_all.json)
+    ou un motif glob (ex: "facts/*/facts_all.json", "fleet/*.json").
+    """
+    src = Path(source)
+    if src.is_dir():
+        return sorted(src.rglob("facts_all.json"))
+    return sorted(Path(p) for p in glob.glob(source, recursive=True) if Path(p).is_file())
+
+def host_name(facts_path: Path) -> str:
+    # facts/<host>/facts_all.json -> <host> ; fleet/<host>.json -> <host>
+    if facts_path.name == "facts_all.json":
+        return facts_path.parent.name
+    return facts_path.stem
+
+def _fleet_init(profile_paths, outdir, cache_dir=None, cache_max_entries=0, raw=False, metrics=False,
+                delta_state=None, delta_only=False):
+    # Avec fork, les grilles déjà chargées par le parent sont héritées telles quelles.
+    global _FLEET_PROFILES, _FLEET_OUTDIR, _FLEET_CACHE, _FLEET_RAW, _FLEET_DELTAS, _FLEET_DELTA_ONLY
+    instrument.enable(metrics)
+    if not _FLEET_PROFILES:
+        _FLEET_PROFILES = [load_profile(Path(p)) for p in profile_paths]
+    _FLEET_OUTDIR = Path(outdir)
+    _FLEET_RAW = raw
+    if cache_dir:
+        _FLEET_CACHE = AuditCache(Path(cache_dir), ENGINE_VERSION, cache_max_entries)
+    if delta_state:
+        _FLEET_DELTAS = DeltaStore(Path(delta_state), ENGINE_VERSION)
+    _FLEET_DELTA_ONLY = delta_only
+
+def _fleet_worker_init(*args):
+    # Mesures héritées du parent (fork): déjà comptées côté parent
+    instrument.drain()
+    _fleet_init(*args)
+
+def _fleet_audit_host(facts_path: str):
+    start = time.perf_counter()
+    path = Path(facts_path)
+    host = host_name(path)
+    before = dict(_FLEET_CACHE.stats) if _FLEET_CACHE else {}
+    before_deltas = dict(_FLEET_DELTAS.stats) if _FLEET_DELTAS else {}
+    try:
+        with stage("load_facts"):
+            facts = load_json(path)
+        for profile in _FLEET_PROFILES:
+            apply_profile(facts, profile, _FLEET_OUTDIR / host, _FLEET_CACHE, _FLEET_RAW, host,
+                          _FLEET_DELTAS, _FLEET_DELTA_ONLY)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    stats = {k: v - before[k] for k, v in _FLEET_CACHE.stats.items()} if _FLEET_CACHE else {}
+    delta_stats = {k: v - before_deltas[k] for k, v in _FLEET_DELTAS.stats.items()} if _FLEET_DELTAS else {}
+    instrument.count("hosts")
+    # Mesures du worker remontées au parent (delta par hôte)
+    metrics = instrument.drain() if instrument.ENABLED else None
+    return host, time.perf_counter() - start, error, stats, delta_stats, metrics
+
+def run_fleet(source: str, profile_paths, outdir: Path, workers: int, cache_dir=None, cache_max_entries=0, raw=False,
+              delta_state=None, delta_only=False):
+    from concurrent.futures import ProcessPoolExecutor  # mode flotte uniquement (import coûteux)
+
+    metrics = instrument.ENABLED
+    files = discover_facts_files(source)
+    if not files:
+        print(f"[ERREUR] Aucun fichier facts trouvé pour: {source}")
+        return 1
+
+    _fleet_init(profile_paths, outdir, cache_dir, cache_max_entries, raw, metrics, delta_state, delta_only)
+    workers = max(1, min(workers, len(files)))
+    chunksize = max(1, len(files) // (workers * 4))
+
+    durations = []
+    errors = []
+    start = time.perf_counter()
+    initargs = (profile_paths, str(outdir), cache_dir, cache_max_entries, raw, metrics, delta_state, delta_only)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_fleet_worker_init, initargs=initargs) as pool:
+        for host, elapsed, error, stats, delta_stats, host_metrics in pool.map(
+                _fleet_audit_host, [str(f) for f in files], chunksize=chunksize):
+            durations.append(elapsed)
+            if host_metrics:
+                instrument.merge(host_metrics)
+            for k, v in stats.items():
+                _FLEET_CACHE.stats[k] += v
+            for k, v in delta_stats.items():
+                _FLEET_DELTAS.stats[k] += v
+            if error:
+                errors.append((host, error))
+                print(f"[ERREUR] {host}: {error}")
+    total = time.perf_counter() - start
+
+    durations.sort()
+    print(f"[OK] Flotte auditée: {len(files) - len(errors)}/{len(files)} hôtes x {len(_FLEET_PROFILES)} profils -> {outdir}")
+    print(
+        f"[OK] Débit: {len(files) / total:.1f} hôtes/s en {total:.2f}s ({workers} workers) — "
+        f"p50 {percentile(durations, 50) * 1000:.1f} ms, p99 {percentile(durations, 99) * 1000:.1f} ms par hôte"
+    )
+    if _FLEET_CACHE:
+        _FLEET_CACHE.prune()
+        print(_FLEET_CACHE.summary())
+    if _FLEET_DELTAS:
+        print(_FLEET_DELTAS.summary())
+    return 1 if errors else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--facts", default="facts/facts_all.json", help="Chemin vers facts_all.json")
+    ap.add_argument("--profile", required=True, action="append", help="Chemin vers grids/audit_*.yaml (répétable)")
+    ap.add_argument("--outdir", default="reports", help="Dossier reports")
+    ap.add_argument("--fleet", help="Mode flotte: dossier ou motif glob de facts_all.json (un sous-dossier par hôte)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Mode flotte: nombre de processus")
+    ap.add_argument("--stream", help="Mode flux: facts NDJSON depuis un fichier ou '-' (stdin)")
+    ap.add_argument("--stream-out", default="-", help="Mode flux: sortie NDJSON (fichier ou '-' pour stdout)")
+    ap.add_argument("--cache", help="Dossier du cache d'audit incrémental (désactivé par défaut)")
+    ap.add_argument("--cache-max-entries", type=int, default=100000, help="Taille max du cache (entrées, éviction LRU)")
+    ap.add_argument("--raw", action="store_true", help="Écrire aussi l'audit RAW (AI-ready) ; en mode flux: un RAW NDJSON par hôte et profil")
+    ap.add_argument("--delta-state", help="Dossier d'état des runs précédents: delta par hôte et profil (delta.json / champ \"delta\")")
+    ap.add_argument("--delta-only", action="store_true", help="Avec --delta-state: n'émettre que les deltas non vides (rapports complets au premier run)")
+    ap.add_argument("--metrics-json", help="Instrumentation: résumé JSON des temps par étape et par contrôle")
+    ap.add_argument("--metrics-prom", help="Instrumentation: fichier textfile-collector Prometheus (.prom)")
+    args = ap.parse_args()
+    if args.delta_only and not args.delta_state:
+        ap.error("--delta-only requiert --delta-state")
+
+    instrument.enable(bool(args.metrics_json or args.metrics_prom))
+    code = run(args)
+    if args.metrics_json:
+        instrument.write_json(args.metrics_json)
+    if args.metrics_prom:
+        instrument.write_prometheus(args.metrics_prom)
+    if code:
+        sys.exit(code)
+
+def run(args):
+    outdir = Path(args.outdir)
 
-    print(f"[OK] Profil appliqué: {profile_slug}")
-    print(f"[OK] Report: {report_dir / 'report.md'}")
-    print(f"[OK] Facts filtrés: {report_dir / 'facts.filtered.json'}")
-    print(f"[OK] Coverage: {report_dir / 'coverage.json'}")
+    if args.fleet:
+        return run_fleet(args.fleet, args.profile, outdir, args.workers, args.cache, args.cache_max_entries, args.raw,
+                         args.delta_state, args.delta_only)
+
+    cache = AuditCache(Path(args.cache), ENGINE_VERSION, args.cache_max_entries) if args.cache else None
+    deltas = DeltaStore(Path(args.delta_state), ENGINE_VERSION) if args.delta_state else None
+    if args.stream:
+        code = run_stream(args.stream, args.profile, args.stream_out, cache, args.raw, deltas, args.delta_only)
+        if cache:
+            cache.prune()
+            print(cache.summary(), file=sys.stderr)
+        if deltas and not sys.stderr.closed:
+            print(deltas.summary(), file=sys.stderr)
+        return code
+
+    with stage("load_facts"):
+        facts = load_json(Path(args.facts))
+    instrument.count("hosts")
+    for profile_path in args.profile:
+        profile = load_profile(Path(profile_path))
+        report_dir = apply_profile(facts, profile, outdir, cache, args.raw, None, deltas, args.delta_only)
+
+        print(f"[OK] Profil appliqué: {profile['slug']}")
+        if deltas:
+            delta_file = report_dir / DELTA_FILE
+            print(f"[OK] Delta: {delta_file}" if delta_file.exists() else "[OK] Delta: aucun changement")
+            if args.delta_only:
+                continue
+        print(f"[OK] Report: {report_dir / 'report.md'}")
+        print(f"[OK] Facts filtrés: {report_dir / 'facts.filtered.json'}")
+        print(f"[OK] Coverage: {report_dir / 'coverage.json'}")
+        if args.raw:
+            print(f"[OK] RAW: {report_dir / raw_filename(profile)}")
+    if cache:
+        cache.prune()
+        print(cache.summary())
+    if deltas:
+        print(deltas.summary())
+    return 0
 
 if __name__ == "__main__":
     main()
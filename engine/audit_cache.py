@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache d'audit incrémental, adressé par contenu.
+
+Clé = hash(version moteur, contenu des grilles, valeurs des facts lus par le profil).
+- même clé que le dernier rendu du dossier de rapport -> ni évaluation ni écriture
+- clé connue du cache (autre hôte / autre dossier) -> évaluation évitée, rendu seul
+- clé inconnue -> évaluation complète, résultat mis en cache
+
+Le cache est borné en nombre d'entrées (éviction LRU sur mtime, à la fin du run).
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+KEY_FILE = ".audit_key"
+
+def _get(facts, keys):
+    cur = facts
+    for k in keys:
+        if not isinstance(cur, dict) or k not in cur:
+            return None
+        cur = cur[k]
+    return cur
+
+def audit_key(facts, profile, engine_version):
+    """Empreinte de tout ce dont dépend le résultat d'un profil pour un hôte."""
+    payload = [engine_version, profile["grid_hash"]]
+    payload.extend(_get(facts, keys) for keys in profile["key_paths"])
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+class AuditCache:
+    def __init__(self, root: Path, engine_version: str, max_entries: int = 100000):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.engine_version = engine_version
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "writes_skipped": 0, "evicted": 0}
+
+    # -- clés ---------------------------------------------------------------
+    def key(self, facts, profile):
+        return audit_key(facts, profile, self.engine_version)
+
+    def _entry(self, key):
+        return self.root / key[:2] / f"{key}.json"
+
+    # -- dossiers de rapport --------------------------------------------------
+    def is_current(self, report_dir: Path, key: str):
+        """Le dossier contient déjà le rendu de cette clé : rien à recalculer ni réécrire."""
+        try:
+            current = (report_dir / KEY_FILE).read_text(encoding="utf-8") == key
+        except OSError:
+            return False
+        if current:
+            self.stats["hits"] += 1
+            self.stats["writes_skipped"] += 1
+        return current
+
+    def mark(self, report_dir: Path, key: str):
+        (report_dir / KEY_FILE).write_text(key, encoding="utf-8")
+
+    # -- résultats ------------------------------------------------------------
+    def get(self, key):
+        entry = self._entry(key)
+        try:
+            result = json.loads(entry.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        os.utime(entry)  # LRU
+        self.stats["hits"] += 1
+        return result
+
+    def put(self, key, result):
+        entry = self._entry(key)
+        entry.parent.mkdir(exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        # Constats en colonnes (Findings.to_state) ; restaurés par l'appelant, qui connaît la grille
+        data = dict(result, findings=result["findings"].to_state())
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, entry)
+
+    def prune(self):
+        """Évince les entrées les moins récemment utilisées au-delà de max_entries."""
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for e in os.scandir(shard.path):
+                if e.name.endswith(".json"):
+                    entries.append((e.stat().st_mtime, e.path))
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.stats["evicted"] += excess
+        return excess
+
+    def summary(self):
+        s = self.stats
+        total = s["hits"] + s["misses"]
+        recomputed = 100.0 * s["misses"] / total if total else 0.0
+        return (
+            f"[OK] Cache: {s['hits']} hits / {s['misses']} misses ({recomputed:.1f}% recalculé), "
+            f"{s['writes_skipped']} écritures évitées, {s['evicted']} entrées évincées"
+        )
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Delta d'audit entre deux runs, par hôte et par profil.
+
+Le résultat du run précédent est conservé sous forme compacte (niveau par
+contrôle, messages des constats, facts filtrés aplatis, points non mesurables)
+dans un dossier d'état : <état>/<hôte>/<profil>.json. À chaque run, le delta
+structuré est calculé :
+  - constats nouveaux, résolus, ou dont la sévérité a changé ;
+  - facts filtrés dont la valeur a changé ;
+  - régressions (et rétablissements) de couverture.
+
+Les mesures volatiles déclarées par la grille ou le profil (`volatile_facts`:
+uptime, charge, temps de réponse...) varient à chaque run : leurs dernières
+valeurs sont conservées dans l'état, mais leur seule variation ne rend pas un
+delta non vide. Quand un delta est émis pour une autre raison, elles y
+figurent à titre de contexte ("volatile": true).
+
+La clé d'audit (audit_cache.audit_key) est conservée avec l'état : tant
+qu'elle ne change pas, l'hôte n'est pas réévalué et son delta est vide. En
+mode delta seul, l'aval ne reçoit que ce qui a changé : son volume suit le
+nombre de changements, pas la taille de la flotte.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from audit_cache import audit_key
+from rule_engine import FINDING_LEVELS, finding_code
+
+STATE_VERSION = 1
+DELTA_FILE = "delta.json"
+
+# -----------------------------
+# Snapshot (état compact d'un run)
+# -----------------------------
+def flatten(doc, prefix=""):
+    """{chemin.pointé: valeur} des feuilles d'un document (les listes sont des feuilles)."""
+    out = {}
+    for k, v in doc.items():
+        path = f"{prefix}{k}"
+        if isinstance(v, dict) and v:
+            out.update(flatten(v, path + "."))
+        else:
+            out[path] = v
+    return out
+
+def snapshot(result, key, generated_at=None):
+    coverage = result["coverage"]
+    return {
+        "v": STATE_VERSION,
+        "key": key,
+        "at": generated_at or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "levels": dict(result["levels"]),
+        "messages": dict(zip(result["findings"].check_ids(), result["findings"].messages())),
+        "codes": dict(zip(result["findings"].check_ids(), result["findings"].codes())),
+        "facts": flatten(result["filtered"]),
+        "required_missing": list(coverage["required_missing"]),
+        "optional_missing": list(coverage["optional_missing"]),
+    }
+
+# -----------------------------
+# Delta
+# -----------------------------
+def _finding(snap, cid, level):
+    # Code de la règle déclenchée ; état antérieur sans codes: code du contrôle
+    code = snap.get("codes", {}).get(cid) or finding_code(cid)
+    return {"code": code, "check": cid, "level": level, "message": snap["messages"].get(cid)}
+
+def is_volatile(path, volatile):
+    """`path` est une mesure volatile, ou se trouve sous un préfixe volatil."""
+    return any(path == v or path.startswith(v + ".") for v in volatile)
+
+def compute_delta(prev, cur, host, profile_slug, engine_version, volatile=()):
+    """
+    Delta structuré entre deux snapshots ; None si rien n'a changé.
+    Sans snapshot précédent (premier run), `baseline` est vrai et tous les
+    constats courants sont « nouveaux ». Les facts de `volatile` n'entrent pas
+    dans le test « rien n'a changé ».
+    """
+    prev = prev or {}
+    p_levels, c_levels = prev.get("levels", {}), cur["levels"]
+    new, changed, resolved = [], [], []
+    for cid, level in c_levels.items():
+        if level not in FINDING_LEVELS:
+            continue
+        before = p_levels.get(cid)
+        if before not in FINDING_LEVELS:
+            new.append(_finding(cur, cid, level))
+        elif before != level:
+            f = _finding(cur, cid, level)
+            f["previous_level"] = before
+            changed.append(f)
+    for cid, before in p_levels.items():
+        if before in FINDING_LEVELS and c_levels.get(cid) not in FINDING_LEVELS:
+            f = _finding(prev, cid, c_levels.get(cid))
+            f["previous_level"] = before
+            resolved.append(f)
+
+    facts, stable = [], False
+    if prev:
+        p_facts, c_facts = prev["facts"], cur["facts"]
+        for path in sorted(p_facts.keys() | c_facts.keys()):
+            if p_facts.get(path) != c_facts.get(path):
+                change = {"path": path, "from": p_facts.get(path), "to": c_facts.get(path)}
+                if is_volatile(path, volatile):
+                    change["volatile"] = True
+                else:
+                    stable = True
+                facts.append(change)
+
+    coverage = {}
+    for name in ("required_missing", "optional_missing"):
+        before, now = set(prev.get(name, ())), set(cur[name])
+        coverage[name.replace("missing", "regressed")] = sorted(now - before)
+        coverage[name.replace("missing", "recovered")] = sorted(before - now)
+
+    if prev and not (new or changed or resolved or stable or any(coverage.values())):
+        return None
+    return {
+        "host": host,
+        "profile": profile_slug,
+        "engine_version": engine_version,
+        "generated_at": cur["at"],
+        "previous_at": prev.get("at"),
+        "baseline": not prev,
+        "findings": {"new": new, "resolved": resolved, "changed": changed},
+        "facts": facts,
+        "coverage": coverage,
+    }
+
+# -----------------------------
+# State store
+# -----------------------------
+def _safe(name):
+    return name.replace("/", "_").lstrip(".") or "_"
+
+class DeltaStore:
+    def __init__(self, root: Path, engine_version: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.engine_version = engine_version
+        self.stats = {"baseline": 0, "changed": 0, "unchanged": 0}
+
+    def _entry(self, host, slug):
+        return self.root / _safe(host or "_local") / f"{slug}.json"
+
+    def load(self, host, slug):
+        try:
+            snap = json.loads(self._entry(host, slug).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return snap if snap.get("v") == STATE_VERSION else None
+
+    def save(self, host, slug, snap):
+        entry = self._entry(host, slug)
+        entry.parent.mkdir(exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(snap, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, entry)
+
+    def track(self, host, profile, facts, evaluate):
+        """
+        Compare le run courant au précédent et met l'état à jour.
+        Retourne (delta ou None, résultat ou None) ; `evaluate()` n'est appelé
+        que si la clé d'audit a changé. Les mesures volatiles restent dans la
+        clé (des contrôles les lisent: un redémarrage doit être réévalué) mais
+        ne suffisent pas à produire un delta.
+        """
+        key = audit_key(facts, profile, self.engine_version)
+        prev = self.load(host, profile["slug"])
+        if prev is not None and prev["key"] == key:
+            self.stats["unchanged"] += 1
+            return None, None
+        result = evaluate()
+        cur = snapshot(result, key)
+        delta = compute_delta(prev, cur, host, profile["slug"], self.engine_version,
+                              profile.get("volatile_paths", ()))
+        self.save(host, profile["slug"], cur)
+        self.stats["baseline" if prev is None else "changed" if delta else "unchanged"] += 1
+        return delta, result
+
+    def summary(self):
+        s = self.stats
+        total = sum(s.values())
+        return (f"[OK] Delta: {s['changed']} modifiés, {s['baseline']} nouveaux, "
+                f"{s['unchanged']} inchangés sur {total} hôtes x profils")
+
+def write_delta(report_dir: Path, delta):
+    """delta.json du dossier de rapport ; supprimé quand rien n'a changé (rien à renvoyer en aval)."""
+    path = report_dir / DELTA_FILE
+    if delta is None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return None
+    report_dir.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(delta, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage colonnaire des facts d'une flotte + requêtes vectorisées.
+
+Un dossier de store contient, par chemin de fact:
+- facts numériques : tableau float64 (NaN si non mesurable)
+- booléens / chaînes / listes : codes int32 + dictionnaire (encodage par dictionnaire)
+- pour toutes les colonnes : bitmap `non_mesurable` (1 bit par hôte)
+
+Les tableaux sont des fichiers memory-mappés (numpy.memmap) ; les lots d'hôtes
+sont ajoutés (ou remplacés, même nom d'hôte) sans réécrire le reste du store.
+Les seuils des grilles (rule_engine) s'appliquent à toute la flotte d'un coup.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from apply_audit_profile import discover_facts_files, host_name, load_json, load_profile
+from rule_engine import DERIVATIONS, LEVELS, compile_ast, is_nm, parse_expr, to_number
+
+STORE_VERSION = 1
+MANIFEST = "manifest.json"
+INITIAL_CAPACITY = 1024
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def flatten_facts(facts, prefix=""):
+    """Feuilles d'un document facts: {chemin.pointé: valeur} (les listes sont des feuilles)."""
+    out = {}
+    for k, v in facts.items():
+        path = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten_facts(v, path + "."))
+        else:
+            out[path] = v
+    return out
+
+def _dict_key(v):
+    # True == 1 en Python : le type fait partie de la clé du dictionnaire
+    if isinstance(v, (list, dict)):
+        # listes d'objets (ex. security_infra.listeners) : forme JSON canonique
+        return ("json", json.dumps(v, sort_keys=True, ensure_ascii=False))
+    return (type(v).__name__, v)
+
+def _bitmap_bytes(capacity):
+    return (capacity + 7) // 8
+
+# -----------------------------
+# Store
+# -----------------------------
+class FleetStore:
+    def __init__(self, path: Path, mode="r"):
+        self.path = Path(path)
+        self.mode = mode
+        manifest_path = self.path / MANIFEST
+        if manifest_path.exists():
+            self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if self.manifest.get("version") != STORE_VERSION:
+                raise ValueError(f"Version de store non supportée: {self.manifest.get('version')}")
+        elif mode == "r":
+            raise FileNotFoundError(f"Store introuvable: {self.path}")
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.manifest = {"version": STORE_VERSION, "capacity": INITIAL_CAPACITY, "hosts": [], "columns": {}}
+
+        self.hosts = self.manifest["hosts"]
+        self.host_index = {h: i for i, h in enumerate(self.hosts)}
+        self._arrays = {}
+        self._dict_index = {
+            path: {_dict_key(v): i for i, v in enumerate(col["dictionary"])}
+            for path, col in self.manifest["columns"].items()
+            if col["kind"] == "code"
+        }
+
+    @property
+    def size(self):
+        return len(self.hosts)
+
+    @property
+    def capacity(self):
+        return self.manifest["capacity"]
+
+    # -- fichiers -----------------------------------------------------------
+    def _files(self, col):
+        values = self.path / (f"{col['id']}.f8" if col["kind"] == "num" else f"{col['id']}.i4")
+        return values, self.path / f"{col['id']}.nm"
+
+    def _open(self, path):
+        if path not in self._arrays:
+            col = self.manifest["columns"][path]
+            values_file, nm_file = self._files(col)
+            dtype = np.float64 if col["kind"] == "num" else np.int32
+            mode = "r" if self.mode == "r" else "r+"
+            self._arrays[path] = (
+                np.memmap(values_file, dtype=dtype, mode=mode, shape=(self.capacity,)),
+                np.memmap(nm_file, dtype=np.uint8, mode=mode, shape=(_bitmap_bytes(self.capacity),)),
+            )
+        return self._arrays[path]
+
+    def _create_column_files(self, col, capacity, old=None):
+        values_file, nm_file = self._files(col)
+        dtype = np.float64 if col["kind"] == "num" else np.int32
+        values = np.memmap(values_file.with_suffix(".tmp"), dtype=dtype, mode="w+", shape=(capacity,))
+        values[:] = np.nan if col["kind"] == "num" else -1
+        nm = np.memmap(nm_file.with_suffix(".tmpnm"), dtype=np.uint8, mode="w+", shape=(_bitmap_bytes(capacity),))
+        nm[:] = 0xFF
+        if old is not None:
+            old_values, old_nm = old
+            values[:len(old_values)] = old_values
+            nm[:len(old_nm)] = old_nm
+        values.flush()
+        nm.flush()
+        del values, nm
+        os.replace(values_file.with_suffix(".tmp"), values_file)
+        os.replace(nm_file.with_suffix(".tmpnm"), nm_file)
+
+    def _add_column(self, path, kind):
+        col = {"id": len(self.manifest["columns"]), "kind": kind}
+        if kind == "code":
+            col["dictionary"] = []
+            self._dict_index[path] = {}
+        self.manifest["columns"][path] = col
+        self._create_column_files(col, self.capacity)
+        return col
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        for path, col in self.manifest["columns"].items():
+            old = tuple(np.array(a) for a in self._open(path))
+            self._arrays.pop(path, None)
+            self._create_column_files(col, capacity, old)
+        self.manifest["capacity"] = capacity
+
+    def _save_manifest(self):
+        tmp = self.path / (MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path / MANIFEST)
+
+    # -- ingestion ----------------------------------------------------------
+    def append(self, records):
+        """
+        Ajoute un lot [(hôte, facts)]. Un hôte déjà présent est remplacé en place.
+        """
+        if self.mode == "r":
+            raise ValueError("Store ouvert en lecture seule")
+
+        rows = []
+        for host, facts in records:
+            if host not in self.host_index:
+                self.host_index[host] = len(self.hosts)
+                self.hosts.append(host)
+            rows.append((self.host_index[host], flatten_facts(facts)))
+        if not rows:
+            return 0
+        self._grow(len(self.hosts))
+
+        # Colonnes nouvelles: type déduit de la première valeur mesurée
+        for _, flat in rows:
+            for path, v in flat.items():
+                if path in self.manifest["columns"] or is_nm(v):
+                    continue
+                kind = "num" if isinstance(v, (int, float)) and not isinstance(v, bool) else "code"
+                self._add_column(path, kind)
+        for _, flat in rows:
+            for path, v in flat.items():
+                if path not in self.manifest["columns"]:
+                    self._add_column(path, "code")
+
+        row_idx = np.fromiter((i for i, _ in rows), dtype=np.int64, count=len(rows))
+        for path, col in self.manifest["columns"].items():
+            values, nm_packed = self._open(path)
+            nm = np.unpackbits(nm_packed, count=self.capacity).astype(bool)
+            batch_nm = np.ones(len(rows), dtype=bool)
+            if col["kind"] == "num":
+                batch = np.full(len(rows), np.nan)
+                for j, (_, flat) in enumerate(rows):
+                    n = None if is_nm(flat.get(path)) else to_number(flat.get(path))
+                    if n is not None:
+                        batch[j] = n
+                        batch_nm[j] = False
+            else:
+                index = self._dict_index[path]
+                dictionary = col["dictionary"]
+                batch = np.full(len(rows), -1, dtype=np.int32)
+                for j, (_, flat) in enumerate(rows):
+                    v = flat.get(path)
+                    if is_nm(v):
+                        continue
+                    key = _dict_key(v)
+                    code = index.get(key)
+                    if code is None:
+                        code = index[key] = len(dictionary)
+                        dictionary.append(v)
+                    batch[j] = code
+                    batch_nm[j] = False
+            values[row_idx] = batch
+            nm[row_idx] = batch_nm
+            nm_packed[:] = np.packbits(nm)[:len(nm_packed)]
+            values.flush()
+            nm_packed.flush()
+
+        self._save_manifest()
+        return len(rows)
+
+    # -- lecture ------------------------------------------------------------
+    def nm_mask(self, path):
+        if path not in self.manifest["columns"]:
+            return np.ones(self.size, dtype=bool)
+        _, nm_packed = self._open(path)
+        return np.unpackbits(nm_packed, count=self.size).astype(bool)
+
+    def view(self, path):
+        """Vue vectorisée d'une colonne (NumView ou CodeView), NM partout si absente."""
+        col = self.manifest["columns"].get(path)
+        if col is None:
+            return CodeView(np.full(self.size, -1, dtype=np.int32), [])
+        values, _ = self._open(path)
+        nm = self.nm_mask(path)
+        if col["kind"] == "num":
+            return NumView(np.asarray(values[:self.size]), nm)
+        return CodeView(np.asarray(values[:self.size]), col["dictionary"])
+
+# -----------------------------
+# Vectorized views & predicates
+# -----------------------------
+class NumView:
+    def __init__(self, values, nm):
+        self.values = values
+        self.nm = nm
+
+class CodeView:
+    """codes[i] indexe `dictionary` ; -1 = non mesurable."""
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @property
+    def nm(self):
+        return self.codes < 0
+
+def as_num(view):
+    if isinstance(view, NumView):
+        return view
+    lookup = np.array([np.nan] + [
+        np.nan if to_number(v) is None else float(to_number(v)) for v in view.dictionary
+    ])
+    values = lookup[view.codes + 1]
+    return NumView(values, np.isnan(values))
+
+def as_codes(view):
+    if isinstance(view, CodeView):
+        return view
+    uniq, inverse = np.unique(view.values[~view.nm], return_inverse=True)
+    codes = np.full(len(view.values), -1, dtype=np.int32)
+    codes[~view.nm] = inverse
+    return CodeView(codes, [int(v) if float(v).is_integer() else float(v) for v in uniq])
+
+_NUM_VEC = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+
+def _num_term(view, op, lit):
+    values, nm = view.values, view.nm
+    with np.errstate(invalid="ignore"):
+        if op in _NUM_VEC:
+            return _NUM_VEC[op](values, lit) & ~nm
+        if op in ("in", "not in"):
+            nums = [float(n) for n in (to_number(x) for x in lit) if n is not None]
+            hit = np.isin(values, nums) & ~nm
+            return hit if op == "in" else ~nm & ~hit
+        if lit is None:
+            return nm.copy() if op == "==" else ~nm
+        n = None if isinstance(lit, bool) else to_number(lit)
+        hit = (values == n) & ~nm if n is not None else np.zeros(len(values), dtype=bool)
+        return hit if op == "==" else ~nm & ~hit
+
+def match(view, ast):
+    """Masque booléen des hôtes satisfaisant l'expression `ast` (rule_engine.parse_expr)."""
+    if isinstance(view, CodeView):
+        # Une évaluation scalaire par entrée du dictionnaire, puis indexation par code
+        pred = compile_ast(ast)
+        table = np.array([pred(None, None)] + [pred(v, to_number(v)) for v in view.dictionary], dtype=bool)
+        return table[view.codes + 1]
+    out = np.zeros(len(view.values), dtype=bool)
+    for alt in ast:
+        m = np.ones(len(view.values), dtype=bool)
+        for op, lit in alt:
+            m &= _num_term(view, op, lit)
+        out |= m
+    return out
+
+# -----------------------------
+# Grid facts over the fleet
+# -----------------------------
+def _view_ratio(sources, params):
+    num, den = as_num(sources[0]), as_num(sources[1])
+    ok = ~den.nm & (den.values > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = np.where(ok, np.round(num.values / np.where(ok, den.values, 1), 2), num.values)
+    return NumView(values, num.nm)
+
+def _view_generic(fn, sources, params):
+    # Une évaluation par combinaison distincte de valeurs sources
+    views = [as_codes(v) for v in sources]
+    stacked = np.stack([v.codes for v in views], axis=1)
+    combos, inverse = np.unique(stacked, axis=0, return_inverse=True)
+    dictionary, codes_map, index = [], np.empty(len(combos), dtype=np.int32), {}
+    for i, combo in enumerate(combos):
+        args = tuple(None if c < 0 else views[k].dictionary[c] for k, c in enumerate(combo))
+        result = fn(args, params)
+        if is_nm(result):
+            codes_map[i] = -1
+            continue
+        key = _dict_key(result)
+        if key not in index:
+            index[key] = len(dictionary)
+            dictionary.append(result)
+        codes_map[i] = index[key]
+    return CodeView(codes_map[inverse.reshape(-1)], dictionary)
+
+VIEW_DERIVATIONS = {"ratio": _view_ratio}
+
+def fact_view(store, rule_grid, name):
+    spec = rule_grid["fact_specs"][name]
+    if isinstance(spec, str):
+        return store.view(spec)
+    sources = spec.get("from") or []
+    if isinstance(sources, str):
+        sources = [sources]
+    views = [store.view(p) for p in sources]
+    params = {k: v for k, v in spec.items() if k not in ("derive", "from")}
+    if spec["derive"] in VIEW_DERIVATIONS:
+        return VIEW_DERIVATIONS[spec["derive"]](views, params)
+    return _view_generic(DERIVATIONS[spec["derive"]], views, params)
+
+def fleet_levels(store, profile):
+    """
+    Niveaux de chaque contrôle du profil pour toute la flotte:
+    {id_contrôle: tableau int8 (indice dans LEVELS, -1 = désactivé)}.
+    """
+    rule_grid = profile["rule_grid"]
+    views = {}
+
+    def get(name):
+        if name not in views:
+            views[name] = fact_view(store, rule_grid, name)
+        return views[name]
+
+    out = {}
+    for check in profile["checks"]:
+        enabled = np.ones(store.size, dtype=bool)
+        for fact, _, ast in check["enabled_if"]:
+            enabled &= match(get(fact), ast)
+
+        view = get(check["fact"])
+        levels = np.full(store.size, LEVELS.index(check["default"][0]), dtype=np.int8)
+        matched = np.zeros(store.size, dtype=bool)
+        for _, level, _, ast in check["rules"]:
+            m = match(view, ast) & ~matched
+            levels[m] = LEVELS.index(level)
+            matched |= m
+        levels[~enabled] = -1
+        out[check["id"]] = levels
+    return out
+
+_WHERE = re.compile(r"^\s*([\w.]+)\s*(.+)$")
+
+def select_hosts(store, conditions):
+    """
+    `conditions`: ["system.disk_used_percent >= 90", "security_infra.firewall_present == false"]
+    (ET logique). Retourne la liste des hôtes correspondants.
+    """
+    mask = np.ones(store.size, dtype=bool)
+    for cond in conditions:
+        m = _WHERE.match(cond)
+        if not m:
+            raise ValueError(f"Condition invalide: {cond!r}")
+        mask &= match(store.view(m.group(1)), parse_expr(m.group(2)))
+    return [store.hosts[i] for i in np.flatnonzero(mask)]
+
+# -----------------------------
+# CLI
+# -----------------------------
+def cmd_ingest(args):
+    store = FleetStore(Path(args.store), mode="w")
+    files = discover_facts_files(args.fleet)
+    total = 0
+    for i in range(0, len(files), args.batch):
+        batch = files[i:i + args.batch]
+        total += store.append((host_name(f), load_json(f)) for f in batch)
+    print(f"[OK] {total} hôtes ingérés -> {args.store} ({store.size} hôtes, {len(store.manifest['columns'])} colonnes)")
+
+def cmd_query(args):
+    store = FleetStore(Path(args.store))
+    hosts = select_hosts(store, args.where)
+    for h in hosts:
+        print(h)
+    print(f"[OK] {len(hosts)}/{store.size} hôtes", file=sys.stderr)
+
+def cmd_levels(args):
+    store = FleetStore(Path(args.store))
+    for profile_path in args.profile:
+        profile = load_profile(Path(profile_path))
+        print(f"# {profile['slug']} ({store.size} hôtes)")
+        print(f"{'contrôle':<36} {'critical':>9} {'warning':>9} {'ok':>9} {'désactivé':>10}")
+        for check_id, levels in fleet_levels(store, profile).items():
+            counts = [int(np.count_nonzero(levels == i)) for i in range(len(LEVELS))]
+            print(f"{check_id:<36} {counts[0]:>9} {counts[1]:>9} {counts[2]:>9} {int(np.count_nonzero(levels < 0)):>10}")
+            if args.list:
+                hosts = [store.hosts[i] for i in np.flatnonzero(levels == LEVELS.index(args.list))]
+                if hosts:
+                    print(f"    {args.list}: {', '.join(hosts)}")
+        print("")
+
+def main():
+    ap = argparse.ArgumentParser(description="Store colonnaire des facts de flotte")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="Ajoute (ou remplace) des hôtes dans le store")
+    p.add_argument("--store", required=True, help="Dossier du store")
+    p.add_argument("--fleet", required=True, help="Dossier ou motif glob de facts_all.json")
+    p.add_argument("--batch", type=int, default=1000, help="Hôtes par lot")
+    p.set_defaults(fn=cmd_ingest)
+
+    p = sub.add_parser("query", help="Liste les hôtes satisfaisant toutes les conditions")
+    p.add_argument("--store", required=True)
+    p.add_argument("--where", action="append", required=True, help='ex: "system.disk_used_percent >= 90"')
+    p.set_defaults(fn=cmd_query)
+
+    p = sub.add_parser("levels", help="Applique les règles des profils à toute la flotte")
+    p.add_argument("--store", required=True)
+    p.add_argument("--profile", action="append", required=True, help="Chemin vers grids/audit_*.yaml (répétable)")
+    p.add_argument("--list", choices=LEVELS, help="Affiche les hôtes de ce niveau pour chaque contrôle")
+    p.set_defaults(fn=cmd_levels)
+
+    args = ap.parse_args()
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,35 @@
 #!/usr/bin/env python3
-import json
-from datetime import datetime
-from pathlib import Path
+# -*- coding: utf-8 -*-
+"""
+Générateur d'audit brut **AI-ready** (RAW), pour tout profil.
+
+Le RAW est construit en mémoire à partir du résultat du moteur
+(`apply_audit_profile.evaluate_profile`) : plus de relecture de
+facts.filtered.json / coverage.json sur disque. Les constats viennent des
+contrôles compilés de la grille ; une valeur `non_mesurable` ne peut donc plus
+faire échouer la génération.
+
+    # un hôte, un ou plusieurs profils -> reports/<profil>/<profil>.raw.json
+    python3 engine/generate_audit_raw.py --facts facts/facts_all.json --profile grids/audit_server_v1.yaml
+    # lot: un objet RAW par hôte et par profil, en NDJSON
+    python3 engine/generate_audit_raw.py --fleet facts/ --profile grids/audit_server_v1.yaml --ndjson raw.ndjson
+"""
 
-BASE = Path(__file__).resolve().parents[1]
-REPORT = BASE / "reports/audit_server_v1"
+import json
+from datetime import datetime, timezone
 
-FACTS_FILE = REPORT / "facts.filtered.json"
-COVERAGE_FILE = REPORT / "coverage.json"
-OUT_FILE = REPORT / "audit_server_v1.raw.json"
+from rule_engine import is_nm
 
-facts = json.loads(FACTS_FILE.read_text())
-coverage = json.loads(COVERAGE_FILE.read_text())
+# Version du format RAW (contrat des scénarios Make) ; voir CHANGELOG
+#   1.0  codes écrits à la main (SEC_FIREWALL_ABSENT, ...)
+#   2.0  codes par règle de la grille (NETWORK_FIREWALL_CRITICAL, ...), champ `check` ;
+#        `impact` et `recommended_action` toujours présents (null si la grille n'en donne pas)
+RAW_VERSION = "2.0"
 
 # ---------------------------
 # AI PROMPT — CANONIQUE
 # ---------------------------
-ai_prompt = {
+AI_PROMPT = {
     "role": "instruction",
     "audience": "client_non_technique",
     "objective": "Transformer un audit serveur brut en rapport client professionnel",
@@ -33,91 +46,142 @@ ai_prompt = {
     "output_format": "rapport client structuré"
 }
 
+def raw_filename(profile):
+    return f"{profile['slug']}.raw.json"
+
+def write_raw(report_dir, profile, raw):
+    report_dir.mkdir(parents=True, exist_ok=True)
+    out_file = report_dir / raw_filename(profile)
+    out_file.write_text(json.dumps(raw, indent=2, ensure_ascii=False), encoding="utf-8")
+    return out_file
+
 # ---------------------------
 # FINDINGS — NORMALISATION
 # ---------------------------
-critical = []
-warning = []
-ok = []
-
-if not facts["security_infra"]["firewall_present"]:
-    critical.append({
-        "code": "SEC_FIREWALL_ABSENT",
-        "message": "Pare-feu inactif sur un serveur exposé à Internet",
-        "impact": "Exposition directe aux attaques réseau",
-        "recommended_action": "Activer un pare-feu (UFW) et restreindre les ports"
-    })
-
-open_ports = facts["security_infra"].get("open_ports", [])
-if open_ports:
-    warning.append({
-        "code": "SEC_OPEN_PORTS",
-        "message": "Ports ouverts à justifier",
-        "details": open_ports,
-        "recommended_action": "Fermer les ports non utilisés ou documenter leur usage"
-    })
-
-if facts["system"]["cpu_load_15m"] == "non_mesurable":
-    warning.append({
-        "code": "CPU_NOT_MEASURED",
-        "message": "Charge CPU non mesurable",
-        "reason": "Outil ou droit système manquant",
-        "recommended_action": "Activer les métriques CPU pour le suivi"
-    })
-
-if facts["security_infra"]["ssh_root_login"] is False:
-    ok.append("Accès SSH root désactivé")
-
-if facts["security_infra"]["fail2ban_present"]:
-    ok.append("Fail2ban actif")
-
-if facts["system"]["disk_used_percent"] < 70:
-    ok.append("Espace disque confortable")
+def normalize_findings(result):
+    # Codes et contrôles lus dans les colonnes des constats ; messages rendus ici (écriture du RAW)
+    out = {"critical": [], "warning": [], "ok": []}
+    findings = result["findings"]
+    checks = findings.grid["checks"] if findings.grid else ()
+    for i, (code, (level, message)) in enumerate(zip(findings.codes(), findings)):
+        check = checks[findings.check[i]]
+        impact, action = check["details"][findings.rule[i]]
+        out[level].append({"code": code, "check": check["id"], "message": message,
+                           "impact": impact, "recommended_action": action})
+    # Points conformes: libellés lisibles (« Pare-feu actif »), comme le RAW 1.0
+    by_id = {c["id"]: c for c in checks}
+    out["ok"] = [by_id[cid]["ok_label"] for cid, lvl in result["levels"].items() if lvl == "ok"]
+    return out
 
 # ---------------------------
 # METRICS — HUMAN FRIENDLY
 # ---------------------------
-uptime_hours = facts["system"]["uptime_hours"]
-uptime_days = uptime_hours // 24
-
-metrics = {
-    "system": {
-        "os": f"{facts['system']['os_name']} {facts['system']['os_version']}",
-        "uptime_hours": uptime_hours,
-        "uptime_human": f"{uptime_days} jours",
-        "disk_used_percent": facts["system"]["disk_used_percent"],
-        "ram_free_percent": facts["system"]["ram_free_percent"],
-        "cpu_load_15m": facts["system"]["cpu_load_15m"]
-    },
-    "security_infra": facts["security_infra"],
-    "resilience": facts["resilience"],
-    "logs": facts["logs"]
-}
+def build_metrics(filtered):
+    metrics = json.loads(json.dumps(filtered))
+    system = metrics.get("system")
+    if isinstance(system, dict):
+        uptime = system.get("uptime_hours")
+        if not is_nm(uptime) and isinstance(uptime, (int, float)) and not isinstance(uptime, bool):
+            system["uptime_human"] = f"{int(uptime // 24)} jours"
+        if "os_name" in system and "os_version" in system:
+            system["os"] = f"{system['os_name']} {system['os_version']}"
+    return metrics
 
 # ---------------------------
 # FINAL RAW OBJECT
 # ---------------------------
-raw = {
-    "ai_prompt": ai_prompt,
-    "analysis": {
-        "meta": {
-            "audit_id": "audit_server_v1",
-            "generated_at": datetime.utcnow().isoformat() + "Z",
-            "scope": "server_infrastructure"
-        },
-        "coverage": coverage,
-        "findings": {
-            "critical": critical,
-            "warning": warning,
-            "ok": ok
+def build_raw(profile, result, host=None, generated_at=None):
+    """
+    Objet RAW d'un hôte pour un profil, à partir du résultat en mémoire du moteur
+    ({filtered, coverage, findings, levels}).
+    """
+    findings = normalize_findings(result)
+    meta = profile["grid"].get("meta", {}) or {}
+    generated_at = generated_at or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    ai_prompt = dict(AI_PROMPT)
+    ai_prompt["objective"] = f"Transformer un audit brut « {profile['name']} » en rapport client professionnel"
+
+    if findings["critical"]:
+        priority, orientation = "high", "Sécurisation immédiate requise"
+    elif findings["warning"]:
+        priority, orientation = "medium", "Optimisations recommandées"
+    else:
+        priority, orientation = "low", "Maintien en condition opérationnelle"
+
+    raw_meta = {
+        "raw_version": RAW_VERSION,
+        "audit_id": profile["slug"],
+        "generated_at": generated_at,
+        "scope": meta.get("scope", "server_infrastructure"),
+    }
+    if host is not None:
+        raw_meta["host"] = host
+
+    return {
+        "ai_prompt": ai_prompt,
+        "analysis": {
+            "meta": raw_meta,
+            "coverage": result["coverage"],
+            "findings": findings,
+            "metrics": build_metrics(result["filtered"]),
+            "recommendation_summary": {
+                "priority": priority,
+                "orientation": orientation,
+                "actions": list(profile["recommendations"]),
+            },
         },
-        "metrics": metrics,
-        "recommendation_summary": {
-            "priority": "high" if critical else "medium",
-            "orientation": "Sécurisation immédiate requise" if critical else "Optimisations recommandées"
-        }
     }
-}
 
-OUT_FILE.write_text(json.dumps(raw, indent=2, ensure_ascii=False))
-print(f"[OK] RAW audit généré : {OUT_FILE}")
+# ---------------------------
+# CLI
+# ---------------------------
+def main():
+    import argparse
+    import sys
+    from pathlib import Path
+
+    from apply_audit_profile import discover_facts_files, evaluate_profile, host_name, load_json, load_profile
+
+    ap = argparse.ArgumentParser(description="Génération des audits RAW (AI-ready)")
+    ap.add_argument("--facts", default="facts/facts_all.json", help="Chemin vers facts_all.json")
+    ap.add_argument("--profile", required=True, action="append", help="Chemin vers grids/audit_*.yaml (répétable)")
+    ap.add_argument("--outdir", default="reports", help="Dossier reports (mode fichier)")
+    ap.add_argument("--fleet", help="Lot: dossier ou motif glob de facts_all.json")
+    ap.add_argument("--ndjson", help="Sortie NDJSON (fichier ou '-'): un RAW par hôte et par profil")
+    args = ap.parse_args()
+
+    profiles = [load_profile(Path(p)) for p in args.profile]
+
+    if args.fleet:
+        sources = [(host_name(p), p) for p in discover_facts_files(args.fleet)]
+        if not sources:
+            print(f"[ERREUR] Aucun fichier facts trouvé pour: {args.fleet}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        sources = [(None, Path(args.facts))]
+
+    if args.ndjson:
+        out = sys.stdout if args.ndjson == "-" else open(args.ndjson, "w", encoding="utf-8")
+        try:
+            for host, path in sources:
+                facts = load_json(path)
+                for profile in profiles:
+                    raw = build_raw(profile, evaluate_profile(facts, profile), host or host_name(path))
+                    out.write(json.dumps(raw, ensure_ascii=False) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"[OK] RAW NDJSON: {len(sources)} hôtes x {len(profiles)} profils", file=sys.stderr)
+        return
+
+    for host, path in sources:
+        facts = load_json(path)
+        base = Path(args.outdir) / host if host else Path(args.outdir)
+        for profile in profiles:
+            raw = build_raw(profile, evaluate_profile(facts, profile), host)
+            out_file = write_raw(base / profile["slug"], profile, raw)
+            print(f"[OK] RAW audit généré : {out_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache des grilles précompilées (démarrage à froid du moteur).
+
+Une grille de profil et la grille de règles qu'elle référence sont lues une
+seule fois en YAML puis enregistrées (marshal) dans `grids/.cache/` :
+structure parsée, chemins requis/optionnels déjà découpés en tuples de clés,
+spécification de la grille de règles et empreintes des sources. Les exécutions
+suivantes chargent cet artefact sans importer yaml ; seule la compilation des
+contrôles (fermetures Python, non sérialisables) est refaite, en mémoire.
+
+Clé = sha256(version moteur, version d'artefact, contenu de la grille de
+profil). L'artefact mémorise en plus l'empreinte de chaque grille dont il
+dépend : une grille de règles modifiée le rend obsolète, il est alors
+reconstruit automatiquement.
+"""
+
+import hashlib
+import marshal
+import os
+from pathlib import Path
+
+ARTIFACT_VERSION = 1
+CACHE_DIRNAME = ".cache"
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def cache_dir(profile_path: Path) -> Path:
+    return profile_path.parent / CACHE_DIRNAME
+
+def artifact_path(profile_path: Path, profile_text: str, engine_version: str) -> Path:
+    key = sha256_text(f"{engine_version}\0{ARTIFACT_VERSION}\0{profile_text}")[:32]
+    return cache_dir(profile_path) / f"{profile_path.stem}.{key}.grid"
+
+def _sources_current(sources):
+    for path, digest in sources:
+        try:
+            text = Path(path).read_text(encoding="utf-8")
+        except OSError:
+            return False
+        if sha256_text(text) != digest:
+            return False
+    return True
+
+def load(profile_path: Path, profile_text: str, engine_version: str):
+    """Artefact à jour pour ce contenu de grille, ou None (absent, illisible, obsolète)."""
+    path = artifact_path(profile_path, profile_text, engine_version)
+    try:
+        data = marshal.loads(path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != ARTIFACT_VERSION:
+        return None
+    if not _sources_current(data.get("sources", ())):
+        return None
+    return data
+
+def store(profile_path: Path, profile_text: str, engine_version: str, data):
+    """
+    Enregistre l'artefact (écriture atomique). Best effort: un dossier de grilles
+    en lecture seule ou une grille non sérialisable désactive simplement le cache.
+    """
+    path = artifact_path(profile_path, profile_text, engine_version)
+    data = dict(data, version=ARTIFACT_VERSION)
+    try:
+        payload = marshal.dumps(data)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        return None
+    # Artefacts des versions précédentes de cette grille
+    for old in path.parent.glob(f"{profile_path.stem}.*.grid"):
+        if old != path:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    return path
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Réévaluation incrémentale des règles et du `decision_engine` de la grille.
+
+Un graphe de dépendances est tiré de la grille compilée (rule_engine) :
+  chemin de fact  -> contrôles qui le lisent (fact évalué, enabled_if, messages,
+                     sources des facts dérivés) ;
+  contrôle        -> décisions qui lisent son niveau ;
+  context.<champ> -> décisions qui lisent ce paramètre d'audit ;
+  décision        -> décisions qui lisent sa valeur.
+
+L'état évalué de chaque hôte (valeurs des chemins lus, niveau et règle de
+chaque contrôle, valeur de chaque décision) est conservé dans un dossier
+d'état : <état>/<hôte>.json. Pour un nouveau relevé, seuls les contrôles qui
+lisent un chemin modifié sont réévalués, puis seules les décisions dont une
+entrée a effectivement changé, dans l'ordre topologique. Un relevé peut aussi
+ne porter que les chemins modifiés ({"changes": {chemin: valeur}}).
+
+Usage:
+    python3 engine/incremental_eval.py --state facts/.state/eval --facts facts/facts_all.json --context audit_context.yaml
+    python3 engine/incremental_eval.py --state /var/lib/audit/eval --fleet facts/ --out changes.ndjson
+    producteur | python3 engine/incremental_eval.py --state /var/lib/audit/eval --stream -
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from apply_audit_profile import ENGINE_VERSION, discover_facts_files, host_name, load_json, load_rule_grid
+from rule_engine import Findings, LEVELS, evaluate_check, evaluate_decision, make_getter
+
+STATE_VERSION = 1
+CONTEXT_PREFIX = "context."
+CONTEXT_FILE = "audit_context.yaml"
+DEFAULT_GRID = Path(__file__).resolve().parents[1] / "grids" / "audit_grid_v1.yaml"
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def context_values(doc):
+    """
+    {paramètre: valeur} d'un audit_context : les sections (site, audit, ...) sont
+    aplaties sur le nom de leur feuille ("audit.downtime_tolerance" -> "downtime_tolerance").
+    """
+    out = {}
+    for k, v in (doc or {}).items():
+        if isinstance(v, dict):
+            out.update(context_values(v))
+        else:
+            out[k] = v
+    return out
+
+def load_context(path: Path):
+    import yaml  # lecture d'audit_context.yaml uniquement
+    return context_values(yaml.safe_load(path.read_text(encoding="utf-8")))
+
+def unflatten(values):
+    """Document facts minimal reconstruit depuis {chemin.pointé: valeur}."""
+    doc = {}
+    for path, v in values.items():
+        if path.startswith(CONTEXT_PREFIX):
+            continue
+        keys = path.split(".")
+        cur = doc
+        for k in keys[:-1]:
+            cur = cur.setdefault(k, {})
+        cur[keys[-1]] = v
+    return doc
+
+# -----------------------------
+# Dependency graph
+# -----------------------------
+class DependencyGraph:
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.checks = compiled["checks"]
+        self.decisions = compiled["decisions"]
+
+        by_path = {}
+        for check in self.checks:
+            for name in check["reads"]:
+                for path in compiled["fact_sources"][name]:
+                    by_path.setdefault(path, set()).add(check["index"])
+
+        # ("check", id) / ("context", champ) / ("decision", nom) -> décisions lectrices (index topologique)
+        self.readers = {}
+        for i, decision in enumerate(self.decisions):
+            for ref in decision["reads"]:
+                self.readers.setdefault(ref, []).append(i)
+                if ref[0] == "context":
+                    by_path.setdefault(CONTEXT_PREFIX + ref[1], set())
+
+        self.checks_by_path = {p: tuple(sorted(ix)) for p, ix in sorted(by_path.items())}
+        self.getters = {p: make_getter(p) for p in self.checks_by_path if not p.startswith(CONTEXT_PREFIX)}
+
+    def read(self, facts, context=None):
+        """
+        {chemin: valeur} des chemins du graphe. `facts` None: chemins de facts
+        omis ; `context` None: chemins context.* omis (inchangés).
+        """
+        values = {p: get(facts) for p, get in self.getters.items()} if facts is not None else {}
+        if context is not None:
+            for p in self.checks_by_path:
+                if p.startswith(CONTEXT_PREFIX):
+                    values[p] = context.get(p[len(CONTEXT_PREFIX):])
+        return values
+
+    def describe(self):
+        return {
+            "paths": {p: [self.checks[i]["id"] for i in ix] for p, ix in self.checks_by_path.items()},
+            "checks": {kind_ref[1]: [self.decisions[i]["name"] for i in ix]
+                       for kind_ref, ix in self.readers.items() if kind_ref[0] == "check"},
+            "decisions": [{"name": d["name"], "reads": [".".join(r) for r in d["reads"]]} for d in self.decisions],
+        }
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+class IncrementalEvaluator:
+    def __init__(self, compiled):
+        self.graph = DependencyGraph(compiled)
+        self.compiled = compiled
+        self.grid_hash = compiled.get("source_hash")
+        self.recommendations = (compiled.get("spec") or {}).get("allowed_recommendations") or {}
+        self.stats = {"baseline": 0, "changed": 0, "unchanged": 0,
+                      "checks": 0, "checks_total": 0, "decisions": 0}
+
+    def baseline(self):
+        return {"v": STATE_VERSION, "grid": self.grid_hash, "engine_version": ENGINE_VERSION,
+                "values": {}, "levels": {}, "rules": {}, "decisions": {}}
+
+    def is_current(self, state):
+        """État évalué avec cette grille et cette version du moteur."""
+        return (state is not None and state.get("v") == STATE_VERSION and state.get("grid") == self.grid_hash
+                and state.get("engine_version") == ENGINE_VERSION)
+
+    def update(self, state, facts=None, context=None, changes=None):
+        """
+        Met à jour l'état d'un hôte (modifié en place, ou créé) et retourne
+        (état, changements).
+        - facts: document complet, comparé aux valeurs de l'état ;
+        - context: {paramètre: valeur} ; None = inchangé ;
+        - changes: {chemin: valeur} des seuls chemins modifiés.
+        """
+        fresh = not self.is_current(state)
+        if fresh:
+            state = self.baseline()
+        values = state["values"]
+
+        incoming = self.graph.read(facts, context)
+        for path, v in (changes or {}).items():
+            if path in self.graph.checks_by_path:
+                incoming[path] = v
+        if fresh:
+            incoming = {**dict.fromkeys(self.graph.checks_by_path), **incoming}
+            changed = list(incoming)
+        else:
+            changed = [p for p, v in incoming.items() if p not in values or values[p] != v]
+        values.update(incoming)
+
+        result = self._propagate(state, changed, fresh)
+        result["baseline"] = fresh
+        self.stats["baseline" if fresh else "changed" if changed else "unchanged"] += 1
+        return state, result
+
+    def _propagate(self, state, changed, fresh):
+        checks = self.graph.checks
+        values, levels, rules, decided = state["values"], state["levels"], state["rules"], state["decisions"]
+
+        # 1) Contrôles lisant un chemin modifié
+        indices = sorted({i for p in changed for i in self.graph.checks_by_path[p]})
+        changed_refs = {("context", p[len(CONTEXT_PREFIX):]) for p in changed if p.startswith(CONTEXT_PREFIX)}
+        check_changes = []
+        if indices:
+            doc = unflatten(values)
+            fact_getters = self.compiled["facts"]
+            for i in indices:
+                check = checks[i]
+                cid = check["id"]
+                level, rule, params = evaluate_check(check, fact_getters, doc)
+                before = levels.get(cid)
+                levels[cid] = level
+                rules[cid] = [rule, list(params)]
+                if fresh or before != level:
+                    changed_refs.add(("check", cid))
+                    check_changes.append(self._check_change(check, before, level, rule, params))
+
+        # 2) Décisions dont une entrée a changé (ordre topologique: lectrices après)
+        decisions = self.graph.decisions
+        dirty = set(range(len(decisions))) if fresh else {
+            j for ref in changed_refs for j in self.graph.readers.get(ref, ())}
+        decision_changes = []
+        if dirty:
+            context = {p[len(CONTEXT_PREFIX):]: v for p, v in values.items() if p.startswith(CONTEXT_PREFIX)}
+            for j, decision in enumerate(decisions):
+                if j not in dirty:
+                    continue
+                name = decision["name"]
+                before = decided.get(name)
+                value = evaluate_decision(decision, levels, context, decided)
+                decided[name] = value
+                if fresh or before != value:
+                    dirty.update(self.graph.readers.get(("decision", name), ()))
+                    decision_changes.append(self._decision_change(name, before, value))
+
+        self.stats["checks"] += len(indices)
+        self.stats["checks_total"] += len(checks)
+        self.stats["decisions"] += len(dirty)
+        return {
+            "paths": sorted(changed),
+            "checks": check_changes,
+            "decisions": decision_changes,
+            "recomputed": {"checks": len(indices), "decisions": len(dirty)},
+        }
+
+    def _check_change(self, check, before, level, rule, params):
+        code, message = check["code"], None
+        if level in LEVELS:
+            findings = Findings(self.compiled)
+            findings.append(check, level, rule, params)
+            code, message = findings.codes()[0], findings.message(0)
+        return {"code": code, "check": check["id"], "from": before, "to": level, "message": message}
+
+    def _decision_change(self, name, before, value):
+        change = {"decision": name, "from": before, "to": value}
+        if isinstance(value, str) and value in self.recommendations:
+            change["recommendation"] = self.recommendations[value].get("text", "").strip()
+        return change
+
+    def summary(self):
+        s = self.stats
+        hosts = s["baseline"] + s["changed"] + s["unchanged"]
+        share = 100.0 * s["checks"] / s["checks_total"] if s["checks_total"] else 0.0
+        return (f"[OK] Incrémental: {hosts} relevés ({s['changed']} modifiés, {s['baseline']} nouveaux, "
+                f"{s['unchanged']} inchangés), {s['checks']} contrôles réévalués ({share:.1f}%), "
+                f"{s['decisions']} décisions")
+
+# -----------------------------
+# State store
+# -----------------------------
+def _safe(name):
+    return name.replace("/", "_").lstrip(".") or "_"
+
+def file_stamp(*paths):
+    """[(chemin, mtime_ns, taille)] des sources d'un hôte ; None pour un fichier absent."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            out.append([str(path), None])
+            continue
+        out.append([str(path), st.st_mtime_ns, st.st_size])
+    return out
+
+class StateStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, host):
+        return self.root / f"{_safe(host or '_local')}.json"
+
+    def load(self, host):
+        try:
+            return json.loads(self._entry(host).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, host, state):
+        entry = self._entry(host)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, entry)
+
+# -----------------------------
+# Sources
+# -----------------------------
+def iter_ndjson(stream):
+    """{"host": ..., "facts": {...}?, "context": {...}?, "changes": {chemin: valeur}?} par ligne."""
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            print(f"[ERREUR] ligne {lineno}: JSON invalide ({e})", file=sys.stderr)
+            continue
+        if not isinstance(rec, dict) or not rec.get("host"):
+            print(f"[ERREUR] ligne {lineno}: objet JSON avec 'host' attendu", file=sys.stderr)
+            continue
+        ctx = rec.get("context")
+        yield str(rec["host"]), rec.get("facts"), context_values(ctx) if isinstance(ctx, dict) else None, rec.get("changes")
+
+def run(args):
+    compiled = load_rule_grid(Path(args.grid))
+    evaluator = IncrementalEvaluator(compiled)
+    if args.graph:
+        print(json.dumps(evaluator.graph.describe(), indent=2, ensure_ascii=False))
+        return 0
+
+    store = StateStore(Path(args.state))
+    shared_context = load_context(Path(args.context)) if args.context else None
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    emitted = 0
+
+    def emit(host, result):
+        nonlocal emitted
+        if result["baseline"] or result["checks"] or result["decisions"]:
+            out.write(json.dumps({"host": host, **result}, ensure_ascii=False) + "\n")
+            emitted += 1
+
+    def process(host, state, facts=None, context=None, changes=None, stamp=None):
+        state, result = evaluator.update(state, facts, context, changes)
+        if stamp is not None:
+            state["stamp"] = stamp
+        store.save(host, state)
+        emit(host, result)
+
+    try:
+        if args.stream:
+            src = sys.stdin if args.stream == "-" else open(args.stream, encoding="utf-8")
+            try:
+                for host, facts, context, changes in iter_ndjson(src):
+                    process(host, store.load(host), facts, context if context is not None else shared_context, changes)
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+        elif args.fleet:
+            files = discover_facts_files(args.fleet)
+            if not files:
+                print(f"[ERREUR] Aucun fichier facts trouvé pour: {args.fleet}", file=sys.stderr)
+                return 1
+            for path in files:
+                host = host_name(path)
+                # audit_context.yaml à côté de facts_all.json (un dossier par hôte), sinon --context
+                ctx_path = path.parent / CONTEXT_FILE
+                if path.name != "facts_all.json" or not ctx_path.exists():
+                    ctx_path = Path(args.context) if args.context else None
+                stamp = file_stamp(path, ctx_path) if ctx_path else file_stamp(path)
+                state = store.load(host)
+                if evaluator.is_current(state) and state.get("stamp") == stamp:
+                    # Sources, grille et moteur inchangés depuis le dernier passage: rien à relire
+                    evaluator.stats["unchanged"] += 1
+                    continue
+                context = load_context(ctx_path) if ctx_path else None
+                process(host, state, load_json(path), context, stamp=stamp)
+        else:
+            process(args.host, store.load(args.host), load_json(Path(args.facts)), shared_context)
+    except BrokenPipeError:
+        sys.stderr.close()
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(evaluator.summary(), file=sys.stderr)
+    print(f"[OK] Changements émis: {emitted}", file=sys.stderr)
+    return 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Réévaluation incrémentale des règles et décisions de la grille")
+    ap.add_argument("--grid", default=str(DEFAULT_GRID), help="Grille de règles (domains + decision_engine)")
+    ap.add_argument("--state", help="Dossier d'état évalué par hôte (<hôte>.json)")
+    ap.add_argument("--facts", default="facts/facts_all.json", help="Mode hôte unique: chemin vers facts_all.json")
+    ap.add_argument("--host", default="_local", help="Mode hôte unique: nom de l'hôte dans l'état")
+    ap.add_argument("--context", help="audit_context.yaml (paramètres context.*) commun aux hôtes sans contexte propre")
+    ap.add_argument("--fleet", help="Mode flotte: dossier ou motif glob de facts_all.json (audit_context.yaml voisin lu s'il existe)")
+    ap.add_argument("--stream", help="Mode flux: NDJSON {host, facts?, context?, changes?} depuis un fichier ou '-'")
+    ap.add_argument("--out", default="-", help="Changements NDJSON (fichier ou '-' pour stdout)")
+    ap.add_argument("--graph", action="store_true", help="Affiche le graphe de dépendances de la grille et quitte")
+    args = ap.parse_args()
+    if not args.graph and not args.state:
+        ap.error("--state requis")
+    code = run(args)
+    if code:
+        sys.exit(code)
+
+if __name__ == "__main__":
+    main()
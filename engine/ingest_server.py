@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service d'ingestion: les agents poussent leur facts_all.json, l'audit suit
+immédiatement (plus d'attente du batch nocturne).
+
+Serveur HTTP/1.1 asyncio minimal (stdlib, keep-alive) :
+
+    POST /facts            document facts (JSON), hôte via ?host=, X-Audit-Host
+                           ou {"host": ..., "facts": {...}} ; Content-Encoding: gzip accepté
+                           Content-Type: application/x-ndjson -> lot {"host", "facts"} par ligne
+    GET  /status           profondeur de file, en cours, compteurs, latences p50/p95
+    GET  /hosts            dernier résultat résumé par hôte
+    GET  /hosts/<hôte>     dernier résultat complet (coverage, findings, niveaux par profil)
+    GET  /findings         nombre d'hôtes par code de constat et par niveau
+    GET  /findings/<CODE>  hôtes concernés par un code de règle (ex. WEB_SECURITY_SSL_EXPIRY_WARNING)
+
+Les documents acceptés entrent dans une file bornée ; quand elle est pleine,
+le serveur répond 503 + Retry-After (contre-pression : l'agent réessaie plus
+tard). Un lot plus grand que la capacité de la file ne passera jamais : 413,
+à découper côté agent. Décompression et décodage JSON des corps reçus
+tournent dans un thread (run_in_executor) : un gros lot ne bloque pas les
+autres connexions ; seule la mise en file reste sur la boucle. Un pool de
+processus évalue les profils (mêmes fonctions que apply_audit_profile.py) et
+écrit les rapports dans <outdir>/<hôte>/.
+
+Les derniers constats de chaque hôte sont gardés en colonnes (rule_engine.Findings :
+index de contrôle et de niveau, paramètres) : l'agrégation par code porte sur
+des entiers, les messages ne sont rendus qu'à la lecture d'un hôte.
+
+    python3 engine/ingest_server.py --profile grids/audit_server_v1.yaml --port 8080
+    curl --data-binary @facts/facts_all.json "http://127.0.0.1:8080/facts?host=web01"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import sys
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from apply_audit_profile import evaluate_profile, load_profile, percentile, write_report
+from rule_engine import LEVELS, Findings
+
+HOST_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]{0,252}$")
+MAX_HEADERS = 100
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           503: "Service Unavailable"}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# -----------------------------
+# Workers (processus)
+# -----------------------------
+_PROFILES = []
+_OUTDIR = None
+_RAW = False
+
+def _worker_init(profile_paths, outdir, raw):
+    # Avec fork, les grilles chargées par le parent sont héritées telles quelles
+    global _PROFILES, _OUTDIR, _RAW
+    if not _PROFILES:
+        _PROFILES = [load_profile(Path(p)) for p in profile_paths]
+    _OUTDIR = Path(outdir) if outdir else None
+    _RAW = raw
+
+def _audit(host, facts):
+    """
+    Évalue tous les profils pour un hôte ; rapports écrits si un dossier de sortie
+    est défini. Constats renvoyés en colonnes (Findings.to_state), sans messages.
+    """
+    out = {}
+    for profile in _PROFILES:
+        result = evaluate_profile(facts, profile)
+        if _OUTDIR is not None:
+            write_report(_OUTDIR / host / profile["slug"], profile, result, _RAW, host)
+        out[profile["slug"]] = {
+            "coverage": result["coverage"],
+            "findings": result["findings"].to_state(),
+            "levels": result["levels"],
+        }
+    return out
+
+def _restore(profiles):
+    # Côté service: colonnes rattachées aux grilles chargées (mêmes index que les workers)
+    grids = {p["slug"]: p["rule_grid"] for p in _PROFILES}
+    for slug, p in profiles.items():
+        p["findings"] = Findings.from_state(grids[slug], p["findings"])
+    return profiles
+
+def _render_profiles(profiles):
+    out = {}
+    for slug, p in (profiles or {}).items():
+        f = p["findings"]
+        out[slug] = dict(p, findings=[{"code": code, "level": lvl, "message": msg}
+                                      for code, (lvl, msg) in zip(f.codes(), f)])
+    return out
+
+# -----------------------------
+# Service
+# -----------------------------
+class IngestService:
+    def __init__(self, profile_paths, outdir=None, workers=1, queue_size=1000, max_body=16 << 20, raw=False):
+        self.profile_paths = list(profile_paths)
+        self.outdir = outdir
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.max_body = max_body
+        self.raw = raw
+        self.latest = {}
+        self.latencies = deque(maxlen=1000)
+        self.in_flight = 0
+        self.stats = {"received": 0, "audited": 0, "errors": 0, "rejected_full": 0, "rejected_oversized": 0, "invalid": 0}
+        self.started = time.time()
+        self.pool = None
+        self.tasks = []
+
+    async def start(self):
+        _worker_init(self.profile_paths, self.outdir, self.raw)  # grilles invalides: échec immédiat
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init,
+                                        initargs=(self.profile_paths, self.outdir, self.raw))
+        self.tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    # -- file / workers ---------------------------------------------------------
+    def enqueue(self, docs):
+        """
+        Tout le lot ou rien: une file trop pleine pour le lot renvoie False (503
+        côté HTTP). Un lot plus grand que la file est refusé en amont (413).
+        """
+        if self.queue.maxsize and self.queue.maxsize - self.queue.qsize() < len(docs):
+            self.stats["rejected_full"] += len(docs)
+            return False
+        received = time.monotonic()
+        for host, facts in docs:
+            self.queue.put_nowait((host, facts, received))
+        self.stats["received"] += len(docs)
+        return True
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            host, facts, received = await self.queue.get()
+            self.in_flight += 1
+            try:
+                profiles = _restore(await loop.run_in_executor(self.pool, _audit, host, facts))
+                error = None
+                self.stats["audited"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                profiles, error = None, f"{type(e).__name__}: {e}"
+                self.stats["errors"] += 1
+                print(f"[ERREUR] {host}: {error}", file=sys.stderr)
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+            latency = (time.monotonic() - received) * 1000
+            self.latencies.append(latency)
+            record = {
+                "host": host,
+                "audited_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "latency_ms": round(latency, 1),
+                "error": error,
+            }
+            if profiles is None and host in self.latest:
+                profiles = self.latest[host].get("profiles")  # dernier résultat valide conservé
+            record["profiles"] = profiles
+            self.latest[host] = record
+
+    # -- vues ---------------------------------------------------------------------
+    def status(self):
+        lat = sorted(self.latencies)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_max": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "hosts": len(self.latest),
+            "uptime_s": round(time.time() - self.started, 1),
+            "latency_ms": {"p50": percentile(lat, 50, 1), "p95": percentile(lat, 95, 1)},
+            **self.stats,
+        }
+
+    def hosts_summary(self):
+        out = {}
+        for host, rec in sorted(self.latest.items()):
+            levels = {}
+            for p in (rec["profiles"] or {}).values():
+                for lvl in p["levels"].values():
+                    levels[lvl] = levels.get(lvl, 0) + 1
+            out[host] = {"audited_at": rec["audited_at"], "latency_ms": rec["latency_ms"],
+                         "error": rec["error"], "levels": levels}
+        return out
+
+    def findings_summary(self):
+        """{code: {niveau: nombre d'hôtes}} ; un hôte compte une fois par code et niveau."""
+        counts = Counter()
+        grids = {}
+        for rec in self.latest.values():
+            seen = set()
+            for p in (rec["profiles"] or {}).values():
+                f = p["findings"]
+                if not len(f):
+                    continue
+                grids[id(f.grid)] = f.grid
+                seen.update((id(f.grid), c, r, lvl) for c, r, lvl in zip(f.check, f.rule, f.level))
+            counts.update(seen)
+        out = {}
+        for (g, check, rule, level), n in counts.items():
+            out.setdefault(grids[g]["checks"][check]["codes"][rule], {})[LEVELS[level]] = n
+        return dict(sorted(out.items()))
+
+    def hosts_with(self, code):
+        """{hôte: niveau le plus sévère} des hôtes qui ont le constat `code`."""
+        out = {}
+        for host, rec in sorted(self.latest.items()):
+            worst = None
+            for p in (rec["profiles"] or {}).values():
+                f = p["findings"]
+                idx = f.grid["code_index"].get(code) if f.grid else None
+                if idx is None:
+                    continue
+                for c, r, lvl in zip(f.check, f.rule, f.level):
+                    if (c, r) == idx and (worst is None or lvl < worst):
+                        worst = lvl
+            if worst is not None:
+                out[host] = LEVELS[worst]
+        return out
+
+    # -- décodage -----------------------------------------------------------------
+    def _decompress(self, body):
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = d.decompress(body, self.max_body)
+        except zlib.error as e:
+            raise HttpError(400, f"gzip invalide: {e}")
+        if d.unconsumed_tail:
+            raise HttpError(413, "corps décompressé trop volumineux")
+        return data
+
+    def parse_documents(self, headers, query, body):
+        """Corps -> ([(hôte, facts)], lignes invalides) ; exécuté hors de la boucle asyncio."""
+        if headers.get("content-encoding", "").lower() == "gzip":
+            body = self._decompress(body)
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HttpError(400, "corps non UTF-8")
+
+        if "ndjson" in headers.get("content-type", "") or query.get("format") == "ndjson":
+            docs, invalid = [], 0
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    invalid += 1
+                    continue
+                if isinstance(rec, dict) and isinstance(rec.get("facts"), dict) and HOST_RE.match(str(rec.get("host", ""))):
+                    docs.append((str(rec["host"]), rec["facts"]))
+                else:
+                    invalid += 1
+            return docs, invalid
+
+        try:
+            rec = json.loads(text)
+        except ValueError as e:
+            raise HttpError(400, f"JSON invalide: {e}")
+        if not isinstance(rec, dict):
+            raise HttpError(400, "objet JSON attendu")
+        host = query.get("host") or headers.get("x-audit-host")
+        if isinstance(rec.get("facts"), dict):
+            host = host or rec.get("host")
+            rec = rec["facts"]
+        if not host or not HOST_RE.match(str(host)):
+            raise HttpError(400, "hôte absent ou invalide (?host=, X-Audit-Host ou {\"host\", \"facts\"})")
+        return [(str(host), rec)], 0
+
+    # -- HTTP -----------------------------------------------------------------
+    async def route(self, method, target, headers, body):
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        if path == "/facts":
+            if method != "POST":
+                raise HttpError(405, "POST attendu")
+            # Jusqu'à max_body octets à décompresser et décoder: hors de la boucle
+            loop = asyncio.get_running_loop()
+            docs, invalid = await loop.run_in_executor(None, self.parse_documents, headers, query, body)
+            self.stats["invalid"] += invalid
+            if not docs:
+                raise HttpError(400, "aucun document facts valide")
+            if self.queue.maxsize and len(docs) > self.queue.maxsize:
+                # Refus définitif: réessayer le même lot ne servirait à rien
+                self.stats["rejected_oversized"] += len(docs)
+                return 413, {"error": "lot plus grand que la file d'audit, à découper",
+                             "documents": len(docs), "queue_max": self.queue.maxsize}, {}
+            if not self.enqueue(docs):
+                return 503, {"error": "file d'audit pleine", "queue_depth": self.queue.qsize()}, {"Retry-After": "1"}
+            return 202, {"accepted": len(docs), "invalid": invalid, "queue_depth": self.queue.qsize()}, {}
+
+        if method != "GET":
+            raise HttpError(405, "GET attendu")
+        if path == "/status":
+            return 200, self.status(), {}
+        if path == "/hosts":
+            return 200, self.hosts_summary(), {}
+        if path.startswith("/hosts/"):
+            rec = self.latest.get(path[len("/hosts/"):])
+            if rec is None:
+                raise HttpError(404, "hôte inconnu")
+            return 200, dict(rec, profiles=_render_profiles(rec["profiles"])), {}
+        if path == "/findings":
+            return 200, self.findings_summary(), {}
+        if path.startswith("/findings/"):
+            return 200, self.hosts_with(path[len("/findings/"):].upper()), {}
+        raise HttpError(404, "route inconnue")
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "ligne de requête invalide")
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(431, "trop d'en-têtes")
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "Content-Length requis")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(400, "Content-Length invalide")
+        if length > self.max_body:
+            raise HttpError(413, f"corps > {self.max_body} octets")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload, extra = await self.route(method, target, headers, body)
+                except HttpError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, {}
+                    # corps éventuellement non lu: la connexion ne peut pas être réutilisée
+                    keep_alive = keep_alive and e.status not in (400, 411, 413, 431)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                        "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head.extend(f"{k}: {v}" for k, v in extra.items())
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(args):
+    service = IngestService(args.profile, None if args.no_write else args.outdir, args.workers,
+                            args.queue_size, args.max_body, args.raw)
+    await service.start()
+    server = await asyncio.start_server(service.handle, args.host, args.port)
+    print(f"[OK] Ingestion sur http://{args.host}:{args.port} — {len(args.profile)} profils, "
+          f"{service.workers} workers, file {args.queue_size}", file=sys.stderr)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    async with server:
+        await stop.wait()
+    await service.stop()
+    s = service.status()
+    print(f"[OK] Arrêt: {s['audited']} audits, {s['errors']} erreurs, {s['rejected_full']} refus (file pleine), "
+          f"{s['rejected_oversized']} refus (lot trop grand)", file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser(description="Service d'ingestion des facts poussés par les agents")
+    ap.add_argument("--profile", required=True, action="append", help="Chemin vers grids/audit_*.yaml (répétable)")
+    ap.add_argument("--outdir", default="reports", help="Rapports écrits dans <outdir>/<hôte>/<profil>/")
+    ap.add_argument("--no-write", action="store_true", help="Résultats en mémoire uniquement (pas de rapports)")
+    ap.add_argument("--raw", action="store_true", help="Écrire aussi l'audit RAW (AI-ready)")
+    ap.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus d'évaluation")
+    ap.add_argument("--queue-size", type=int, default=1000, help="Documents en attente au-delà desquels répondre 503")
+    ap.add_argument("--max-body", type=int, default=16 << 20, help="Taille max d'un envoi (octets, après décompression)")
+    args = ap.parse_args()
+    asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
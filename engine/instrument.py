@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation optionnelle du moteur: temps et nombre d'appels par étape
+(chargement, coverage, règles, rendu, sérialisation, écritures) et par contrôle.
+
+Désactivée par défaut: `stage()` renvoie alors un contexte vide partagé et
+l'évaluation des règles emprunte le chemin non instrumenté (aucun
+chronométrage). Export en résumé JSON et en fichier textfile-collector
+Prometheus (node_exporter).
+"""
+
+import json
+import os
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+ENABLED = False
+
+# nom -> [appels, total ns, max ns]
+_STAGES = {}
+_RULES = {}
+_COUNTERS = {}
+_STARTED = time.time()
+
+_NOOP = nullcontext()
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+# -----------------------------
+# Recording
+# -----------------------------
+def _add(table, name, ns):
+    s = table.get(name)
+    if s is None:
+        table[name] = [1, ns, ns]
+    else:
+        s[0] += 1
+        s[1] += ns
+        if ns > s[2]:
+            s[2] = ns
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _add(_STAGES, self.name, time.perf_counter_ns() - self.t0)
+        return False
+
+def stage(name):
+    """`with stage("coverage"): ...` ; sans effet si l'instrumentation est désactivée."""
+    return _Stage(name) if ENABLED else _NOOP
+
+def record_rule(check_id, ns):
+    _add(_RULES, check_id, ns)
+
+def count(name, n=1):
+    if ENABLED:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+# -----------------------------
+# Aggregation (processus du mode flotte)
+# -----------------------------
+def drain():
+    """Retourne et remet à zéro les mesures (delta transmis au processus parent)."""
+    data = {"stages": dict(_STAGES), "rules": dict(_RULES), "counters": dict(_COUNTERS)}
+    _STAGES.clear()
+    _RULES.clear()
+    _COUNTERS.clear()
+    return data
+
+def merge(data):
+    for table, key in ((_STAGES, "stages"), (_RULES, "rules")):
+        for name, (calls, total, peak) in data[key].items():
+            s = table.get(name)
+            if s is None:
+                table[name] = [calls, total, peak]
+            else:
+                s[0] += calls
+                s[1] += total
+                s[2] = max(s[2], peak)
+    for name, n in data["counters"].items():
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+# -----------------------------
+# Export
+# -----------------------------
+def _table_summary(table):
+    out = {}
+    for name, (calls, total, peak) in sorted(table.items(), key=lambda kv: -kv[1][1]):
+        out[name] = {
+            "calls": calls,
+            "total_ms": round(total / 1e6, 3),
+            "mean_us": round(total / calls / 1e3, 2),
+            "max_us": round(peak / 1e3, 2),
+        }
+    return out
+
+def summary():
+    return {
+        "started_at": _STARTED,
+        "duration_s": round(time.time() - _STARTED, 3),
+        "counters": dict(_COUNTERS),
+        "stages": _table_summary(_STAGES),
+        "rules": _table_summary(_RULES),
+    }
+
+def _atomic_write(path, text):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)  # node_exporter ne doit jamais lire un fichier partiel
+
+def write_json(path):
+    _atomic_write(path, json.dumps(summary(), indent=2, ensure_ascii=False) + "\n")
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def prometheus_text(prefix="audit_engine"):
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            lbl = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{prefix}_{name}{{{lbl}}} {value}" if lbl else f"{prefix}_{name} {value}")
+
+    family("stage_duration_seconds_total", "counter", "Temps cumulé par étape du moteur",
+           [({"stage": n}, f"{s[1] / 1e9:.6f}") for n, s in sorted(_STAGES.items())])
+    family("stage_calls_total", "counter", "Nombre d'exécutions par étape",
+           [({"stage": n}, s[0]) for n, s in sorted(_STAGES.items())])
+    family("stage_max_seconds", "gauge", "Exécution la plus lente par étape",
+           [({"stage": n}, f"{s[2] / 1e9:.6f}") for n, s in sorted(_STAGES.items())])
+    family("rule_duration_seconds_total", "counter", "Temps cumulé par contrôle de règles",
+           [({"rule": n}, f"{s[1] / 1e9:.6f}") for n, s in sorted(_RULES.items())])
+    family("rule_calls_total", "counter", "Nombre d'évaluations par contrôle",
+           [({"rule": n}, s[0]) for n, s in sorted(_RULES.items())])
+    for name, n in sorted(_COUNTERS.items()):
+        family(f"{name}_total", "counter", f"Compteur {name}", [({}, n)])
+    family("run_duration_seconds", "gauge", "Durée du dernier run", [({}, f"{time.time() - _STARTED:.3f}")])
+    family("last_run_timestamp_seconds", "gauge", "Fin du dernier run (epoch)", [({}, f"{time.time():.0f}")])
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    _atomic_write(path, prometheus_text())
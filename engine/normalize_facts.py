@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation et normalisation des facts (schemas/facts_schema_v1.yaml).
+
+Le schéma est compilé une seule fois en une fonction Python générée (un test
+de type et de bornes en ligne par fact, convertisseur appelé seulement hors du
+cas courant) : un document est vérifié et converti en place en une seule
+passe, sans interprète de schéma générique. Une valeur
+invalide est signalée puis remplacée par `non_mesurable` ; les blocs et clés
+non déclarés ne sont pas touchés.
+
+    # avant le moteur: erreurs par hôte, documents corrigés réécrits (--fix)
+    python3 engine/normalize_facts.py --fleet facts/ --report facts_errors.json
+    python3 engine/normalize_facts.py --ndjson fleet.ndjson --out fleet.valid.ndjson
+"""
+
+import re
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "schemas" / "facts_schema_v1.yaml"
+
+_TRUE = {"true", "yes", "1", "on"}
+_FALSE = {"false", "no", "0", "off"}
+
+class Invalid(ValueError):
+    pass
+
+# -----------------------------
+# Converters (un par type, contraintes incluses)
+# -----------------------------
+def _to_int(v):
+    t = type(v)
+    if t is int:
+        return v
+    if t is float and v.is_integer():
+        return int(v)
+    if t is str:
+        s = v.strip()
+        try:
+            return int(s)
+        except ValueError:
+            try:
+                f = float(s)
+            except ValueError:
+                raise Invalid("entier attendu")
+            if f.is_integer():
+                return int(f)
+    raise Invalid("entier attendu")
+
+def _to_number(v):
+    t = type(v)
+    if t is int or t is float:
+        return v
+    if t is str:
+        s = v.strip()
+        try:
+            return int(s)
+        except ValueError:
+            try:
+                return float(s)
+            except ValueError:
+                pass
+    raise Invalid("nombre attendu")
+
+def _to_bool(v):
+    if type(v) is bool:
+        return v
+    s = str(v).strip().lower()
+    if s in _TRUE:
+        return True
+    if s in _FALSE:
+        return False
+    raise Invalid("booléen attendu")
+
+def _to_string(v):
+    t = type(v)
+    if t is str:
+        return v
+    if t is int or t is float:
+        return str(v)
+    raise Invalid("chaîne attendue")
+
+def _to_ports(v):
+    if type(v) is not list:
+        raise Invalid("liste de ports attendue")
+    out = []
+    for p in v:
+        s = str(p).strip() if type(p) in (str, int) else ""
+        if not s.isdigit() or not 0 < int(s) < 65536:
+            raise Invalid(f"port invalide {p!r}")
+        out.append(s)
+    return out
+
+def _exact(t, label):
+    def conv(v):
+        if type(v) is t:
+            return v
+        raise Invalid(f"{label} attendu")
+    return conv
+
+# type -> (convertisseur, types acceptés sans conversion)
+CONVERTERS = {
+    "int": (_to_int, (int,)),
+    "number": (_to_number, (int, float)),
+    "bool": (_to_bool, (bool,)),
+    "string": (_to_string, (str,)),
+    "ports": (_to_ports, ()),
+    "list": (_exact(list, "liste"), (list,)),
+    "object": (_exact(dict, "objet"), (dict,)),
+}
+
+def _union(names):
+    convs = [CONVERTERS[n][0] for n in names]
+    exact = tuple(t for n in names for t in CONVERTERS[n][1])
+
+    def conv(v):
+        if type(v) in exact:
+            return v
+        for c in convs:
+            try:
+                return c(v)
+            except Invalid:
+                pass
+        raise Invalid(f"type attendu: {' | '.join(names)}")
+    return conv, exact
+
+def _spec(spec):
+    return spec if isinstance(spec, dict) else {"type": spec}
+
+def compile_field(path, spec):
+    """Convertisseur complet d'un champ (types, conversions et contraintes)."""
+    spec = _spec(spec)
+    kind = spec.get("type")
+    names = kind if isinstance(kind, list) else [kind]
+    unknown = [n for n in names if n not in CONVERTERS]
+    if unknown:
+        raise ValueError(f"Fact '{path}': type inconnu {unknown}")
+    conv = _union(names)[0] if len(names) > 1 else CONVERTERS[names[0]][0]
+
+    lo, hi = spec.get("min"), spec.get("max")
+    enum = frozenset(spec["enum"]) if "enum" in spec else None
+    pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+    if lo is None and hi is None and enum is None and pattern is None:
+        return conv
+
+    def checked(v):
+        v = conv(v)
+        if lo is not None and v < lo:
+            raise Invalid(f"< {lo}")
+        if hi is not None and v > hi:
+            raise Invalid(f"> {hi}")
+        if enum is not None and v not in enum:
+            raise Invalid(f"valeur hors liste {sorted(enum)}")
+        if pattern is not None and not pattern.match(v):
+            raise Invalid(f"format attendu {pattern.pattern}")
+        return v
+    return checked
+
+def _ports_ok(v):
+    for p in v:
+        if type(p) is not str or not p.isdigit():
+            return False
+    return True
+
+def _fast_check(spec, i, env):
+    """
+    Expression Python vraie quand `v` est déjà valide et n'a pas besoin de
+    conversion (cas courant) ; None si le champ passe toujours par le convertisseur.
+    """
+    spec = _spec(spec)
+    kind = spec.get("type")
+    if isinstance(kind, list):
+        exact = tuple(t for n in kind for t in CONVERTERS[n][1])
+        return " or ".join(f"type(v) is {t.__name__}" for t in exact) or None
+    if "enum" in spec:
+        env[f"E{i}"] = frozenset(spec["enum"])
+        return f"(v == nm or v in E{i})"
+    if kind == "ports":
+        return "type(v) is list and _ports_ok(v)"
+    if kind == "string" and "pattern" in spec:
+        env[f"P{i}"] = re.compile(spec["pattern"]).match
+        return f"type(v) is str and (v == nm or P{i}(v) is not None)"
+    types = {"int": "type(v) is int", "number": "(type(v) is int or type(v) is float)",
+             "bool": "type(v) is bool", "string": "type(v) is str",
+             "list": "type(v) is list", "object": "type(v) is dict"}[kind]
+    bounds = []
+    if spec.get("min") is not None:
+        bounds.append(f"{spec['min']!r} <= v")
+    if spec.get("max") is not None:
+        bounds.append(f"v <= {spec['max']!r}")
+    return " and ".join([types] + bounds) if bounds else types
+
+def _fix(b, key, path, conv, v, nm, errors):
+    try:
+        b[key] = conv(v)
+    except Invalid as e:
+        errors.append((path, f"{e} ({v!r})"))
+        b[key] = nm
+
+# -----------------------------
+# Schema compilation
+# -----------------------------
+def load_schema(path: Path = SCHEMA_PATH):
+    import yaml
+    return yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+
+def compile_schema(schema):
+    """
+    Compile le schéma en une fonction validate(doc) -> [(chemin, erreur)].
+
+    Le code de la fonction est généré champ par champ (test de type/bornes en
+    ligne, convertisseur appelé seulement si la valeur n'est pas déjà valide) ;
+    le document est converti en place (valeurs invalides -> sentinelle).
+    """
+    nm = schema.get("nm", "non_mesurable")
+    env = {"nm": nm, "_M": object(), "_fix": _fix, "_ports_ok": _ports_ok}
+    lines = ["def validate(doc):",
+             "    if type(doc) is not dict:",
+             "        return [('', 'objet JSON attendu')]",
+             "    errors = []"]
+    i = 0
+    for block, fields in (schema.get("facts", {}) or {}).items():
+        lines += [f"    b = doc.get({block!r})",
+                  "    if b is not None:",
+                  "      if type(b) is not dict:",
+                  f"        errors.append(({block!r}, 'objet attendu'))",
+                  "      else:"]
+        for key, spec in fields.items():
+            path = f"{block}.{key}"
+            env[f"C{i}"] = compile_field(path, spec)
+            fast = _fast_check(spec, i, env)
+            fix = f"_fix(b, {key!r}, {path!r}, C{i}, v, nm, errors)"
+            lines.append(f"        v = b.get({key!r}, _M)")
+            if fast:
+                lines.append(f"        if {fast}: pass")
+                lines.append(f"        elif v is not _M and v is not None and v != nm: {fix}")
+            else:
+                lines.append(f"        if v is not _M and v is not None and v != nm: {fix}")
+            i += 1
+    lines.append("    return errors")
+    source = "\n".join(lines)
+    exec(compile(source, f"<{schema.get('name', 'facts_schema')}>", "exec"), env)
+    validate = env["validate"]
+    validate.nm = nm
+    validate.source = source
+    return validate
+
+# -----------------------------
+# CLI (lot)
+# -----------------------------
+def _iter_sources(args):
+    import json
+    import sys
+
+    if args.ndjson:
+        src = sys.stdin if args.ndjson == "-" else open(args.ndjson, encoding="utf-8")
+        try:
+            for lineno, line in enumerate(src, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError as e:
+                    yield f"#{lineno}", None, f"JSON invalide ({e})"
+                    continue
+                if isinstance(rec, dict) and isinstance(rec.get("facts"), dict):
+                    yield str(rec.get("host") or f"#{lineno}"), rec["facts"], None
+                else:
+                    yield f"#{lineno}", rec, None
+        finally:
+            if src is not sys.stdin:
+                src.close()
+        return
+
+    from apply_audit_profile import discover_facts_files, host_name
+    files = discover_facts_files(args.fleet) if args.fleet else [Path(args.facts)]
+    for path in files:
+        try:
+            doc = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            yield host_name(path), None, f"lecture impossible ({e})"
+            continue
+        yield host_name(path), doc, path
+
+def main():
+    import argparse
+    import json
+    import sys
+    import time
+
+    ap = argparse.ArgumentParser(description="Validation / normalisation des facts (schemas/facts_schema_v1.yaml)")
+    ap.add_argument("--facts", default="facts/facts_all.json", help="Un document facts_all.json")
+    ap.add_argument("--fleet", help="Lot: dossier ou motif glob de facts_all.json")
+    ap.add_argument("--ndjson", help="Lot: NDJSON {\"host\", \"facts\"} (fichier ou '-')")
+    ap.add_argument("--schema", default=str(SCHEMA_PATH), help="Schéma des facts")
+    ap.add_argument("--out", help="NDJSON des documents normalisés (fichier ou '-')")
+    ap.add_argument("--fix", action="store_true", help="Réécrit les fichiers invalides une fois normalisés (--facts/--fleet)")
+    ap.add_argument("--report", help="Rapport JSON des erreurs par hôte")
+    ap.add_argument("--quiet", action="store_true", help="Pas de détail par hôte sur stderr")
+    args = ap.parse_args()
+
+    validate = compile_schema(load_schema(Path(args.schema)))
+    out = None
+    if args.out:
+        out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+
+    report = {}
+    docs = 0
+    busy = 0.0
+    start = time.perf_counter()
+    try:
+        for host, doc, origin in _iter_sources(args):
+            docs += 1
+            if doc is None:
+                report[host] = [{"path": "", "error": origin}]
+                continue
+            t0 = time.perf_counter()
+            errors = validate(doc)
+            busy += time.perf_counter() - t0
+            if errors:
+                report[host] = [{"path": p, "error": e} for p, e in errors]
+                if args.fix and isinstance(origin, Path):
+                    origin.write_text(json.dumps(doc, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            if out is not None:
+                out.write(json.dumps({"host": host, "facts": doc}, ensure_ascii=False, separators=(",", ":")) + "\n")
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    total = time.perf_counter() - start
+
+    if not args.quiet:
+        for host, errors in report.items():
+            for e in errors:
+                print(f"[ERREUR] {host}: {e['path']} {e['error']}".rstrip(), file=sys.stderr)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    rate = f"{docs / busy:,.0f} docs/s validés" if busy else "-"
+    print(f"[OK] {docs} documents, {len(report)} invalides ({sum(len(e) for e in report.values())} erreurs) — "
+          f"{rate}, {total:.2f}s au total", file=sys.stderr)
+    if report:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Conversion d'export CSV Notion -> audit_context.yaml.
 
+Valeurs autorisées et champs requis: grids/audit_context_schema_v1.yaml
+(ensembles précalculés une fois). Deux modes:
+
+    # une ligne (première ligne du CSV) -> un fichier
+    python3 engine/notion_row_to_audit_context.py client_row.csv audit_context.yaml
+    # export complet, lu en flux: un audit_context.yaml par client, ou un NDJSON
+    python3 engine/notion_row_to_audit_context.py export.csv --outdir contexts/ --errors erreurs.json
+    python3 engine/notion_row_to_audit_context.py export.csv --ndjson contexts.ndjson
+
+En mode lot, une ligne invalide n'interrompt pas le run: ses erreurs sont
+regroupées dans le rapport (--errors, résumé sur stderr).
+"""
+
+import argparse
 import csv
+import json
+import re
 import sys
+from pathlib import Path
+
 import yaml
 
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "grids" / "audit_context_schema_v1.yaml"
+
 # ============================================================
 # Normalisation des clés (apostrophes, guillemets, espaces)
 # ============================================================
@@ -19,56 +41,70 @@ def normalize_key(s: str) -> str:
     )
 
 # ============================================================
-# Valeurs autorisées (ALIGNÉES AVEC LE SCHÉMA VALIDÉ)
+# Schéma (valeurs autorisées précalculées)
 # ============================================================
 
-ALLOWED_VALUES = {
-    "Type de site": ["vitrine", "ecommerce", "applicatif"],
-    "Technologie principale": ["WordPress", "Symfony", "Laravel", "Node.js", "Aucune"],
-    "Type d'hebergement": ["VPS", "Mutualise", "Cloud managé", "Dedie"],
-    "Mode d'audit": ["lecture seule", "complet"],
-    "Tolerance a l'indisponibilite": ["faible", "moyen", "eleve"],
-    "Statut audit": ["en attente", "en cours", "termine", "refuse"],
-}
-
-# Normalisation des clés du référentiel
-ALLOWED_VALUES = {
-    normalize_key(k): v for k, v in ALLOWED_VALUES.items()
-}
+def load_context_schema(schema_path: Path = SCHEMA_PATH):
+    """
+    Champs du schéma: [(propriété Notion normalisée, requis, valeurs autorisées)],
+    les valeurs autorisées étant un frozenset (None = libre).
+    """
+    schema = yaml.safe_load(schema_path.read_text(encoding="utf-8"))
+    fields = []
+    for name, spec in (schema.get("fields", {}) or {}).items():
+        prop = normalize_key(spec.get("notion_property") or spec.get("label") or name)
+        allowed = spec.get("allowed_values")
+        fields.append((prop, bool(spec.get("required", False)),
+                       frozenset(str(v) for v in allowed) if allowed else None))
+    return fields
 
 # ============================================================
 # Chargement CSV
 # ============================================================
 
+def _normalize_row(row: dict) -> dict:
+    return {normalize_key(k): (v or "").strip() for k, v in row.items() if k is not None}
+
 def load_client_row(csv_path: str) -> dict:
     try:
-        with open(csv_path, newline="", encoding="utf-8") as f:
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
             reader = csv.DictReader(f)
-            row = next(reader)
+            row = next(reader, None)
             if not row:
                 raise ValueError("CSV vide")
             # Normalisation des clés CSV
-            return {normalize_key(k): v.strip() for k, v in row.items()}
+            return _normalize_row(row)
     except FileNotFoundError:
         raise FileNotFoundError(f"Fichier CSV introuvable : {csv_path}")
 
+def iter_rows(csv_path: str):
+    """(numéro de ligne, ligne normalisée), lecture en flux ; BOM des exports Notion toléré."""
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, _normalize_row(row)
+
 # ============================================================
-# Validation stricte
+# Validation
 # ============================================================
 
-def check_allowed(field: str, value: str, allowed: list):
-    if value not in allowed:
-        raise ValueError(
-            f"Valeur interdite pour '{field}': '{value}' (autorisées: {allowed})"
-        )
-
-def validate_row(row: dict):
-    for field, allowed in ALLOWED_VALUES.items():
-        if field not in row:
-            raise KeyError(f"Champ manquant dans le CSV : '{field}'")
-        if not row[field]:
-            raise ValueError(f"Champ vide : '{field}'")
-        check_allowed(field, row[field], allowed)
+def row_errors(row: dict, fields) -> list:
+    errors = []
+    for field, required, allowed in fields:
+        value = row.get(field)
+        if value is None:
+            errors.append(f"Champ manquant dans le CSV : '{field}'")
+        elif not value:
+            if required:
+                errors.append(f"Champ vide : '{field}'")
+        elif allowed is not None and value not in allowed:
+            errors.append(f"Valeur interdite pour '{field}': '{value}' (autorisées: {sorted(allowed)})")
+    return errors
+
+def validate_row(row: dict, fields):
+    errors = row_errors(row, fields)
+    if errors:
+        raise ValueError("; ".join(errors))
 
 # ============================================================
 # Génération audit_context.yaml
@@ -91,26 +127,99 @@ def generate_context(row: dict) -> dict:
         },
     }
 
+def client_slug(name: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "-", name.strip()).strip("-.")
+    return slug or "client"
+
+# Émetteur C de libyaml si disponible (mode lot: des milliers de fichiers)
+_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+def dump_yaml(context, stream):
+    yaml.dump(context, stream, Dumper=_DUMPER, sort_keys=False, allow_unicode=True)
+
+# ============================================================
+# Mode lot
+# ============================================================
+
+def convert_bulk(csv_path, fields, outdir=None, ndjson=None, id_column=None):
+    """
+    Convertit toutes les lignes de l'export. Retourne (nombre converti, erreurs)
+    avec erreurs = [{"line", "client", "errors"}]. Le client est identifié par
+    `id_column` (défaut: première colonne, titre de la base Notion).
+    """
+    out = None
+    if ndjson:
+        out = sys.stdout if ndjson == "-" else open(ndjson, "w", encoding="utf-8")
+    seen = set()
+    converted = 0
+    errors = []
+    try:
+        for line, row in iter_rows(csv_path):
+            key = normalize_key(id_column) if id_column else next(iter(row), None)
+            client = row.get(key, "") if key else ""
+            problems = row_errors(row, fields)
+            if not client:
+                problems.insert(0, f"Identifiant client vide (colonne '{key}')")
+            elif client_slug(client) in seen:
+                problems.insert(0, f"Client en double : '{client}'")
+            if problems:
+                errors.append({"line": line, "client": client, "errors": problems})
+                continue
+            slug = client_slug(client)
+            seen.add(slug)
+            context = generate_context(row)
+            if out is not None:
+                out.write(json.dumps({"client": client, "slug": slug, "audit_context": context},
+                                     ensure_ascii=False) + "\n")
+            else:
+                target = Path(outdir) / slug
+                target.mkdir(parents=True, exist_ok=True)
+                with open(target / "audit_context.yaml", "w", encoding="utf-8") as f:
+                    dump_yaml(context, f)
+            converted += 1
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    return converted, errors
+
 # ============================================================
 # Main
 # ============================================================
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python notion_row_to_audit_context.py <client_row.csv> <output.yaml>")
+    ap = argparse.ArgumentParser(description="Export CSV Notion -> audit_context.yaml")
+    ap.add_argument("csv", help="Export CSV Notion (une ligne par client)")
+    ap.add_argument("output", nargs="?", help="Mode une ligne: fichier audit_context.yaml à écrire")
+    ap.add_argument("--outdir", help="Mode lot: un <client>/audit_context.yaml par ligne")
+    ap.add_argument("--ndjson", help="Mode lot: un objet JSON par client (fichier ou '-')")
+    ap.add_argument("--errors", help="Mode lot: rapport JSON des lignes rejetées")
+    ap.add_argument("--id-column", help="Colonne identifiant le client (défaut: première colonne)")
+    ap.add_argument("--schema", default=str(SCHEMA_PATH), help="Schéma audit_context")
+    args = ap.parse_args()
+
+    fields = load_context_schema(Path(args.schema))
+
+    if not (args.outdir or args.ndjson):
+        if not args.output:
+            ap.error("fichier de sortie, --outdir ou --ndjson requis")
+        row = load_client_row(args.csv)
+        validate_row(row, fields)
+        with open(args.output, "w", encoding="utf-8") as f:
+            dump_yaml(generate_context(row), f)
+        print(f"[OK] audit_context.yaml généré : {args.output}")
+        return
+
+    converted, errors = convert_bulk(args.csv, fields, args.outdir, args.ndjson, args.id_column)
+    if args.errors:
+        Path(args.errors).write_text(json.dumps(errors, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    for e in errors[:20]:
+        print(f"[ERREUR] ligne {e['line']} ({e['client'] or '?'}): {'; '.join(e['errors'])}", file=sys.stderr)
+    if len(errors) > 20:
+        print(f"[ERREUR] ... {len(errors) - 20} autres lignes rejetées", file=sys.stderr)
+    print(f"[OK] {converted} audit_context générés, {len(errors)} lignes rejetées -> {args.outdir or args.ndjson}",
+          file=sys.stderr)
+    if errors:
         sys.exit(1)
 
-    csv_path = sys.argv[1]
-    output_path = sys.argv[2]
-
-    row = load_client_row(csv_path)
-    validate_row(row)
-    context = generate_context(row)
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        yaml.dump(context, f, sort_keys=False, allow_unicode=True)
-
-    print(f"[OK] audit_context.yaml généré : {output_path}")
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de règles compilé pour la section `domains` de grids/audit_grid_v1.yaml.
+
+Les expressions `if` ("< 15", ">= 80 && < 90", false, "null", ...) sont
+compilées une seule fois, au chargement de la grille, en prédicats Python.
+L'évaluation d'un hôte ne fait plus aucune analyse de chaîne ni eval.
+
+Les constats sont des enregistrements compacts (contrôle, niveau, règle,
+paramètres) rangés en colonnes (Findings). Chaque règle a un code stable :
+clé `code:` de la règle, sinon contrôle + niveau ("web_security.ssl_expiry",
+warning -> WEB_SECURITY_SSL_EXPIRY_WARNING ; _NM pour « non mesurable »).
+Les messages ne sont rendus depuis les gabarits de la grille qu'à
+l'écriture d'un rapport.
+
+La section `decision_engine` (décisions tirées des niveaux de contrôles, du
+contexte d'audit et d'autres décisions) est compilée de la même façon ; voir
+engine/incremental_eval.py pour son évaluation par hôte.
+"""
+
+import operator
+import re
+import sys
+import time
+from array import array
+from string import Formatter
+
+NM = "non_mesurable"
+
+LEVELS = ("critical", "warning", "ok")
+FINDING_LEVELS = ("critical", "warning")
+LEVEL_INDEX = {lvl: i for i, lvl in enumerate(LEVELS)}
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def is_nm(v):
+    return v == NM or v is None
+
+def to_number(v):
+    """
+    Valeur numérique d'un fact (longueur pour une liste), None si non numérique.
+    Les booléens ne sont jamais considérés comme des nombres.
+    """
+    if isinstance(v, bool) or v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return v
+    if isinstance(v, (list, tuple)):
+        return len(v)
+    if isinstance(v, str):
+        if v.isdigit():
+            return int(v)
+        try:
+            return float(v)
+        except ValueError:
+            return None
+    return None
+
+def make_getter(dotted_path: str):
+    keys = tuple(dotted_path.split("."))
+
+    def get(facts):
+        cur = facts
+        for k in keys:
+            if not isinstance(cur, dict) or k not in cur:
+                return None
+            cur = cur[k]
+        return cur
+
+    get.path = dotted_path
+    return get
+
+def format_value(v):
+    if isinstance(v, (list, tuple)):
+        return ", ".join(str(x) for x in v)
+    return str(v)
+
+# -----------------------------
+# Derived facts
+# -----------------------------
+def _derive_measurable(values, params):
+    return not is_nm(values[0])
+
+def _derive_ratio(values, params):
+    # num / den ; si den n'est pas mesurable, la valeur brute de num est conservée
+    num, den = to_number(values[0]), to_number(values[1])
+    if num is None:
+        return NM
+    if den is None or den <= 0:
+        return num
+    return round(num / den, 2)
+
+def _derive_unexpected(values, params):
+    # Première source mesurable (ex. ports exposés, sinon tous les ports en écoute)
+    items = next((v for v in values if isinstance(v, list)), None)
+    if items is None:
+        return NM
+    expected = set(str(x) for x in params.get("expected", []))
+    return sorted(set(str(x) for x in items) - expected, key=lambda x: (len(x), x))
+
+def _derive_ubuntu_interim(values, params):
+    os_name, os_ver = values
+    if is_nm(os_name) or is_nm(os_ver):
+        return NM
+    return os_name == "ubuntu" and isinstance(os_ver, str) and not os_ver.endswith(".04")
+
+DERIVATIONS = {
+    "measurable": _derive_measurable,
+    "ratio": _derive_ratio,
+    "unexpected": _derive_unexpected,
+    "ubuntu_interim": _derive_ubuntu_interim,
+}
+
+def compile_fact(name, spec):
+    """
+    `spec` est soit un chemin pointé ("system.disk_used_percent"),
+    soit un fact dérivé: {derive: <nom>, from: [chemins...], <paramètres>}.
+    Retourne (getter, chemins lus).
+    """
+    if isinstance(spec, str):
+        return make_getter(spec), (spec,)
+    if not isinstance(spec, dict) or spec.get("derive") not in DERIVATIONS:
+        raise ValueError(f"Fact '{name}': définition invalide ({spec!r})")
+    fn = DERIVATIONS[spec["derive"]]
+    sources = spec.get("from") or []
+    if isinstance(sources, str):
+        sources = [sources]
+    getters = tuple(make_getter(p) for p in sources)
+    params = {k: v for k, v in spec.items() if k not in ("derive", "from")}
+
+    def get(facts):
+        return fn(tuple(g(facts) for g in getters), params)
+
+    get.path = name
+    return get, tuple(sources)
+
+# -----------------------------
+# Expression compilation
+# -----------------------------
+_NUM_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_TERM = re.compile(r"^(<=|>=|==|!=|<|>|not\s+in\b|in\b)?\s*(.*)$", re.S)
+
+def parse_literal(s: str):
+    s = s.strip()
+    if len(s) >= 2 and s[0] == s[-1] and s[0] in "\"'":
+        return s[1:-1]
+    if s.startswith("[") and s.endswith("]"):
+        inner = s[1:-1].strip()
+        return [parse_literal(x) for x in inner.split(",")] if inner else []
+    low = s.lower()
+    if low == "true":
+        return True
+    if low == "false":
+        return False
+    if low in ("null", "none", NM):
+        return None
+    n = to_number(s)
+    return n if n is not None else s
+
+def _compile_equals(lit):
+    if lit is None:
+        return lambda v, n: is_nm(v)
+    if isinstance(lit, bool):
+        return lambda v, n: v is lit
+    if isinstance(lit, (int, float)):
+        return lambda v, n: n is not None and n == lit
+    return lambda v, n: v == lit
+
+def _parse_term(term: str):
+    m = _TERM.match(term.strip())
+    op = re.sub(r"\s+", " ", m.group(1)) if m.group(1) else "=="
+    lit = parse_literal(m.group(2))
+    if op in _NUM_OPS and (isinstance(lit, bool) or not isinstance(lit, (int, float))):
+        raise ValueError(f"Seuil numérique attendu: {term!r}")
+    if op in ("in", "not in") and not isinstance(lit, list):
+        raise ValueError(f"Liste attendue après '{op}': {term!r}")
+    return op, lit
+
+def _compile_term(op, lit):
+    if op in _NUM_OPS:
+        fn = _NUM_OPS[op]
+        return lambda v, n: n is not None and fn(n, lit)
+
+    if op in ("in", "not in"):
+        allowed = frozenset(format_value(x) for x in lit)
+        if op == "in":
+            return lambda v, n: not is_nm(v) and format_value(v) in allowed
+        return lambda v, n: not is_nm(v) and format_value(v) not in allowed
+
+    eq = _compile_equals(lit)
+    if op == "!=":
+        return lambda v, n: not is_nm(v) and not eq(v, n)
+    return eq
+
+def _all_of(preds):
+    if len(preds) == 1:
+        return preds[0]
+
+    def pred(v, n):
+        for p in preds:
+            if not p(v, n):
+                return False
+        return True
+
+    return pred
+
+def _any_of(preds):
+    if len(preds) == 1:
+        return preds[0]
+
+    def pred(v, n):
+        for p in preds:
+            if p(v, n):
+                return True
+        return False
+
+    return pred
+
+def parse_expr(expr):
+    """
+    Analyse une condition de règle en forme normale disjonctive:
+    ((op, littéral), ...) par alternative `||`, termes reliés par `&&`.
+    Syntaxe: littéral YAML (true/false/null/nombre) ou chaîne combinant
+    `< <= > >= == != in not in` avec `&&` et `||` (&& prioritaire).
+    """
+    if expr is None or isinstance(expr, (bool, int, float)):
+        return ((("==", expr),),)
+    if not isinstance(expr, str) or not expr.strip():
+        raise ValueError(f"Expression de règle invalide: {expr!r}")
+    return tuple(
+        tuple(_parse_term(t) for t in alt.split("&&"))
+        for alt in expr.split("||")
+    )
+
+def compile_ast(ast):
+    return _any_of([_all_of([_compile_term(op, lit) for op, lit in alt]) for alt in ast])
+
+def compile_expr(expr):
+    """
+    Compile une condition de règle en prédicat `pred(valeur, valeur_numérique)`.
+    """
+    return compile_ast(parse_expr(expr))
+
+# -----------------------------
+# Grid compilation
+# -----------------------------
+def finding_code(check_id):
+    # "network.firewall" -> "NETWORK_FIREWALL"
+    return check_id.upper().replace(".", "_")
+
+_NULL_AST = ((("==", None),),)
+
+def rule_code(check_id, level, ast=None):
+    """
+    Code par défaut d'une règle: code du contrôle + niveau, ou `_NM` pour une
+    règle « non mesurable » ("web_security.ssl_expiry", warning -> WEB_SECURITY_SSL_EXPIRY_WARNING).
+    """
+    return f"{finding_code(check_id)}_{'NM' if ast == _NULL_AST else level.upper()}"
+
+def _rule_codes(check_id, specs):
+    """Codes stables des règles d'un contrôle (clé `code:` ou code par défaut), suffixés si doublon."""
+    codes = []
+    for explicit, level, ast in specs:
+        code = explicit or rule_code(check_id, level, ast)
+        base, n = code, 1
+        while code in codes:
+            n += 1
+            code = f"{base}_{n}"
+        codes.append(sys.intern(code))
+    return tuple(codes)
+
+def _template_fields(template):
+    if template is None:
+        return ()
+    return tuple(f for _, f, _, _ in Formatter().parse(template) if f)
+
+def _compile_message(check_id, level, template):
+    """(gabarit, champs lus hors `value`, paramètres requis) d'une règle ; message par défaut si absent."""
+    if not template:
+        return f"{check_id}: {level}", (), False
+    fields = _template_fields(template)
+    if not fields:
+        return template.format(), (), False
+    return template, tuple(dict.fromkeys(f for f in fields if f != "value")), True
+
+def _compile_condition(cond, facts, where):
+    if not isinstance(cond, dict) or "fact" not in cond:
+        raise ValueError(f"{where}: enabled_if invalide ({cond!r})")
+    if cond["fact"] not in facts:
+        raise ValueError(f"{where}: fact inconnu '{cond['fact']}'")
+    ast = parse_expr(cond.get("equals", True))
+    return cond["fact"], compile_ast(ast), ast
+
+def _compile_check(check_id, spec, facts, domain_conditions):
+    if not isinstance(spec, dict) or "fact" not in spec or "rules" not in spec:
+        raise ValueError(f"{check_id}: 'fact' et 'rules' sont requis")
+    fact = spec["fact"]
+    if fact not in facts:
+        raise ValueError(f"{check_id}: fact inconnu '{fact}'")
+
+    rules = []
+    default = ("ok", None)
+    code_specs, default_code = [], None
+    details, default_details = [], (None, None)
+    for rule in spec["rules"]:
+        if "else" in rule:
+            default = (rule["else"], rule.get("message"))
+            default_code = rule.get("code")
+            default_details = (rule.get("impact"), rule.get("recommended_action"))
+            continue
+        level = rule.get("level")
+        if level not in LEVELS:
+            raise ValueError(f"{check_id}: niveau invalide {level!r}")
+        ast = parse_expr(rule["if"])
+        rules.append((compile_ast(ast), level, rule.get("message"), ast))
+        code_specs.append((rule.get("code"), level, ast))
+        details.append((rule.get("impact"), rule.get("recommended_action")))
+    if default[0] not in LEVELS:
+        raise ValueError(f"{check_id}: niveau 'else' invalide {default[0]!r}")
+
+    conditions = list(domain_conditions)
+    if "enabled_if" in spec:
+        conditions.append(_compile_condition(spec["enabled_if"], facts, check_id))
+
+    # Facts lus par le contrôle: fact évalué, conditions, champs des messages
+    reads = {fact} | {c[0] for c in conditions}
+    for _, _, template, _ in rules + [(None,) + default + (None,)]:
+        for f in _template_fields(template):
+            if f != "value" and f not in facts:
+                raise ValueError(f"{check_id}: champ de message inconnu '{f}'")
+            if f != "value":
+                reads.add(f)
+
+    messages = tuple(_compile_message(check_id, level, template) for _, level, template, _ in rules) \
+        + (_compile_message(check_id, *default),)
+    levels = [level for _, level, _, _ in rules] + [default[0]]
+    return {
+        "id": check_id,
+        "code": sys.intern(finding_code(check_id)),
+        # Un code par règle (+ défaut): « expire bientôt » et « non mesurable » sont distincts
+        "codes": _rule_codes(check_id, code_specs + [(default_code, default[0], None)]),
+        "fact": fact,
+        "rules": tuple(rules),
+        "default": default,
+        "messages": messages,
+        # (impact, action recommandée) par règle (+ défaut) ; None si la grille n'en donne pas
+        "details": tuple(details) + (default_details,),
+        # Libellé « ok » lisible (RAW): premier message sans paramètre d'une règle de niveau ok
+        "ok_label": next((template for level, (template, _, wants) in zip(levels, messages)
+                          if level == "ok" and not wants), check_id),
+        "enabled_if": tuple(conditions),
+        "reads": tuple(sorted(reads)),
+    }
+
+# Condition de décision: "<référence> <terme>" ; référence = niveau d'un
+# contrôle ("backups.presence.level"), paramètre de contexte
+# ("context.downtime_tolerance") ou autre décision ("isolated_deployment_required")
+_DECISION_REF = re.compile(r"^\s*([A-Za-z_][\w.]*)\s*(\S.*)$", re.S)
+
+def _compile_decision_condition(cond, name, check_ids, decision_names):
+    m = _DECISION_REF.match(cond) if isinstance(cond, str) else None
+    if not m:
+        raise ValueError(f"decision_engine.{name}: condition invalide {cond!r}")
+    ref, term = m.groups()
+    if ref.endswith(".level") and ref[:-len(".level")] in check_ids:
+        kind, ref = "check", ref[:-len(".level")]
+    elif ref.startswith("context."):
+        kind, ref = "context", ref[len("context."):]
+    elif ref in decision_names:
+        kind = "decision"
+    else:
+        raise ValueError(f"decision_engine.{name}: référence inconnue '{ref}'")
+    return kind, ref, compile_expr(term)
+
+def _compile_decision(name, spec, check_ids, decision_names):
+    if not isinstance(spec, dict):
+        raise ValueError(f"decision_engine.{name}: définition invalide ({spec!r})")
+    if "rules" in spec:
+        mode = "rules"
+        conds = [r.get("if") for r in spec["rules"]]
+        outputs = [r.get("output") for r in spec["rules"]]
+        default = spec.get("else")
+    elif "if_any" in spec or "if_all" in spec:
+        mode = "any" if "if_any" in spec else "all"
+        conds = spec["if_any" if mode == "any" else "if_all"] or []
+        result = spec.get("result", True)
+        outputs = [result] * len(conds)
+        # Sans `else`, une décision booléenne vaut l'inverse de son résultat
+        default = spec.get("else", (not result) if isinstance(result, bool) else None)
+    else:
+        raise ValueError(f"decision_engine.{name}: 'rules', 'if_any' ou 'if_all' requis")
+    conditions = tuple(_compile_decision_condition(c, name, check_ids, decision_names) for c in conds)
+    return {
+        "name": name,
+        "mode": mode,
+        "conditions": conditions,
+        "outputs": tuple(outputs),
+        "default": default,
+        "reads": tuple(sorted({(kind, ref) for kind, ref, _ in conditions})),
+    }
+
+def compile_decisions(spec, checks):
+    """
+    Compile la section `decision_engine` ; décisions rangées dans un ordre
+    topologique (une décision après celles qu'elle lit).
+    """
+    check_ids = {c["id"] for c in checks}
+    compiled = {name: _compile_decision(name, d, check_ids, spec.keys()) for name, d in (spec or {}).items()}
+    ordered, state = [], {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"decision_engine: dépendance circulaire via '{name}'")
+        state[name] = "visiting"
+        for kind, ref in compiled[name]["reads"]:
+            if kind == "decision":
+                visit(ref)
+        state[name] = "done"
+        ordered.append(compiled[name])
+
+    for name in compiled:
+        visit(name)
+    return ordered
+
+def compile_grid(grid):
+    """
+    Compile la section `facts` (noms -> chemins/dérivations), la section
+    `domains` et la section `decision_engine` d'une grille de règles. Toute
+    erreur est levée ici, jamais pendant l'évaluation d'un hôte.
+    """
+    facts = {}
+    fact_sources = {}
+    for name, spec in (grid.get("facts") or {}).items():
+        facts[name], fact_sources[name] = compile_fact(name, spec)
+
+    domains = {}
+    for domain, entries in (grid.get("domains") or {}).items():
+        entries = entries or {}
+        domain_conditions = []
+        if "enabled_if" in entries:
+            domain_conditions.append(_compile_condition(entries["enabled_if"], facts, domain))
+        domains[domain] = [
+            _compile_check(f"{domain}.{name}", spec, facts, domain_conditions)
+            for name, spec in entries.items()
+            if name != "enabled_if"
+        ]
+
+    # Index entier de chaque contrôle: colonne `check` des Findings
+    checks = [c for entries in domains.values() for c in entries]
+    code_index = {}
+    for i, check in enumerate(checks):
+        check["index"] = i
+        for r, code in enumerate(check["codes"]):
+            if code in code_index:
+                raise ValueError(f"{check['id']}: code de constat en double '{code}'")
+            code_index[code] = (i, r)
+
+    # Mesures volatiles: hors du test « delta non vide » (audit_delta)
+    volatile = grid.get("volatile_facts") or []
+    if not isinstance(volatile, list) or not all(isinstance(p, str) and p for p in volatile):
+        raise ValueError(f"volatile_facts: liste de chemins de facts attendue ({volatile!r})")
+
+    return {
+        "facts": facts,
+        "fact_specs": dict(grid.get("facts") or {}),
+        "fact_sources": fact_sources,
+        "domains": domains,
+        "checks": checks,
+        "code_index": code_index,
+        "decisions": compile_decisions(grid.get("decision_engine"), checks),
+        "volatile": tuple(sorted(set(volatile))),
+    }
+
+def select_checks(compiled, selectors):
+    """
+    `selectors`: liste de domaines ("server") ou de contrôles ("backups.presence").
+    """
+    checks = []
+    for sel in selectors:
+        domain, _, name = sel.partition(".")
+        if domain not in compiled["domains"]:
+            raise ValueError(f"Domaine de règles inconnu: '{domain}'")
+        selected = [c for c in compiled["domains"][domain] if not name or c["id"] == sel]
+        if not selected:
+            raise ValueError(f"Contrôle de règles inconnu: '{sel}'")
+        checks.extend(selected)
+    return checks
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+_NO_PARAMS = ()
+
+class Findings:
+    """
+    Constats d'un hôte en colonnes: contrôle (index dans la grille compilée),
+    niveau (index dans LEVELS), règle déclenchée (index dans check["messages"])
+    et paramètres du message (valeurs brutes des facts). Tri et agrégation
+    portent sur des entiers ; les messages sont rendus à la demande.
+
+    L'itération produit des couples (niveau, message) rendus.
+    """
+
+    __slots__ = ("grid", "check", "level", "rule", "params")
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.check = array("H")
+        self.level = array("b")
+        self.rule = array("b")
+        self.params = []
+
+    def append(self, check, level, rule, params):
+        self.check.append(check["index"])
+        self.level.append(LEVEL_INDEX[level])
+        self.rule.append(rule)
+        self.params.append(params)
+
+    def __len__(self):
+        return len(self.check)
+
+    def sorted(self):
+        """Copie triée par sévérité (tri stable: ordre des contrôles conservé à niveau égal)."""
+        order = sorted(range(len(self.level)), key=self.level.__getitem__)
+        out = Findings(self.grid)
+        out.check = array("H", [self.check[i] for i in order])
+        out.level = array("b", [self.level[i] for i in order])
+        out.rule = array("b", [self.rule[i] for i in order])
+        out.params = [self.params[i] for i in order]
+        return out
+
+    def count(self, level):
+        return self.level.count(LEVEL_INDEX[level])
+
+    def codes(self):
+        """Code de la règle déclenchée (un code par règle, pas par contrôle)."""
+        checks = self.grid["checks"]
+        return [checks[c]["codes"][r] for c, r in zip(self.check, self.rule)]
+
+    def check_ids(self):
+        checks = self.grid["checks"]
+        return [checks[i]["id"] for i in self.check]
+
+    def levels(self):
+        return [LEVELS[i] for i in self.level]
+
+    def message(self, i):
+        template, fields, wants = self.grid["checks"][self.check[i]]["messages"][self.rule[i]]
+        if not wants:
+            return template
+        params = self.params[i]
+        kwargs = {"value": format_value(params[0])}
+        for f, v in zip(fields, params[1:]):
+            # Fact annexe absent (autre source, collecteur partiel): jamais "None" dans un message
+            kwargs[f] = "non mesurable" if is_nm(v) else format_value(v)
+        return template.format(**kwargs)
+
+    def messages(self):
+        return [self.message(i) for i in range(len(self.check))]
+
+    def __iter__(self):
+        for i in range(len(self.check)):
+            yield LEVELS[self.level[i]], self.message(i)
+
+    # -- sérialisation (cache, processus) -----------------------------------------
+    def to_state(self):
+        return {"check": self.check.tolist(), "level": self.level.tolist(),
+                "rule": self.rule.tolist(), "params": [list(p) for p in self.params]}
+
+    @classmethod
+    def from_state(cls, grid, state):
+        out = cls(grid)
+        out.check = array("H", state["check"])
+        out.level = array("b", state["level"])
+        out.rule = array("b", state["rule"])
+        out.params = [tuple(p) for p in state["params"]]
+        return out
+
+def _params(message, value, fact_getters, facts):
+    _, fields, wants = message
+    if not wants:
+        return _NO_PARAMS
+    if not fields:
+        return (value,)
+    return (value,) + tuple(fact_getters[f](facts) for f in fields)
+
+def evaluate_check(check, fact_getters, facts):
+    """
+    Retourne (niveau, règle, paramètres du message) ; niveau None si le contrôle
+    est désactivé (enabled_if). Le message n'est pas rendu ici (voir Findings).
+    """
+    for fact, pred, _ in check["enabled_if"]:
+        v = fact_getters[fact](facts)
+        if not pred(v, to_number(v)):
+            return None, 0, _NO_PARAMS
+
+    v = fact_getters[check["fact"]](facts)
+    n = to_number(v)
+    rule = 0
+    for pred, level, _, _ in check["rules"]:
+        if pred(v, n):
+            return level, rule, _params(check["messages"][rule], v, fact_getters, facts)
+        rule += 1
+    return check["default"][0], rule, _params(check["messages"][rule], v, fact_getters, facts)
+
+def evaluate_checks(compiled, checks, facts):
+    """
+    Évalue les contrôles sélectionnés pour un hôte.
+    Retourne (findings Findings, niveaux {id_contrôle: niveau}).
+    """
+    fact_getters = compiled["facts"]
+    findings = Findings(compiled)
+    levels = {}
+    for check in checks:
+        level, rule, params = evaluate_check(check, fact_getters, facts)
+        if level is None:
+            continue
+        levels[check["id"]] = level
+        if level in FINDING_LEVELS:
+            findings.append(check, level, rule, params)
+    return findings, levels
+
+def evaluate_checks_timed(compiled, checks, facts, record):
+    """
+    Comme evaluate_checks, en appelant record(id_contrôle, durée_ns) pour chaque
+    contrôle (instrumentation ; le chemin normal n'est pas chronométré).
+    """
+    fact_getters = compiled["facts"]
+    findings = Findings(compiled)
+    levels = {}
+    clock = time.perf_counter_ns
+    for check in checks:
+        t0 = clock()
+        level, rule, params = evaluate_check(check, fact_getters, facts)
+        record(check["id"], clock() - t0)
+        if level is None:
+            continue
+        levels[check["id"]] = level
+        if level in FINDING_LEVELS:
+            findings.append(check, level, rule, params)
+    return findings, levels
+
+def evaluate_decision(decision, levels, context, values):
+    """
+    Valeur d'une décision: `levels` {id_contrôle: niveau}, `context`
+    {paramètre: valeur}, `values` {décision: valeur} (décisions déjà évaluées).
+    """
+    sources = {"check": levels, "context": context, "decision": values}
+    hits = 0
+    for (kind, ref, pred), output in zip(decision["conditions"], decision["outputs"]):
+        v = sources[kind].get(ref)
+        if pred(v, to_number(v)):
+            if decision["mode"] != "all":
+                return output
+            hits += 1
+    if decision["mode"] == "all" and decision["conditions"] and hits == len(decision["conditions"]):
+        return decision["outputs"][0]
+    return decision["default"]
@@ -1,51 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synchronisation des options `select` de la base Notion depuis le référentiel CSV.
+
+Le schéma de la base est lu une seule fois ; seules les propriétés dont les
+options diffèrent du référentiel sont envoyées (une requête PATCH par
+propriété modifiée, sur une session HTTP réutilisée). Les options déjà
+présentes sont renvoyées avec leur id et leur couleur (pas de réinitialisation
+côté Notion).
+
+Les appels passent par un seau à jetons (~3 req/s, limite Notion) et sont
+rejoués avec backoff exponentiel sur 429 / 5xx / erreur réseau (l'en-tête
+Retry-After est respecté).
+
+    NOTION_TOKEN=... NOTION_DATABASE_ID=... python3 engine/update_notion_selects_from_csv.py --dry-run
+    # contre le serveur local de test (tools/notion_stub.py)
+    python3 engine/update_notion_selects_from_csv.py --base-url http://127.0.0.1:8765/v1 --token test --database db
+"""
+
+import argparse
 import csv
-import requests
+import json
 import os
+import random
+import sys
+import time
 from collections import defaultdict
 
-NOTION_TOKEN = os.environ["NOTION_TOKEN"]
-DATABASE_ID = os.environ["NOTION_DATABASE_ID"]
+import requests
+from requests.adapters import HTTPAdapter
 
-HEADERS = {
-    "Authorization": f"Bearer {NOTION_TOKEN}",
-    "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json"
-}
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+SELECT_TYPES = ("select", "multi_select")
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 def load_referential(csv_path):
     values = defaultdict(list)
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            values[row["property"]].append(row["value"])
+            if row["value"] not in values[row["property"]]:
+                values[row["property"]].append(row["value"])
     return values
 
-def update_property(property_name, values):
-    options = [{"name": v} for v in values]
-    payload = {
-        "properties": {
-            property_name: {
-                "select": {
-                    "options": options
-                }
-            }
-        }
-    }
-
-    r = requests.patch(
-        f"https://api.notion.com/v1/databases/{DATABASE_ID}",
-        headers=HEADERS,
-        json=payload
-    )
-
-    if r.status_code != 200:
-        raise RuntimeError(f"Erreur Notion sur {property_name}: {r.text}")
+# -----------------------------
+# HTTP (session, rate limit, retries)
+# -----------------------------
+class TokenBucket:
+    """`rate` jetons par seconde, au plus `burst` d'avance."""
+
+    def __init__(self, rate=3.0, burst=3):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+class NotionError(RuntimeError):
+    pass
+
+class NotionClient:
+    def __init__(self, token, base_url=NOTION_API, rate=3.0, retries=5, backoff=0.5, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate, burst=max(1, int(rate)))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {"requests": 0, "retries": 0}
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Notion-Version": NOTION_VERSION,
+            "Content-Type": "application/json",
+        })
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
 
+    def request(self, method, path, payload=None):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                r = self.session.request(method, url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise NotionError(f"{method} {path}: {e}") from e
+                r = None
+            if r is not None and r.status_code not in RETRY_STATUS:
+                if r.status_code >= 400:
+                    raise NotionError(f"{method} {path}: HTTP {r.status_code} {r.text[:300]}")
+                return r.json()
+            if attempt == self.retries:
+                raise NotionError(f"{method} {path}: HTTP {r.status_code} après {attempt + 1} tentatives")
+            self.stats["retries"] += 1
+            time.sleep(self._delay(attempt, r))
+
+    def get_database(self, database_id):
+        return self.request("GET", f"databases/{database_id}")
+
+    def update_database(self, database_id, properties):
+        return self.request("PATCH", f"databases/{database_id}", {"properties": properties})
+
+    def close(self):
+        self.session.close()
+
+# -----------------------------
+# Diff
+# -----------------------------
+def diff_selects(schema, referential):
+    """
+    Compare les propriétés de la base au référentiel.
+    Retourne (changes, report): changes = {propriété: schéma à envoyer} pour les
+    seules propriétés à modifier ; report = une entrée par propriété du référentiel.
+    """
+    properties = schema.get("properties", {}) or {}
+    changes = {}
+    report = []
+    for prop, wanted in referential.items():
+        current = properties.get(prop)
+        if current is None:
+            changes[prop] = {"select": {"options": [{"name": v} for v in wanted]}}
+            report.append({"property": prop, "action": "create", "added": list(wanted), "removed": []})
+            continue
+        kind = current.get("type")
+        if kind not in SELECT_TYPES:
+            report.append({"property": prop, "action": "error", "error": f"type {kind} (select attendu)"})
+            continue
+
+        existing = current.get(kind, {}).get("options", []) or []
+        by_name = {o["name"]: o for o in existing}
+        names = [o["name"] for o in existing]
+        added = [v for v in wanted if v not in by_name]
+        removed = [n for n in names if n not in wanted]
+        if names == list(wanted):
+            report.append({"property": prop, "action": "unchanged", "added": [], "removed": []})
+            continue
+
+        options = []
+        for v in wanted:
+            o = by_name.get(v)
+            options.append({k: o[k] for k in ("id", "name", "color") if k in o} if o else {"name": v})
+        changes[prop] = {kind: {"options": options}}
+        report.append({"property": prop, "action": "update", "added": added, "removed": removed,
+                       "reordered": not added and not removed})
+    return changes, report
+
+def format_report(report):
+    lines = []
+    for entry in report:
+        prop, action = entry["property"], entry["action"]
+        if action == "unchanged":
+            lines.append(f"[=] {prop} : inchangée")
+        elif action == "error":
+            lines.append(f"[ERREUR] {prop} : {entry['error']}")
+        elif action == "create":
+            lines.append(f"[+] {prop} : création ({len(entry['added'])} options)")
+        else:
+            detail = [f"+{v}" for v in entry["added"]] + [f"-{v}" for v in entry["removed"]]
+            lines.append(f"[~] {prop} : {', '.join(detail) if detail else 'ordre des options'}")
+    return "\n".join(lines)
+
+# -----------------------------
+# CLI
+# -----------------------------
 def main():
-    referential = load_referential("referential/notion_select_values.csv")
-    for prop, values in referential.items():
-        update_property(prop, values)
-        print(f"✔ Propriété mise à jour : {prop}")
+    ap = argparse.ArgumentParser(description="Synchronise les options select Notion depuis le référentiel CSV")
+    ap.add_argument("--csv", default="referential/notion_select_values.csv", help="Référentiel (colonnes property,value)")
+    ap.add_argument("--database", default=os.environ.get("NOTION_DATABASE_ID"), help="ID de la base (défaut: $NOTION_DATABASE_ID)")
+    ap.add_argument("--token", default=os.environ.get("NOTION_TOKEN"), help="Jeton d'intégration (défaut: $NOTION_TOKEN)")
+    ap.add_argument("--base-url", default=os.environ.get("NOTION_API_URL", NOTION_API), help="URL de l'API (serveur de test local)")
+    ap.add_argument("--rate", type=float, default=3.0, help="Requêtes par seconde (seau à jetons)")
+    ap.add_argument("--retries", type=int, default=5, help="Tentatives supplémentaires sur 429 / 5xx")
+    ap.add_argument("--dry-run", action="store_true", help="Affiche les changements sans rien envoyer")
+    ap.add_argument("--json", action="store_true", help="Rapport JSON sur stdout")
+    args = ap.parse_args()
+
+    if not args.token or not args.database:
+        print("[ERREUR] NOTION_TOKEN et NOTION_DATABASE_ID (ou --token / --database) requis", file=sys.stderr)
+        sys.exit(1)
+
+    referential = load_referential(args.csv)
+    client = NotionClient(args.token, args.base_url, args.rate, args.retries)
+    failed = 0
+    try:
+        changes, report = diff_selects(client.get_database(args.database), referential)
+        if not args.dry_run:
+            for entry in report:
+                prop = entry["property"]
+                if prop not in changes:
+                    continue
+                try:
+                    client.update_database(args.database, {prop: changes[prop]})
+                    entry["applied"] = True
+                    if not args.json:
+                        print(f"✔ Propriété mise à jour : {prop}")
+                except NotionError as e:
+                    entry["applied"] = False
+                    entry["error"] = str(e)
+                    failed += 1
+                    print(f"[ERREUR] {prop}: {e}", file=sys.stderr)
+    except NotionError as e:
+        print(f"[ERREUR] {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+    failed += sum(1 for e in report if e["action"] == "error")
+    if args.json:
+        print(json.dumps({"dry_run": args.dry_run, "changes": len(changes), "http": client.stats,
+                          "properties": report}, indent=2, ensure_ascii=False))
+    else:
+        print(format_report(report))
+        mode = "dry-run, rien envoyé" if args.dry_run else f"{client.stats['requests']} requêtes, {client.stats['retries']} reprises"
+        print(f"[OK] {len(changes)} propriété(s) à modifier sur {len(report)} ({mode})")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Tests du moteur: les modules engine/, collectors/ et bench/ s'importent à plat,
+comme lorsqu'ils sont lancés en script.
+
+    python3 -m pytest -q tests
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parents[1]
+for sub in ("engine", "collectors", "bench"):
+    sys.path.insert(0, str(BASE / sub))
+
+GRIDS = BASE / "grids"
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+@pytest.fixture
+def sample_facts():
+    return json.loads((FIXTURES / "facts_sample.json").read_text(encoding="utf-8"))
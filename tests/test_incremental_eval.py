@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Réévaluation incrémentale (engine/incremental_eval.py) contre une évaluation
+complète: après chaque mise à jour aléatoire (relevé complet, `changes`
+partiel ou audit_context modifié), niveaux, règles déclenchées et décisions
+doivent être identiques à ceux d'une évaluation de tous les contrôles.
+"""
+
+import copy
+import json
+import random
+
+import pytest
+
+from incremental_eval import CONTEXT_PREFIX, DEFAULT_GRID, IncrementalEvaluator
+from apply_audit_profile import load_rule_grid
+from rule_engine import evaluate_check, evaluate_decision
+from synth_fleet import generate_fleet
+
+NM = "non_mesurable"
+
+@pytest.fixture(scope="module")
+def compiled():
+    return load_rule_grid(DEFAULT_GRID)
+
+def full_evaluation(compiled, facts, context):
+    levels, rules, decided = {}, {}, {}
+    for check in compiled["checks"]:
+        level, rule, params = evaluate_check(check, compiled["facts"], facts)
+        levels[check["id"]] = level
+        rules[check["id"]] = [rule, list(params)]
+    for decision in compiled["decisions"]:
+        decided[decision["name"]] = evaluate_decision(decision, levels, context, decided)
+    return levels, rules, decided
+
+def assert_matches(compiled, state, facts, context):
+    levels, rules, decided = full_evaluation(compiled, facts, context)
+    assert state["levels"] == levels
+    assert state["rules"] == rules
+    assert state["decisions"] == decided
+
+def set_path(doc, path, value):
+    keys = path.split(".")
+    for k in keys[:-1]:
+        if not isinstance(doc.get(k), dict):
+            doc[k] = {}
+        doc = doc[k]
+    doc[keys[-1]] = value
+
+def random_context(rng, compiled):
+    params = compiled["spec"].get("context_parameters") or {}
+    return {name: rng.choice(spec["allowed"]) for name, spec in params.items()}
+
+def test_random_updates_match_full_evaluation(compiled):
+    rng = random.Random(7)
+    evaluator = IncrementalEvaluator(compiled)
+    fact_paths = sorted(p for p in evaluator.graph.checks_by_path if not p.startswith(CONTEXT_PREFIX))
+    hosts = dict(generate_fleet(40, seed=11))
+
+    # Valeurs plausibles par chemin (prises dans la flotte) + valeurs limites
+    pool = {p: [NM, None] for p in fact_paths}
+    for facts in hosts.values():
+        for p in fact_paths:
+            v = evaluator.graph.getters[p](facts)
+            if v is not None and v not in pool[p]:
+                pool[p].append(v)
+    for p, extra in {"system.uptime_hours": [0, 23, 24], "system.ram_free_percent": [14, 15, 29, 30],
+                     "system.disk_used_percent": [79, 80, 89, 90], "web_security.ssl_certificate_expiry_days": [13, 14, 29, 30],
+                     "performance.response_time_ms": [799, 800, 1999, 2000]}.items():
+        pool.setdefault(p, [NM, None]).extend(extra)
+
+    updates = 0
+    for host, facts in hosts.items():
+        context = random_context(rng, compiled)
+        state, _ = evaluator.update(None, facts, context)
+        assert_matches(compiled, state, facts, context)
+        for _ in range(60):
+            mode = rng.random()
+            if mode < 0.15:
+                context = random_context(rng, compiled)
+                state, _ = evaluator.update(state, None, context)
+            else:
+                changes = {p: rng.choice(pool[p]) for p in rng.sample(fact_paths, rng.randint(1, 4))}
+                facts = copy.deepcopy(facts)
+                for p, v in changes.items():
+                    set_path(facts, p, v)
+                if mode < 0.55:
+                    state, _ = evaluator.update(state, changes=changes)
+                else:
+                    state, _ = evaluator.update(state, facts)
+            # État persisté entre les runs (StateStore): aller-retour JSON
+            state = json.loads(json.dumps(state))
+            assert_matches(compiled, state, facts, context)
+            updates += 1
+    assert updates == 40 * 60
+    assert evaluator.stats["checks"] < evaluator.stats["checks_total"]
+
+def test_unchanged_facts_recompute_nothing(compiled, sample_facts):
+    evaluator = IncrementalEvaluator(compiled)
+    state, _ = evaluator.update(None, sample_facts, {})
+    state, result = evaluator.update(state, copy.deepcopy(sample_facts))
+    assert result["recomputed"] == {"checks": 0, "decisions": 0}
+    assert result["checks"] == [] and result["decisions"] == []
+
+def test_grid_change_invalidates_state(compiled, sample_facts):
+    evaluator = IncrementalEvaluator(compiled)
+    state, _ = evaluator.update(None, sample_facts, {})
+    assert evaluator.is_current(state)
+    state["grid"] = "autre-grille"
+    assert not evaluator.is_current(state)
+    state, result = evaluator.update(state, sample_facts, {})
+    assert result["baseline"]
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Niveaux et codes attendus des facts d'exemple, profil par profil.
+
+Ces attentes figent le comportement du moteur compilé qui a remplacé les
+fonctions analyze_* : tout changement de seuil, de sévérité ou de code dans
+grids/audit_grid_v1.yaml doit apparaître ici.
+"""
+
+import pytest
+
+from apply_audit_profile import evaluate_profile, load_profile
+from conftest import GRIDS
+
+EXPECTED = {
+    "audit_server_v1": {
+        "levels": {
+            "network.firewall": "critical",
+            "network.exposed_ports": "warning",
+            "network.ssh_root": "warning",
+            "server.uptime": "critical",
+            "server.load": "warning",
+            "server.memory": "warning",
+            "server.disk": "critical",
+            "server.os_release": "warning",
+            "backups.presence": "ok",
+            "backups.location": "warning",
+        },
+        "codes": [
+            "BACKUPS_LOCATION_WARNING",
+            "NETWORK_EXPOSED_PORTS_WARNING",
+            "NETWORK_FIREWALL_CRITICAL",
+            "NETWORK_SSH_ROOT_WARNING",
+            "SERVER_DISK_CRITICAL",
+            "SERVER_LOAD_WARNING",
+            "SERVER_MEMORY_WARNING",
+            "SERVER_OS_RELEASE_WARNING",
+            "SERVER_UPTIME_CRITICAL",
+        ],
+    },
+    "audit_web_security_v1": {
+        "levels": {
+            "web_security.ssl_presence": "ok",
+            "web_security.ssl_expiry": "warning",
+            "web_security.https": "warning",
+            "web_security.web_root_permissions": "warning",
+            "web_security.wp_config_permissions": "ok",
+            "web_security.suspicious_files": "ok",
+        },
+        "codes": [
+            "WEB_SECURITY_HTTPS_WARNING",
+            "WEB_SECURITY_SSL_EXPIRY_WARNING",
+            "WEB_SECURITY_WEB_ROOT_PERMISSIONS_WARNING",
+        ],
+    },
+    "audit_wordpress_v1": {
+        "levels": {
+            "wordpress_detection.core": "ok",
+            "wordpress.updates": "critical",
+            "wordpress.plugins": "ok",
+            "wordpress.outdated_plugins": "warning",
+            "wordpress.admins": "ok",
+            "wordpress.database": "ok",
+        },
+        "codes": [
+            "WORDPRESS_OUTDATED_PLUGINS_WARNING",
+            "WORDPRESS_UPDATES_CRITICAL",
+        ],
+    },
+    "audit_performance_resilience_v1": {
+        "levels": {
+            "stack.php": "ok",
+            "stack.mysql": "warning",
+            "performance.cpu_spikes": "ok",
+            "performance.memory_pressure": "warning",
+            "performance.response_time": "critical",
+            "performance.http_errors": "ok",
+            "architecture.rollback": "critical",
+            "backups.externalized": "warning",
+        },
+        "codes": [
+            "ARCHITECTURE_ROLLBACK_CRITICAL",
+            "BACKUPS_EXTERNALIZED_NM",
+            "PERFORMANCE_MEMORY_PRESSURE_WARNING",
+            "PERFORMANCE_RESPONSE_TIME_CRITICAL",
+            "STACK_MYSQL_NM",
+        ],
+    },
+}
+
+def _profile(slug):
+    # Sans grids/.cache: les tests compilent toujours la grille source
+    return load_profile(GRIDS / f"{slug}.yaml", use_cache=False)
+
+@pytest.mark.parametrize("slug", sorted(EXPECTED))
+def test_profile_levels_and_codes(slug, sample_facts):
+    result = evaluate_profile(sample_facts, _profile(slug))
+    assert result["levels"] == EXPECTED[slug]["levels"]
+    assert sorted(result["findings"].codes()) == EXPECTED[slug]["codes"]
+
+def test_findings_sorted_by_severity(sample_facts):
+    levels = evaluate_profile(sample_facts, _profile("audit_server_v1"))["findings"].levels()
+    assert levels == sorted(levels, key=["critical", "warning"].index)
+
+def test_firewall_absent_is_critical(sample_facts):
+    # analyze_server le classait en warning ; la grille le déclare critical
+    sample_facts["security_infra"]["firewall_present"] = False
+    assert evaluate_profile(sample_facts, _profile("audit_server_v1"))["levels"]["network.firewall"] == "critical"
+
+def test_exposed_ports_loopback_only_is_ok(sample_facts):
+    # 3306 ouvert, mais n'écoutant que sur loopback: absent de exposed_ports
+    sample_facts["security_infra"]["exposed_ports"] = ["22", "80", "443"]
+    levels = evaluate_profile(sample_facts, _profile("audit_server_v1"))["levels"]
+    assert levels["network.exposed_ports"] == "ok"
+
+def test_exposed_ports_falls_back_to_open_ports(sample_facts):
+    # Facts de collect_all_facts.sh: pas de exposed_ports, repli sur open_ports
+    del sample_facts["security_infra"]["exposed_ports"]
+    result = evaluate_profile(sample_facts, _profile("audit_server_v1"))
+    assert result["levels"]["network.exposed_ports"] == "warning"
+    assert "Ports ouverts à justifier: 3306." in result["findings"].messages()
+
+def test_wordpress_rules_disabled_without_wordpress(sample_facts):
+    sample_facts["wordpress"] = {"core_version": "non_mesurable"}
+    result = evaluate_profile(sample_facts, _profile("audit_wordpress_v1"))
+    assert result["levels"] == {"wordpress_detection.core": "warning"}
+
+def test_empty_facts_never_render_none():
+    for slug in EXPECTED:
+        result = evaluate_profile({}, _profile(slug))
+        for message in result["findings"].messages():
+            assert "None" not in message, (slug, message)
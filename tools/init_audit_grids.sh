@@ -58,6 +58,18 @@ facts_required:
     syslog_errors_recent: optional
     web_5xx_recent: optional
 
+rules:
+  grid: audit_grid_v1.yaml
+  domains:
+    - network
+    - server
+    - backups.presence
+    - backups.location
+
+recommendations:
+  - "Activer un pare-feu (UFW) et restreindre les ports exposés au strict nécessaire."
+  - "Qualifier la stratégie de sauvegarde (externalisation + rétention + test de restauration)."
+
 out_of_scope:
   - wordpress
   - php_version
@@ -90,6 +102,15 @@ facts_required:
   malware:
     suspicious_files_detected: optional
 
+rules:
+  grid: audit_grid_v1.yaml
+  domains:
+    - web_security
+
+recommendations:
+  - "Forcer HTTPS et surveiller l’expiration du certificat (alerte automatique)."
+  - "Durcir les permissions et vérifier les fichiers sensibles (wp-config.php)."
+
 out_of_scope:
   - server_firewall
   - wordpress_plugins
@@ -129,6 +150,15 @@ facts_required:
   cron:
     wp_cron_active: required
 
+rules:
+  grid: audit_grid_v1.yaml
+  domains:
+    - wordpress_detection
+    - wordpress
+
+recommendations:
+  - "Mettre à jour core/plugins/thèmes et contrôler les comptes administrateurs."
+
 out_of_scope:
   - os
   - firewall
@@ -167,6 +197,18 @@ facts_required:
   deployment:
     rollback_available: required   # snapshot / blue-green / none
 
+rules:
+  grid: audit_grid_v1.yaml
+  domains:
+    - stack
+    - performance
+    - architecture.rollback
+    - backups.externalized
+
+recommendations:
+  - "Vérifier versions PHP/MySQL, activer OPcache, qualifier cache applicatif si pertinent."
+  - "Mettre en place un rollback réel (snapshots/blue-green) selon RTO attendu."
+
 out_of_scope:
   - wordpress_content_quality
 EOF
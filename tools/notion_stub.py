@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur Notion minimal, local, pour tester update_notion_selects_from_csv.py
+sans toucher à la vraie base.
+
+Imite GET / PATCH /v1/databases/<id> (propriétés select / multi_select) avec un
+état en mémoire, initialisé depuis un JSON {"properties": {...}} si fourni.
+Peut simuler la limite de débit (429 + Retry-After) et des erreurs 5xx
+intermittentes. Chaque requête est journalisée sur stderr.
+
+    python3 tools/notion_stub.py --port 8765 --state schema.json --max-rate 3 --fail-every 4
+    python3 engine/update_notion_selects_from_csv.py --base-url http://127.0.0.1:8765/v1 --token test --database db
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COLORS = ["default", "gray", "brown", "orange", "yellow", "green", "blue", "purple", "pink", "red"]
+
+class NotionStub:
+    def __init__(self, properties=None, max_rate=0.0, fail_every=0):
+        self.properties = properties or {}
+        self.max_rate = max_rate
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.calls = []
+        self.last = 0.0
+        self.count = 0
+
+    def throttled(self):
+        # 429 si deux requêtes sont plus rapprochées que 1/max_rate
+        with self.lock:
+            now = time.monotonic()
+            self.count += 1
+            too_fast = self.max_rate and now - self.last < 1.0 / self.max_rate
+            self.last = now
+            failing = self.fail_every and self.count % self.fail_every == 0
+        return too_fast, failing
+
+    def database(self, database_id):
+        return {"object": "database", "id": database_id, "properties": self.properties}
+
+    def patch(self, changes):
+        with self.lock:
+            for name, spec in changes.items():
+                kind = next(k for k in ("select", "multi_select") if k in spec)
+                old = {o["name"]: o for o in self.properties.get(name, {}).get(kind, {}).get("options", [])}
+                options = []
+                for i, o in enumerate(spec[kind]["options"]):
+                    prev = old.get(o["name"], {})
+                    options.append({
+                        "id": o.get("id") or prev.get("id") or uuid.uuid4().hex[:4],
+                        "name": o["name"],
+                        "color": o.get("color") or prev.get("color") or COLORS[i % len(COLORS)],
+                    })
+                prop = self.properties.setdefault(name, {"id": uuid.uuid4().hex[:4], "name": name})
+                prop["type"] = kind
+                prop[kind] = {"options": options}
+
+def make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: vérifie la réutilisation des connexions
+
+        def log_message(self, fmt, *args):
+            print(f"[stub] {self.client_address[1]} {fmt % args}", file=sys.stderr)
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 3 or parts[:2] != ["v1", "databases"]:
+                self._send(404, {"object": "error", "status": 404, "code": "object_not_found"})
+                return None
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send(401, {"object": "error", "status": 401, "code": "unauthorized"})
+                return None
+            too_fast, failing = stub.throttled()
+            if too_fast:
+                self._send(429, {"object": "error", "status": 429, "code": "rate_limited"}, {"Retry-After": "1"})
+                return None
+            if failing:
+                self._send(503, {"object": "error", "status": 503, "code": "service_unavailable"})
+                return None
+            return parts[2]
+
+        def do_GET(self):
+            database_id = self._route()
+            if database_id is not None:
+                stub.calls.append(("GET", database_id))
+                self._send(200, stub.database(database_id))
+
+        def do_PATCH(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            database_id = self._route()
+            if database_id is not None:
+                stub.calls.append(("PATCH", database_id, sorted(body.get("properties", {}))))
+                stub.patch(body.get("properties", {}))
+                self._send(200, stub.database(database_id))
+
+    return Handler
+
+def main():
+    ap = argparse.ArgumentParser(description="Serveur Notion local (GET/PATCH /v1/databases/<id>)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--state", help='Schéma initial JSON {"properties": {...}}')
+    ap.add_argument("--max-rate", type=float, default=0.0, help="Requêtes/s au-delà desquelles répondre 429 (0 = illimité)")
+    ap.add_argument("--fail-every", type=int, default=0, help="Répondre 503 toutes les N requêtes (0 = jamais)")
+    args = ap.parse_args()
+
+    properties = {}
+    if args.state:
+        with open(args.state, encoding="utf-8") as f:
+            properties = json.load(f).get("properties", {})
+    stub = NotionStub(properties, args.max_rate, args.fail_every)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub))
+    print(f"[OK] Stub Notion sur http://{args.host}:{args.port}/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,24 @@ cd "$ROOT"
 
 PROFILE="${1:-all}"
 
+# Optionnel: dossier textfile-collector de node_exporter (métriques collecte + moteur)
+METRICS_DIR="${AUDIT_METRICS_DIR:-}"
+COLLECT_METRICS=()
+ENGINE_METRICS=()
+if [ -n "$METRICS_DIR" ]; then
+  COLLECT_METRICS=(--metrics-prom "$METRICS_DIR/audit_collector.prom")
+  ENGINE_METRICS=(--metrics-prom "$METRICS_DIR/audit_engine.prom")
+fi
+
 echo "=============================================="
 echo " RUN AUDIT — COLLECT + APPLY PROFILE"
 echo "=============================================="
 
-# 1) Collecte
+# 1) Collecte (sondes lentes servies par leur cache à ttl ; AUDIT_REFRESH=1 pour tout re-mesurer)
+COLLECT_ARGS=()
+[ "${AUDIT_REFRESH:-0}" = "1" ] && COLLECT_ARGS+=(--refresh)
 echo "[STEP] Collecte facts (all)…"
-./collectors/collect_all_facts.sh
+python3 collectors/collect_facts.py --out facts/facts_all.json "${COLLECT_ARGS[@]}" "${COLLECT_METRICS[@]}"
 
 # Sanity JSON
 if command -v jq >/dev/null 2>&1; then
@@ -20,22 +31,43 @@ if command -v jq >/dev/null 2>&1; then
   echo "[OK] facts_all.json valide"
 fi
 
-# 2) Apply profile(s)
-apply_one () {
-  local p="$1"
-  echo "[STEP] Apply profile: $p"
-  python3 engine/apply_audit_profile.py --facts facts/facts_all.json --profile "$p" --outdir reports
-}
+# Validation / normalisation (schemas/facts_schema_v1.yaml) avant le moteur
+python3 engine/normalize_facts.py --facts facts/facts_all.json --fix \
+  || echo "[WARN] Facts invalides normalisés (valeurs rejetées -> non_mesurable)"
+
+# 1b) Optionnel: envoi au service d'ingestion central (engine/ingest_server.py)
+if [ -n "${AUDIT_INGEST_URL:-}" ]; then
+  echo "[STEP] Envoi des facts -> $AUDIT_INGEST_URL"
+  gzip -c facts/facts_all.json | curl -sf --data-binary @- \
+    -H "Content-Encoding: gzip" -H "Content-Type: application/json" \
+    -H "X-Audit-Host: $(hostname)" "$AUDIT_INGEST_URL/facts" >/dev/null \
+    && echo "[OK] Facts envoyés" || echo "[WARN] Envoi impossible (audit local poursuivi)"
+fi
 
+# 2) Apply profile(s) — un seul interpréteur Python pour tous les profils
 if [ "$PROFILE" = "all" ]; then
-  apply_one grids/audit_server_v1.yaml
-  apply_one grids/audit_web_security_v1.yaml
-  apply_one grids/audit_wordpress_v1.yaml
-  apply_one grids/audit_performance_resilience_v1.yaml
+  PROFILE_ARGS=(
+    --profile grids/audit_server_v1.yaml
+    --profile grids/audit_web_security_v1.yaml
+    --profile grids/audit_wordpress_v1.yaml
+    --profile grids/audit_performance_resilience_v1.yaml
+  )
 else
-  apply_one "grids/${PROFILE}_v1.yaml"
+  PROFILE_ARGS=(--profile "grids/${PROFILE}_v1.yaml")
 fi
 
+# Optionnel: delta depuis le run précédent (reports/<profil>/delta.json) ; AUDIT_DELTA_ONLY=1 pour
+# n'écrire les rapports complets qu'au premier run
+DELTA_ARGS=()
+if [ -n "${AUDIT_DELTA_STATE:-}" ]; then
+  DELTA_ARGS=(--delta-state "$AUDIT_DELTA_STATE")
+  [ "${AUDIT_DELTA_ONLY:-0}" = "1" ] && DELTA_ARGS+=(--delta-only)
+fi
+
+echo "[STEP] Apply profile(s): ${PROFILE_ARGS[*]}"
+python3 engine/apply_audit_profile.py --facts facts/facts_all.json "${PROFILE_ARGS[@]}" --outdir reports \
+  "${DELTA_ARGS[@]}" "${ENGINE_METRICS[@]}"
+
 echo "=============================================="
 echo "[OK] Terminé — voir reports/"
 echo "=============================================="
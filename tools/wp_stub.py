@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Faux WP-CLI pour tester collectors/wp_probe.py sans PHP ni WordPress.
+
+Répond à `wp eval <code> --path=<site> ...` avec le JSON qu'attend la sonde :
+version lue dans wp-includes/version.php, extensions = sous-dossiers de
+wp-content/plugins ; <site>/.wp_stub.json peut surcharger des champs ou
+simuler un site lent ({"sleep": 5}) ou en échec ({"fail": "Error: ..."}).
+Chaque appel est journalisé dans $WP_STUB_LOG (un bootstrap = une ligne).
+
+    AUDIT_WP_CLI=tools/wp_stub.py python3 collectors/wp_probe.py --root /tmp/www
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+def main():
+    args = sys.argv[1:]
+    path = next((a.split("=", 1)[1] for a in args if a.startswith("--path=")), None)
+    if not args or args[0] != "eval" or path is None:
+        print("Error: stub: usage wp eval <code> --path=<site>", file=sys.stderr)
+        return 1
+    if os.environ.get("WP_STUB_LOG"):
+        with open(os.environ["WP_STUB_LOG"], "a", encoding="utf-8") as f:
+            f.write(f"{time.time():.3f} {path}\n")
+
+    try:
+        with open(os.path.join(path, "wp-includes", "version.php"), encoding="utf-8") as f:
+            m = re.search(r"\$wp_version\s*=\s*'([^']+)'", f.read())
+    except OSError:
+        print("Error: This does not seem to be a WordPress installation.", file=sys.stderr)
+        return 1
+    overrides = {}
+    try:
+        with open(os.path.join(path, ".wp_stub.json"), encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    time.sleep(overrides.pop("sleep", 0.05))  # coût d'un bootstrap PHP
+    if "fail" in overrides:
+        print(overrides["fail"], file=sys.stderr)
+        return 1
+    plugins_dir = os.path.join(path, "wp-content", "plugins")
+    plugins = [d for d in os.listdir(plugins_dir) if os.path.isdir(os.path.join(plugins_dir, d))] \
+        if os.path.isdir(plugins_dir) else []
+    data = {
+        "core_version": m.group(1) if m else None,
+        "total_plugins": len(plugins),
+        "active_plugins": len(plugins),
+        "outdated_plugins": 0,
+        "admin_count": 1,
+        "db_size_mb": 12.5,
+        "wp_cron_active": True,
+        "auto_updates_enabled": True,
+    }
+    data.update(overrides)
+    print("PHP Notice: stub")  # bruit avant le JSON, comme un vrai site
+    print(json.dumps(data))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())